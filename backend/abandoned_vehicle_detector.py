@@ -119,6 +119,26 @@ class AbandonedVehicleDetector:
             if image_hash in self._feature_cache:
                 return self._feature_cache[image_hash]
 
+        # Apply preprocessing
+        input_tensor = self._preprocess(image).unsqueeze(0).to(self.device)
+
+        # Extract features
+        with torch.no_grad():
+            features = self.model(input_tensor)
+
+        # Flatten and convert to numpy
+        features = features.squeeze().cpu().numpy()
+
+        # 캐시 저장 (LRU 방식: 오래된 항목 자동 삭제)
+        if use_cache:
+            self._cache_features(image_hash, features)
+
+        return features
+
+    def _preprocess(self, image: np.ndarray) -> torch.Tensor:
+        """
+        Convert a BGR/RGB numpy image into a normalized (3, 224, 224) model input
+        """
         # Convert BGR to RGB if needed
         if len(image.shape) == 3 and image.shape[2] == 3:
             image_rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
@@ -128,23 +148,62 @@ class AbandonedVehicleDetector:
         # Convert to PIL Image
         pil_image = Image.fromarray(image_rgb)
 
-        # Apply preprocessing
-        input_tensor = self.transform(pil_image).unsqueeze(0).to(self.device)
+        return self.transform(pil_image)
 
-        # Extract features
-        with torch.no_grad():
-            features = self.model(input_tensor)
+    def _cache_features(self, image_hash: str, features: np.ndarray):
+        """
+        특징 벡터 캐시 저장 (가득 차면 가장 오래된 항목 삭제)
+        """
+        if len(self._feature_cache) >= self._cache_max_size:
+            # 가장 오래된 항목 삭제 (FIFO)
+            oldest_key = next(iter(self._feature_cache))
+            del self._feature_cache[oldest_key]
+        self._feature_cache[image_hash] = features
 
-        # Flatten and convert to numpy
-        features = features.squeeze().cpu().numpy()
+    def extract_features_batch(
+        self,
+        input_tensors: List[torch.Tensor],
+        image_hashes: List[str] = None,
+        batch_size: int = 32
+    ) -> List[np.ndarray]:
+        """
+        Extract feature vectors for many preprocessed images
 
-        # 캐시 저장 (LRU 방식: 오래된 항목 자동 삭제)
-        if use_cache:
-            if len(self._feature_cache) >= self._cache_max_size:
-                # 가장 오래된 항목 삭제 (FIFO)
-                oldest_key = next(iter(self._feature_cache))
-                del self._feature_cache[oldest_key]
-            self._feature_cache[image_hash] = features
+        🚀 성능 최적화: 이미지마다 모델을 호출하지 않고 batch_size 단위로
+        한 번에 추론 (배치 크기로 메모리 사용량 제한)
+
+        Args:
+            input_tensors: Images already converted by _preprocess()
+            image_hashes: Optional cache keys, one per tensor (캐시 사용)
+            batch_size: Maximum number of images per forward pass
+
+        Returns:
+            Feature vectors in input order (1280 dimensions each)
+        """
+        # ⚡ Ensure model is loaded (happens only once on first use)
+        self._ensure_model_loaded()
+
+        features: List[np.ndarray] = [None] * len(input_tensors)
+        pending = []
+
+        # 캐시 확인
+        for i in range(len(input_tensors)):
+            if image_hashes is not None and image_hashes[i] in self._feature_cache:
+                features[i] = self._feature_cache[image_hashes[i]]
+            else:
+                pending.append(i)
+
+        for start in range(0, len(pending), batch_size):
+            chunk = pending[start:start + batch_size]
+            batch = torch.stack([input_tensors[i] for i in chunk]).to(self.device)
+
+            with torch.no_grad():
+                output = self.model(batch).cpu().numpy()
+
+            for i, row in zip(chunk, output):
+                features[i] = row
+                if image_hashes is not None:
+                    self._cache_features(image_hashes[i], row)
 
         return features
 
@@ -228,6 +287,18 @@ class AbandonedVehicleDetector:
         # Calculate similarity
         similarity = self.calculate_similarity(features1, features2)
 
+        return self._build_result(similarity, year1, year2, parking_space_id)
+
+    def _build_result(
+        self,
+        similarity: float,
+        year1: int,
+        year2: int,
+        parking_space_id: str = None
+    ) -> Dict[str, Any]:
+        """
+        Build the detection result for a similarity score between two years
+        """
         # Determine if vehicle is abandoned (similarity >= threshold)
         is_abandoned = similarity >= self.similarity_threshold
 
@@ -351,25 +422,38 @@ class AbandonedVehicleDetector:
             )
             results.append(result)
         else:
-            # Compare specific regions
+            # Compare specific regions: crop and preprocess every box first,
+            # then run all crops through the model in batches
+            boxes = []
+            input_tensors = []
+            image_hashes = []
             for i, (x, y, w, h) in enumerate(bounding_boxes):
                 try:
                     # Crop regions from both images
                     crop1 = pdf_image1[y:y+h, x:x+w]
                     crop2 = pdf_image2[y:y+h, x:x+w]
 
-                    result = self.detect_abandoned_vehicles(
-                        crop1, crop2, year1, year2, f'vehicle_{i}'
-                    )
-
-                    # Add bounding box info
-                    result['bbox'] = {'x': x, 'y': y, 'w': w, 'h': h}
-
-                    results.append(result)
+                    tensors = [self._preprocess(crop1), self._preprocess(crop2)]
                 except Exception as e:
                     print(f"Error processing bounding box {i}: {str(e)}")
                     continue
 
+                boxes.append((i, x, y, w, h))
+                input_tensors.extend(tensors)
+                image_hashes.append(self._get_image_hash(crop1))
+                image_hashes.append(self._get_image_hash(crop2))
+
+            features = self.extract_features_batch(input_tensors, image_hashes)
+
+            for k, (i, x, y, w, h) in enumerate(boxes):
+                similarity = self.calculate_similarity(features[2 * k], features[2 * k + 1])
+                result = self._build_result(similarity, year1, year2, f'vehicle_{i}')
+
+                # Add bounding box info
+                result['bbox'] = {'x': x, 'y': y, 'w': w, 'h': h}
+
+                results.append(result)
+
         return results
 
     def filter_abandoned_vehicles(
@@ -317,7 +317,7 @@ def get_demo_coordinates(sido: str = None, sigungu: str = None) -> Dict:
             }
         else:
             # 시/군/구가 없으면 첫 번째 구 반환
-            first_gu = list(CITY_COORDINATES[sido].values())[0]
+            first_gu = next(iter(CITY_COORDINATES[sido].values()))
             return {
                 "success": True,
                 "address": first_gu["address"],
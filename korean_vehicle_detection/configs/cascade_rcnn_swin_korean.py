@@ -4,7 +4,7 @@ Optimized for Korean aerial vehicle detection on Apple Silicon M3 Max
 """
 
 # Import custom modules to register mmdet classes
-custom_imports = dict(imports=['mmdet.models', 'mmdet.datasets', 'mmdet.visualization'], allow_failed_imports=False)
+custom_imports = dict(imports=['mmdet.models', 'mmdet.datasets', 'mmdet.visualization', 'custom_modules'], allow_failed_imports=False)
 
 # Set default scope to mmdet
 default_scope = 'mmdet'
@@ -33,7 +33,7 @@ model = dict(
         drop_path_rate=0.2,
         patch_norm=True,
         out_indices=(0, 1, 2, 3),
-        with_cp=False,  # Gradient checkpointing (enable if OOM)
+        with_cp=True,  # Gradient checkpointing (recompute attention in backward, ~2x batch)
         convert_weights=True,
         init_cfg=dict(
             type='Pretrained',
@@ -74,7 +74,7 @@ model = dict(
         stage_loss_weights=[1, 0.5, 0.25],
         bbox_roi_extractor=dict(
             type='SingleRoIExtractor',
-            roi_layer=dict(type='RoIAlign', output_size=7, sampling_ratio=0),
+            roi_layer=dict(type='RoIAlign', output_size=7, sampling_ratio=2, aligned=True),  # Fixed 2x2 grid per bin
             out_channels=256,
             featmap_strides=[4, 8, 16, 32]
         ),
@@ -163,7 +163,7 @@ model = dict(
         rpn_proposal=dict(
             nms_pre=2000,
             max_per_img=1000,
-            nms=dict(type='nms', iou_threshold=0.7),
+            nms=dict(type='nms', iou_threshold=0.7, class_agnostic=True),
             min_bbox_size=0
         ),
         rcnn=[
@@ -230,19 +230,19 @@ model = dict(
         rpn=dict(
             nms_pre=1000,
             max_per_img=1000,
-            nms=dict(type='nms', iou_threshold=0.7),
+            nms=dict(type='nms', iou_threshold=0.7, class_agnostic=True),
             min_bbox_size=0
         ),
         rcnn=dict(
             score_thr=0.05,
-            nms=dict(type='nms', iou_threshold=0.5),
+            nms=dict(type='nms', iou_threshold=0.5, class_agnostic=True),
             max_per_img=100
         )
     )
 )
 
 # Dataset settings
-dataset_type = 'CocoDataset'
+dataset_type = 'CachedCocoDataset'  # CocoDataset + pickled annotation index (custom_modules)
 data_root = 'data/'  # Relative to korean_vehicle_detection/
 
 # Class names
@@ -274,13 +274,39 @@ train_pipeline = [
     dict(type='RandomFlip', prob=0.5, direction='vertical'),
     # Note: RandomRotate not available in MMDet 3.x, use horizontal/vertical flips instead
     # This still provides good augmentation for small datasets
-    # Strong photometric distortion
+    # Strong photometric distortion via Albumentations (OpenCV LUT kernels
+    # instead of per-pixel float math in PhotoMetricDistortion)
+    # Ranges mirror the previous PhotoMetricDistortion settings:
+    # brightness_delta=50, contrast/saturation (0.4, 1.6), hue_delta=25
     dict(
-        type='PhotoMetricDistortion',
-        brightness_delta=50,
-        contrast_range=(0.4, 1.6),
-        saturation_range=(0.4, 1.6),
-        hue_delta=25
+        type='Albu',
+        transforms=[
+            dict(
+                type='RandomBrightnessContrast',
+                brightness_limit=0.2,  # ~50 / 255
+                contrast_limit=0.6,
+                p=0.5
+            ),
+            # ColorJitter scales saturation like saturation_range did
+            # (HueSaturationValue's sat_shift_limit is an additive shift)
+            dict(
+                type='ColorJitter',
+                brightness=0,
+                contrast=0,
+                saturation=(0.4, 1.6),
+                hue=0.14,  # fraction of the hue circle: 25 / 180 OpenCV units
+                p=0.5
+            )
+        ],
+        bbox_params=dict(
+            type='BboxParams',
+            format='pascal_voc',
+            label_fields=['gt_bboxes_labels', 'gt_ignore_flags'],
+            min_visibility=0.0,
+            filter_lost_elements=True
+        ),
+        keymap={'img': 'image', 'gt_bboxes': 'bboxes'},
+        skip_img_without_anno=True
     ),
     dict(type='PackDetInputs')
 ]
@@ -299,11 +325,13 @@ test_pipeline = [
 
 # Dataloader settings (Updated for large dataset - 10K+ images)
 train_dataloader = dict(
-    batch_size=4,  # Increased for larger dataset (M3 Max can handle this)
-    num_workers=0,  # 0 = main process (avoiding multiprocessing issues)
-    persistent_workers=False,
+    batch_size=8,  # Doubled with backbone gradient checkpointing
+    num_workers=8,  # Parallel augmentation workers (M3 Max: 16 cores)
+    persistent_workers=True,  # Keep workers alive across epochs
+    pin_memory=False,  # No benefit on MPS unified memory
+    prefetch_factor=4,
     sampler=dict(type='DefaultSampler', shuffle=True),
-    batch_sampler=dict(type='AspectRatioBatchSampler'),
+    batch_sampler=dict(type='BucketedAspectRatioBatchSampler'),  # Buckets precomputed once (custom_modules)
     dataset=dict(
         type=dataset_type,
         data_root=data_root,
@@ -318,8 +346,10 @@ train_dataloader = dict(
 
 val_dataloader = dict(
     batch_size=1,
-    num_workers=0,
-    persistent_workers=False,
+    num_workers=8,
+    persistent_workers=True,
+    pin_memory=False,
+    prefetch_factor=4,
     drop_last=False,
     sampler=dict(type='DefaultSampler', shuffle=False),
     dataset=dict(
@@ -348,11 +378,13 @@ val_evaluator = dict(
 test_evaluator = val_evaluator
 
 # Optimizer settings (optimized for M3 Max)
+# fp32 here; scripts/train.py switches to bf16 AmpOptimWrapper with fused
+# AdamW on CUDA (neither is supported on MPS/CPU)
 optim_wrapper = dict(
     type='OptimWrapper',
     optimizer=dict(
         type='AdamW',
-        lr=0.0001,
+        lr=0.0002,  # Linear scaling: 1e-4 @ batch 4 -> 2e-4 @ batch 8
         betas=(0.9, 0.999),
         weight_decay=0.05
     ),
@@ -411,11 +443,10 @@ default_hooks = dict(
 
 # Environment settings
 env_cfg = dict(
-    cudnn_benchmark=False,
-    mp_cfg=dict(mp_start_method='fork', opencv_num_threads=0),
-    dist_cfg=dict(backend='gloo')  # MPS backend
+    cudnn_benchmark=False,  # Only relevant if ported to CUDA
+    # forkserver avoids deadlocks when forking a process that already touched MPS
+    mp_cfg=dict(mp_start_method='forkserver', opencv_num_threads=0)
 )
-
 # Visualization settings - use default to avoid registration issues
 vis_backends = [
     dict(type='LocalVisBackend'),
@@ -435,4 +466,4 @@ resume = False
 work_dir = './work_dirs/cascade_rcnn_swin_korean'
 
 # Device settings (Apple Silicon M3 Max MPS)
-device = 'mps'  # Metal Performance Shaders (patched NMS for MPS support)
+device = 'mps'  # Metal Performance Shaders (NMS routed to CPU by scripts/train.py)
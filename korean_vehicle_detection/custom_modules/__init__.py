@@ -0,0 +1,14 @@
+"""
+Custom MMDetection components for Korean vehicle detection
+Registered via `custom_imports` in configs/cascade_rcnn_swin_korean.py
+"""
+
+from .coco_json import patch_pycocotools_json
+from .datasets import CachedCocoDataset
+from .samplers import BucketedAspectRatioBatchSampler
+
+# Annotation files are loaded by pycocotools inside dataset and metric
+# construction; decode them with orjson when it is installed
+patch_pycocotools_json()
+
+__all__ = ['CachedCocoDataset', 'BucketedAspectRatioBatchSampler', 'patch_pycocotools_json']
@@ -0,0 +1,47 @@
+"""
+orjson-backed JSON loading for pycocotools
+
+pycocotools' COCO() (used by CocoDataset and CocoMetric) parses the whole
+annotation file with the stdlib json module. Pointing that module's `json`
+at a copy whose load() decodes with orjson makes the parse several times
+faster without touching json for the rest of the process.
+"""
+
+import json
+import types
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _orjson_load(fp, **kwargs):
+    return orjson.loads(fp.read())
+
+
+def patch_pycocotools_json():
+    """
+    Make pycocotools.coco decode annotation files with orjson
+
+    Returns:
+        True if the patch is (already) in place, False if orjson or
+        pycocotools is not installed
+    """
+    if orjson is None:
+        return False
+
+    try:
+        import pycocotools.coco as coco_module
+    except ImportError:
+        return False
+
+    if getattr(coco_module.json, '_orjson_load', False):
+        return True
+
+    fast_json = types.ModuleType('json')
+    fast_json.__dict__.update(vars(json))
+    fast_json.load = _orjson_load
+    fast_json._orjson_load = True
+    coco_module.json = fast_json
+    return True
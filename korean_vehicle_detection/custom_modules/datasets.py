@@ -0,0 +1,62 @@
+"""
+COCO dataset with a pickle cache of the parsed annotation index
+"""
+
+import os
+import pickle
+
+from mmdet.datasets import CocoDataset
+from mmdet.registry import DATASETS
+
+
+@DATASETS.register_module()
+class CachedCocoDataset(CocoDataset):
+    """
+    CocoDataset that caches `load_data_list()` next to the annotation file
+
+    The cache (`annotations.json.cache.pkl`) is keyed on the annotation
+    file's mtime + size, the class names and the image prefix, so it is
+    rebuilt automatically whenever any of them change.
+    """
+
+    def _cache_key(self):
+        stat = os.stat(self.ann_file)
+        return (
+            stat.st_mtime_ns,
+            stat.st_size,
+            tuple(self._metainfo.get('classes', ())),
+            self.data_prefix.get('img', '')
+        )
+
+    def load_data_list(self):
+        cache_file = f"{self.ann_file}.cache.pkl"
+        key = self._cache_key()
+
+        if os.path.exists(cache_file):
+            try:
+                with open(cache_file, 'rb') as f:
+                    cache = pickle.load(f)
+                if cache.get('key') == key:
+                    self.cat_ids = cache['cat_ids']
+                    self.cat2label = cache['cat2label']
+                    self.cat_img_map = cache['cat_img_map']
+                    return cache['data_list']
+            except (OSError, pickle.UnpicklingError, EOFError, KeyError):
+                pass
+
+        data_list = super().load_data_list()
+
+        cache = {
+            'key': key,
+            'cat_ids': self.cat_ids,
+            'cat2label': self.cat2label,
+            'cat_img_map': self.cat_img_map,
+            'data_list': data_list
+        }
+        try:
+            with open(cache_file, 'wb') as f:
+                pickle.dump(cache, f, protocol=5)
+        except OSError:
+            pass  # Read-only dataset dir: just skip caching
+
+        return data_list
@@ -0,0 +1,56 @@
+"""
+Aspect-ratio batch sampler with buckets precomputed once per run
+"""
+
+import math
+
+import numpy as np
+from mmdet.datasets.samplers import AspectRatioBatchSampler
+from mmdet.registry import DATA_SAMPLERS
+
+
+@DATA_SAMPLERS.register_module()
+class BucketedAspectRatioBatchSampler(AspectRatioBatchSampler):
+    """
+    AspectRatioBatchSampler that buckets images by log2(w/h) once at init
+
+    The stock sampler calls `dataset.get_data_info()` (a deep copy) for every
+    index on every epoch. Here each index is mapped to a bucket up front, so
+    per-epoch grouping is a list lookup. Sampling order (shuffle seed,
+    distributed sharding) still comes from the wrapped sampler.
+    """
+
+    def __init__(self, sampler, batch_size, drop_last=False):
+        super().__init__(sampler, batch_size, drop_last)
+
+        dataset = self.sampler.dataset
+        dataset.full_init()
+
+        bucket_of = np.empty(len(dataset), dtype=np.int64)
+        for idx in range(len(dataset)):
+            data_info = dataset.get_data_info(idx)
+            ratio = max(data_info['width'], 1) / max(data_info['height'], 1)
+            bucket_of[idx] = int(np.round(np.log2(ratio) * 2))
+        self._bucket_of = bucket_of.tolist()
+
+    def __iter__(self):
+        buckets = {}
+        for idx in self.sampler:
+            bucket = buckets.setdefault(self._bucket_of[idx], [])
+            bucket.append(idx)
+            if len(bucket) == self.batch_size:
+                yield bucket[:]
+                del bucket[:]
+
+        # Leftovers: pack the remaining indices into mixed-ratio batches
+        left_data = [idx for bucket in buckets.values() for idx in bucket]
+        for start in range(0, len(left_data), self.batch_size):
+            batch = left_data[start:start + self.batch_size]
+            if len(batch) < self.batch_size and self.drop_last:
+                return
+            yield batch
+
+    def __len__(self):
+        if self.drop_last:
+            return len(self.sampler) // self.batch_size
+        return math.ceil(len(self.sampler) / self.batch_size)
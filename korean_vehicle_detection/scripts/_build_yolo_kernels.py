@@ -0,0 +1,32 @@
+"""
+Ahead-of-time build of the _yolo_kernels Numba kernel
+
+    python scripts/_build_yolo_kernels.py
+
+writes the `_yolo_kernels_aot` extension module next to this file.
+_yolo_kernels picks it up on import and then needs neither Numba nor a
+JIT compile at run time. Rebuild after changing _coco_to_yolo_loop.
+
+Requires Numba (numba.pycc) and a C compiler. AOT code is compiled for
+the build machine's CPU family without the parallel loop, so large
+conversions may be faster with the JIT; delete the extension to go back.
+"""
+
+import sys
+from pathlib import Path
+
+from numba.pycc import CC
+
+SCRIPTS_DIR = Path(__file__).parent
+sys.path.insert(0, str(SCRIPTS_DIR))
+
+from _yolo_kernels import _coco_to_yolo_loop
+
+cc = CC('_yolo_kernels_aot')
+cc.output_dir = str(SCRIPTS_DIR)
+
+cc.export('coco_to_yolo', 'void(f8[:, ::1], f8[:, ::1], f8[:, ::1])')(_coco_to_yolo_loop)
+
+if __name__ == "__main__":
+    cc.compile()
+    print(f"✓ Built {cc.output_file} in {cc.output_dir}/")
@@ -0,0 +1,257 @@
+"""
+Fast file cloning and extraction helpers shared by the dataset preparation scripts
+"""
+
+import ctypes
+import gzip
+import os
+import shutil
+import subprocess
+import sys
+import tarfile
+import threading
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import zstandard  # Fast multi-threaded (de)compression for local archives
+except ImportError:
+    zstandard = None
+
+# Read buffer for decompressor pipes
+PIPE_BUFSIZE = 1024 * 1024
+
+
+def walk_sizes(root):
+    """
+    Count files and total bytes under `root` in one os.scandir walk
+
+    DirEntry type checks come from the directory listing, so only regular
+    files cost a stat. Symlinks are not followed.
+
+    Returns:
+        (file_count, total_bytes)
+    """
+    count = 0
+    total = 0
+    stack = [os.fspath(root)]
+    while stack:
+        with os.scandir(stack.pop()) as it:
+            for entry in it:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif entry.is_file(follow_symlinks=False):
+                    total += entry.stat(follow_symlinks=False).st_size
+                    count += 1
+    return count, total
+
+
+def tree_size(root):
+    """
+    Total bytes under `root`, from `du` when it is available
+
+    du's C traversal beats a Python walk on large trees. GNU du -sb gives
+    apparent bytes; elsewhere du -sk gives allocated KiB. Falls back to
+    walk_sizes when du is missing or rejects the flag (e.g. busybox).
+    """
+    du = shutil.which('du')
+    if du is not None:
+        linux = sys.platform.startswith('linux')
+        try:
+            result = subprocess.run(
+                [du, '-sb' if linux else '-sk', os.fspath(root)],
+                check=True, capture_output=True, text=True
+            )
+            size = int(result.stdout.split()[0])
+            return size if linux else size * 1024
+        except (OSError, subprocess.CalledProcessError, ValueError, IndexError):
+            pass
+
+    return walk_sizes(root)[1]
+
+
+def _copy_file_range(src, dst):
+    """Kernel-side copy (reflink on Btrfs/XFS); raises OSError if unsupported"""
+    with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+        remaining = os.fstat(fsrc.fileno()).st_size
+        while remaining > 0:
+            copied = os.copy_file_range(fsrc.fileno(), fdst.fileno(), remaining)
+            if copied == 0:
+                break
+            remaining -= copied
+
+
+# macOS clonefile(2): copy-on-write clone on APFS (None elsewhere)
+_clonefile = ctypes.CDLL(None, use_errno=True).clonefile if sys.platform == 'darwin' else None
+
+
+def _clone_apfs(src, dst):
+    """APFS copy-on-write clone; raises OSError if unsupported"""
+    if _clonefile(os.fsencode(src), os.fsencode(dst), 0) != 0:
+        errno = ctypes.get_errno()
+        raise OSError(errno, os.strerror(errno), os.fspath(dst))
+
+
+def fast_clone(src, dst, link=False, metadata=True):
+    """
+    Copy `src` to `dst` using the cheapest mechanism available
+
+    1. Hardlink (only if `link=True`: the two paths then share data, so
+       in-place edits to one show up in the other)
+    2. clonefile (macOS; copy-on-write clone on APFS)
+    3. os.copy_file_range (Linux; reflinks on CoW filesystems)
+    4. shutil.copy2 (shutil.copyfile if `metadata=False`)
+
+    With `metadata=False` permission bits and timestamps are not copied,
+    saving the copystat syscalls when callers don't need them.
+
+    Returns:
+        Name of the mechanism used ('link', 'clonefile', 'copy_file_range', 'copy2', 'copyfile')
+    """
+    if link:
+        try:
+            os.link(src, dst)
+            return 'link'
+        except OSError:
+            pass  # EXDEV (cross-device), EPERM, ...
+
+    if _clonefile is not None:
+        try:
+            _clone_apfs(src, dst)
+            return 'clonefile'  # clonefile keeps permissions and timestamps
+        except OSError:
+            pass  # not APFS, cross-volume, ...
+
+    if hasattr(os, 'copy_file_range'):
+        try:
+            _copy_file_range(src, dst)
+            if metadata:
+                shutil.copystat(src, dst)
+            return 'copy_file_range'
+        except OSError:
+            pass
+
+    if not metadata:
+        shutil.copyfile(src, dst)
+        return 'copyfile'
+
+    shutil.copy2(src, dst)
+    return 'copy2'
+
+
+def extract_zip(zip_path, dest, workers=None):
+    """
+    Extract a zip archive with members decompressed in parallel
+
+    zlib releases the GIL while inflating, so threads scale with cores.
+    Each thread reads through its own ZipFile handle.
+
+    Returns:
+        Number of members extracted
+    """
+    dest = os.fspath(dest)
+
+    with zipfile.ZipFile(zip_path) as zf:
+        members = zf.infolist()
+
+    # Create directories up front so workers don't race on makedirs
+    # (unsafe names are left to ZipFile.extract to sanitize)
+    for member in members:
+        parent = os.path.normpath(os.path.dirname(member.filename))
+        if parent != '.' and not os.path.isabs(parent) and not parent.startswith('..'):
+            os.makedirs(os.path.join(dest, parent), exist_ok=True)
+
+    local = threading.local()
+    handles = []
+    handles_lock = threading.Lock()
+
+    def _extract(member):
+        zf = getattr(local, 'zf', None)
+        if zf is None:
+            zf = local.zf = zipfile.ZipFile(zip_path)
+            with handles_lock:
+                handles.append(zf)
+        zf.extract(member, dest)
+
+    try:
+        with ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as executor:
+            list(executor.map(_extract, members))
+    finally:
+        for zf in handles:
+            zf.close()
+
+    return len(members)
+
+
+def _extract_tar_stream(fileobj, dest):
+    with tarfile.open(fileobj=fileobj, mode='r|') as tar:
+        if hasattr(tarfile, 'data_filter'):
+            tar.extractall(dest, filter='data')
+        else:
+            tar.extractall(dest)
+
+
+def extract_tar_gz(archive, dest):
+    """
+    Extract a .tar.gz, decompressing with pigz (multi-threaded) when installed
+
+    Returns:
+        'pigz' or 'gzip'
+    """
+    pigz = shutil.which('pigz')
+    if pigz is None:
+        with open(archive, 'rb') as f, gzip.GzipFile(fileobj=f) as gz:
+            _extract_tar_stream(gz, dest)
+        return 'gzip'
+
+    # Large pipe buffer: tarfile reads in 10 KiB records
+    proc = subprocess.Popen(
+        [pigz, '-dc', os.fspath(archive)], stdout=subprocess.PIPE, bufsize=PIPE_BUFSIZE
+    )
+    try:
+        _extract_tar_stream(proc.stdout, dest)
+    finally:
+        proc.stdout.close()
+        returncode = proc.wait()
+    if returncode != 0:
+        raise OSError(f"pigz failed on {archive} (exit {returncode})")
+    return 'pigz'
+
+
+def extract_tar_zst(archive, dest):
+    """Extract a .tar.zst (streaming; requires the zstandard package)"""
+    if zstandard is None:
+        raise ImportError("zstandard is required to extract .tar.zst archives")
+
+    with open(archive, 'rb') as f:
+        with zstandard.ZstdDecompressor().stream_reader(f) as reader:
+            _extract_tar_stream(reader, dest)
+
+
+def create_tar_zst(src_dir, archive, level=19):
+    """
+    Pack a directory into a .tar.zst using all cores
+
+    Uses the zstd CLI (-T0) when installed, else the zstandard package.
+    """
+    src_dir = os.fspath(src_dir)
+    zstd = shutil.which('zstd')
+    if zstd is not None:
+        with open(archive, 'wb') as out:
+            tar_proc = subprocess.Popen(['tar', '-cf', '-', '-C', src_dir, '.'], stdout=subprocess.PIPE)
+            try:
+                subprocess.run([zstd, '-T0', f'-{level}', '-q', '-c'], stdin=tar_proc.stdout, stdout=out, check=True)
+            finally:
+                tar_proc.stdout.close()
+                returncode = tar_proc.wait()
+        if returncode != 0:
+            raise OSError(f"tar failed on {src_dir} (exit {returncode})")
+        return
+
+    if zstandard is None:
+        raise ImportError("zstd CLI or the zstandard package is required to create .tar.zst archives")
+
+    cctx = zstandard.ZstdCompressor(level=level, threads=-1)
+    with open(archive, 'wb') as out, cctx.stream_writer(out) as writer:
+        with tarfile.open(fileobj=writer, mode='w|') as tar:
+            tar.add(src_dir, arcname='.')
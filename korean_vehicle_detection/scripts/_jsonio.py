@@ -0,0 +1,126 @@
+"""
+JSON load/dump helpers shared by the dataset preparation scripts
+
+Uses orjson (several times faster, writes bytes directly) when installed
+and falls back to the stdlib json module otherwise.
+"""
+
+import gzip
+import io
+import json
+import mmap
+import os
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ijson  # Streaming JSON parser: large COCO files aren't loaded whole
+except ImportError:
+    ijson = None
+
+
+def load_json(path):
+    """
+    Load a JSON file
+
+    With orjson the file is memory-mapped and parsed in place, so large
+    annotation files aren't also copied into a bytes buffer first.
+    """
+    if orjson is not None:
+        with open(path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return orjson.loads(b'')  # mmap can't map an empty file
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm, memoryview(mm) as view:
+                return orjson.loads(view)
+
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def dump_json(data, path, indent=True):
+    """Write `data` to `path` as JSON (2-space indented unless `indent=False`)"""
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        with open(path, 'wb') as f:
+            f.write(orjson.dumps(data, option=option))
+        return
+
+    with open(path, 'w') as f:
+        json.dump(data, f, indent=2 if indent else None)
+
+
+def dumps_json(data):
+    """Compact JSON encoding of `data` as bytes"""
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(data, separators=(',', ':')).encode()
+
+
+def loads_json(data):
+    """Decode JSON from bytes or str"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def dump_json_stream(path, fields, compresslevel=None):
+    """
+    Write a JSON object to `path` one field / list item at a time
+
+    `fields` is a sequence of (key, value) pairs. Lists and other
+    non-dict iterables are streamed item by item, so the whole document is
+    never encoded into one string; items that are already-encoded bytes
+    are copied through as-is. Output is compact (no indentation), and
+    gzip-compressed at `compresslevel` when one is given.
+    """
+    if compresslevel is None:
+        f = open(path, 'wb', buffering=1024 * 1024)
+    else:
+        # Buffer in front of the compressor so zlib sees large blocks
+        # rather than one call per item
+        f = io.BufferedWriter(gzip.open(path, 'wb', compresslevel=compresslevel), 1024 * 1024)
+
+    with f:
+        f.write(b'{')
+        for n, (key, value) in enumerate(fields):
+            if n:
+                f.write(b',')
+            f.write(dumps_json(key) + b':')
+
+            if isinstance(value, (dict, str, bytes)) or not hasattr(value, '__iter__'):
+                f.write(dumps_json(value))
+                continue
+
+            f.write(b'[')
+            for i, item in enumerate(value):
+                if i:
+                    f.write(b',')
+                f.write(item if isinstance(item, bytes) else dumps_json(item))
+            f.write(b']')
+        f.write(b'}')
+
+
+def _stream_section(path, section):
+    with open(path, 'rb') as f:
+        yield from ijson.items(f, f'{section}.item', use_float=True)
+
+
+def json_sections(path, sections):
+    """
+    Item iterables of the top-level list fields `sections` of a JSON file
+
+    With ijson each section is streamed in its own pass over the file when
+    iterated, so only one item is materialized at a time and the order of
+    sections in the file doesn't matter. Without it the file is loaded once
+    (missing sections are empty either way).
+    """
+    if ijson is None:
+        data = load_json(path)
+        return tuple(data.get(section, []) for section in sections)
+
+    return tuple(_stream_section(path, section) for section in sections)
@@ -0,0 +1,79 @@
+"""
+Numeric kernels for COCO -> YOLO label conversion
+
+`coco_to_yolo` runs one fused pass over the boxes (no temporaries). In
+order of preference it uses:
+
+- the ahead-of-time compiled `_yolo_kernels_aot` extension, built with
+  `python scripts/_build_yolo_kernels.py`: no Numba import and no
+  compile at run time, which matters for one-shot runs;
+- the same loop JIT-compiled with Numba when it is installed (parallel;
+  the first call pays a short compile, cached on disk);
+- an equivalent NumPy implementation otherwise.
+"""
+
+import numpy as np
+
+try:
+    from _yolo_kernels_aot import coco_to_yolo as _coco_to_yolo_aot
+except ImportError:
+    _coco_to_yolo_aot = None
+
+njit = None
+prange = range
+if _coco_to_yolo_aot is None:
+    try:
+        from numba import njit, prange
+    except ImportError:
+        pass
+
+
+def _coco_to_yolo_numpy(bboxes, wh, out):
+    out[:, 0] = bboxes[:, 0] + bboxes[:, 2] * 0.5
+    out[:, 1] = bboxes[:, 1] + bboxes[:, 3] * 0.5
+    out[:, 2:] = bboxes[:, 2:]
+    out[:, 0::2] /= wh[:, 0:1]
+    out[:, 1::2] /= wh[:, 1:2]
+    np.clip(out, 0.0, 1.0, out=out)
+
+
+def _coco_to_yolo_loop(bboxes, wh, out):
+    # Compiled by Numba only (JIT below, AOT in _build_yolo_kernels.py)
+    for i in prange(bboxes.shape[0]):
+        x, y, w, h = bboxes[i, 0], bboxes[i, 1], bboxes[i, 2], bboxes[i, 3]
+        img_w, img_h = wh[i, 0], wh[i, 1]
+        out[i, 0] = min(1.0, max(0.0, (x + w * 0.5) / img_w))
+        out[i, 1] = min(1.0, max(0.0, (y + h * 0.5) / img_h))
+        out[i, 2] = min(1.0, max(0.0, w / img_w))
+        out[i, 3] = min(1.0, max(0.0, h / img_h))
+
+
+if njit is not None:
+    _coco_to_yolo_numba = njit(parallel=True, fastmath=True, cache=True)(_coco_to_yolo_loop)
+
+
+def coco_to_yolo(bboxes, wh, out=None):
+    """
+    Convert COCO bboxes to normalized, clipped YOLO boxes
+
+    Args:
+        bboxes: (N, 4) float64 [x, y, width, height] in pixels
+        wh: (N, 2) float64 image [width, height] per bbox
+        out: Optional (N, 4) float64 output array
+
+    Returns:
+        (N, 4) [x_center, y_center, width, height] in [0, 1]
+    """
+    bboxes = np.ascontiguousarray(bboxes, dtype=np.float64)
+    wh = np.ascontiguousarray(wh, dtype=np.float64)
+    if out is None:
+        out = np.empty_like(bboxes)
+
+    if _coco_to_yolo_aot is not None and out.flags.c_contiguous:
+        _coco_to_yolo_aot(bboxes, wh, out)
+    elif njit is not None:
+        _coco_to_yolo_numba(bboxes, wh, out)
+    else:
+        _coco_to_yolo_numpy(bboxes, wh, out)
+
+    return out
@@ -5,18 +5,26 @@ Automatically generates COCO annotations for unlabeled aerial images
 
 import os
 import json
+import hashlib
+import multiprocessing
 import cv2
-import numpy as np
 from pathlib import Path
 from datetime import datetime
+from PIL import Image
 from tqdm import tqdm
 from ultralytics import YOLO
 
+from _fileops import fast_clone
+
+# Large DOTA tiles exceed PIL's decompression-bomb limit; we only read headers
+Image.MAX_IMAGE_PIXELS = None
+
 # Project paths
 PROJECT_ROOT = Path(__file__).parent.parent
 DATA_RAW_DOTA = PROJECT_ROOT / "data" / "raw" / "dota" / "DOTA"
 DATA_AUTO_LABELED = PROJECT_ROOT / "data" / "raw" / "auto_labeled"
 DATA_AUTO_LABELED.mkdir(parents=True, exist_ok=True)
+RESIZE_CACHE_DIR = DATA_AUTO_LABELED / ".resize_cache"
 
 # YOLO vehicle class IDs (COCO dataset)
 VEHICLE_CLASSES = {
@@ -40,6 +48,91 @@ CUSTOM_CLASSES = {
     'large-vehicle': 2,
 }
 
+def content_hash(image_path):
+    """BLAKE2b-128 hex digest of an image file's bytes"""
+    return hashlib.blake2b(Path(image_path).read_bytes(), digest_size=16).hexdigest()
+
+def preprocess_and_cache(image_files, cache_dir=RESIZE_CACHE_DIR, imgsz=1280, hashes=None):
+    """
+    Pre-resize large images to the inference resolution once and cache them
+
+    Each image is decoded once, resized so its long edge is `imgsz` and
+    saved as JPEG (q=95) under its content hash, so re-runs (e.g. with a
+    different confidence threshold) skip decoding full-resolution tiles.
+    Images already within `imgsz` are used as-is.
+
+    Args:
+        image_files: Image paths to preprocess
+        cache_dir: Cache directory
+        imgsz: Target long-edge size
+        hashes: Optional precomputed {path: content_hash(path)}
+
+    Returns:
+        Dict mapping original path -> (path to run inference on, scale back to original)
+    """
+    cache_dir = Path(cache_dir)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+
+    # content hash -> scale (original long edge / cached long edge)
+    index_path = cache_dir / f"index_{imgsz}.json"
+    index = {}
+    if index_path.exists():
+        with open(index_path, 'r') as f:
+            index = json.load(f)
+
+    resized = {}
+    for image_path in tqdm(image_files, desc="Pre-resizing"):
+        key = hashes[image_path] if hashes and image_path in hashes else content_hash(image_path)
+        cached_path = cache_dir / f"{key}_{imgsz}.jpg"
+
+        if key in index and (index[key] == 1.0 or cached_path.exists()):
+            scale = index[key]
+        else:
+            img = cv2.imread(str(image_path))
+            if img is None:
+                continue
+
+            height, width = img.shape[:2]
+            long_edge = max(height, width)
+
+            if long_edge <= imgsz:
+                scale = 1.0
+            else:
+                scale = long_edge / imgsz
+                img = cv2.resize(
+                    img,
+                    (round(width / scale), round(height / scale)),
+                    interpolation=cv2.INTER_AREA
+                )
+                cv2.imwrite(str(cached_path), img, [cv2.IMWRITE_JPEG_QUALITY, 95])
+
+            index[key] = scale
+
+        resized[image_path] = (image_path if scale == 1.0 else cached_path, scale)
+
+    with open(index_path, 'w') as f:
+        json.dump(index, f)
+
+    return resized
+
+def export_coreml(model_name, imgsz=640):
+    """
+    Export YOLOv8 weights to a CoreML package for Apple Neural Engine inference
+
+    The export runs once; later runs reuse the existing .mlpackage.
+
+    Returns:
+        Path to the .mlpackage
+    """
+    mlpackage = Path(model_name).with_suffix('.mlpackage')
+
+    if not mlpackage.exists():
+        print(f"\n📦 Exporting {model_name} to CoreML (one-time)...")
+        exported = YOLO(model_name).export(format='coreml', nms=True, half=True, imgsz=imgsz)
+        mlpackage = Path(exported)
+
+    return str(mlpackage)
+
 class AutoLabeler:
     """Auto-labeling using YOLOv8"""
 
@@ -50,7 +143,8 @@ class AutoLabeler:
         iou_threshold=0.45,
         min_box_area=100,  # Minimum bbox area (pixels^2)
         max_box_area=50000,  # Maximum bbox area
-        device='mps'  # 'mps' for M3 Max, 'cuda' for NVIDIA, 'cpu' for CPU
+        device='mps',  # 'mps' for M3 Max, 'ane' for CoreML/Neural Engine, 'cuda' for NVIDIA, 'cpu' for CPU
+        imgsz=640  # Inference size (Ultralytics default; fixed input size for CoreML export)
     ):
         """
         Initialize auto-labeler
@@ -61,12 +155,27 @@ class AutoLabeler:
             iou_threshold: NMS IOU threshold
             min_box_area: Minimum bbox area to filter tiny detections
             max_box_area: Maximum bbox area to filter huge detections
-            device: Device to run on
+            device: Device to run on ('ane' runs an exported CoreML model)
+            imgsz: Inference image size
         """
         print("\n" + "=" * 60)
         print("🤖 Initializing YOLOv8 Auto-Labeler")
         print("=" * 60)
 
+        # Constructor args, so pool workers can build identical labelers
+        self.config = dict(
+            model_name=model_name,
+            conf_threshold=conf_threshold,
+            iou_threshold=iou_threshold,
+            min_box_area=min_box_area,
+            max_box_area=max_box_area,
+            device=device,
+            imgsz=imgsz
+        )
+
+        if device == 'ane':
+            model_name = export_coreml(model_name, imgsz=imgsz)
+
         print(f"\n📦 Loading model: {model_name}")
         self.model = YOLO(model_name)
 
@@ -76,6 +185,9 @@ class AutoLabeler:
         self.min_box_area = min_box_area
         self.max_box_area = max_box_area
         self.device = device
+        self.imgsz = imgsz
+        # CoreML models are dispatched by Core ML itself (ANE/GPU/CPU)
+        self.predict_device = 'cpu' if device == 'ane' else device
 
         print(f"   Device: {device}")
         print(f"   Confidence threshold: {conf_threshold}")
@@ -83,10 +195,15 @@ class AutoLabeler:
         print(f"   Bbox area range: {min_box_area} - {max_box_area} px²")
         print(f"\n✓ Model loaded successfully")
 
-    def detect_vehicles(self, image_path):
+    def detect_vehicles(self, image_path, scale=1.0):
         """
         Detect vehicles in a single image
 
+        Args:
+            image_path: Image to run inference on
+            scale: Factor mapping `image_path` coordinates back to the
+                original image (for pre-resized images, see preprocess_and_cache)
+
         Returns:
             List of detections: [{'bbox': [x, y, w, h], 'class': 'small-vehicle', 'conf': 0.95}, ...]
         """
@@ -101,7 +218,8 @@ class AutoLabeler:
             conf=self.conf_threshold,
             iou=self.iou_threshold,
             classes=list(VEHICLE_CLASSES.keys()),  # Only detect vehicles
-            device=self.device,
+            imgsz=self.imgsz,
+            device=self.predict_device,
             verbose=False
         )
 
@@ -112,7 +230,7 @@ class AutoLabeler:
             result = results[0]
 
             if result.boxes is not None and len(result.boxes) > 0:
-                boxes = result.boxes.xyxy.cpu().numpy()  # [x1, y1, x2, y2]
+                boxes = result.boxes.xyxy.cpu().numpy() * scale  # [x1, y1, x2, y2] in original pixels
                 confs = result.boxes.conf.cpu().numpy()
                 classes = result.boxes.cls.cpu().numpy().astype(int)
 
@@ -145,7 +263,7 @@ class AutoLabeler:
 
         return detections
 
-    def label_directory(self, input_dir, output_dir=None, dataset_name="auto_labeled"):
+    def label_directory(self, input_dir, output_dir=None, dataset_name="auto_labeled", pre_resize=None, workers=1):
         """
         Auto-label all images in a directory
 
@@ -153,6 +271,9 @@ class AutoLabeler:
             input_dir: Directory containing images
             output_dir: Output directory (default: data/raw/auto_labeled)
             dataset_name: Dataset name for COCO info
+            pre_resize: If set, run inference on cached copies resized to this
+                long edge (see preprocess_and_cache)
+            workers: Number of labeling processes (each writes its own JSONL shard)
         """
         input_dir = Path(input_dir)
         if output_dir is None:
@@ -180,129 +301,93 @@ class AutoLabeler:
             print("⚠️  No images found!")
             return False
 
-        # Initialize COCO format
-        coco_data = {
-            "info": {
-                "description": f"Auto-labeled Dataset - {dataset_name}",
-                "url": "",
-                "version": "1.0",
-                "year": datetime.now().year,
-                "contributor": "YOLOv8 Auto-Labeler",
-                "date_created": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            },
-            "licenses": [],
-            "images": [],
-            "annotations": [],
-            "categories": [
-                {
-                    "id": 1,
-                    "name": "small-vehicle",
-                    "supercategory": "vehicle"
-                },
-                {
-                    "id": 2,
-                    "name": "large-vehicle",
-                    "supercategory": "vehicle"
-                }
-            ]
-        }
-
-        # Process each image
-        annotation_id = 1
-        image_id = 1
-        total_vehicles = 0
+        # Pass 1: content-hash dedupe (same tile under different names,
+        # e.g. overlapping DOTA splits) before any decode/inference/copy
+        hashes = {}
+        seen_hashes = set()
+        unique_files = []
+        for image_path in tqdm(image_files, desc="Hashing"):
+            key = content_hash(image_path)
+            if key in seen_hashes:
+                continue
+            seen_hashes.add(key)
+            hashes[image_path] = key
+            unique_files.append(image_path)
+
+        if len(unique_files) < len(image_files):
+            print(f"   Skipping {len(image_files) - len(unique_files)} duplicate images")
+        image_files = unique_files
 
         # Create images output directory
         images_output_dir = output_dir / "images"
         images_output_dir.mkdir(parents=True, exist_ok=True)
 
+        # Pre-resize large tiles once (cached across runs)
+        resized = preprocess_and_cache(image_files, imgsz=pre_resize, hashes=hashes) if pre_resize else {}
+
+        # Pass 2: detect + copy unique images, one JSONL shard per worker
         print(f"\n🔍 Processing images...")
         print(f"   Saving to: {output_dir}/")
 
-        for image_path in tqdm(image_files, desc="Auto-labeling"):
-            # Detect vehicles
-            detections = self.detect_vehicles(image_path)
-
-            if len(detections) == 0:
-                continue  # Skip images with no detections
-
-            # Read image to get dimensions
-            img = cv2.imread(str(image_path))
-            if img is None:
-                continue
-
-            height, width = img.shape[:2]
-
-            # Copy image to output directory
-            output_image_path = images_output_dir / image_path.name
-            if not output_image_path.exists():
-                import shutil
-                shutil.copy2(image_path, output_image_path)
-
-            # Add image to COCO
-            coco_data["images"].append({
-                "id": image_id,
-                "file_name": image_path.name,
-                "width": width,
-                "height": height
-            })
-
-            # Add annotations
-            for detection in detections:
-                bbox = detection['bbox']
-                category_name = detection['class']
-                category_id = CUSTOM_CLASSES[category_name]
-
-                coco_data["annotations"].append({
-                    "id": annotation_id,
-                    "image_id": image_id,
-                    "category_id": category_id,
-                    "bbox": bbox,
-                    "area": bbox[2] * bbox[3],
-                    "iscrowd": 0,
-                    "confidence": detection['confidence']
-                })
+        shards_dir = output_dir / "shards"
+        shards_dir.mkdir(parents=True, exist_ok=True)
+
+        workers = max(1, min(workers, len(image_files)))
+        chunk_size = (len(image_files) + workers - 1) // workers
+        shard_jobs = []
+        for k in range(workers):
+            chunk = image_files[k * chunk_size:(k + 1) * chunk_size]
+            shard_jobs.append((
+                self.config,
+                chunk,
+                {path: resized[path] for path in chunk if path in resized},
+                images_output_dir,
+                shards_dir / f"annotations_shard_{k}.jsonl"
+            ))
+
+        if workers == 1:
+            _, chunk, chunk_resized, _, shard_path = shard_jobs[0]
+            self.label_images_to_shard(chunk, chunk_resized, images_output_dir, shard_path)
+        else:
+            # spawn: each worker loads its own model (MPS is not fork-safe)
+            print(f"   Workers: {workers}")
+            with multiprocessing.get_context('spawn').Pool(workers) as pool:
+                pool.map(_label_shard_worker, shard_jobs)
 
-                annotation_id += 1
-                total_vehicles += 1
+        # Merge shards into the final COCO JSON
+        annotations_path = output_dir / "annotations.json"
+        shard_paths = [job[-1] for job in shard_jobs]
+        stats = merge_shards(shard_paths, annotations_path, dataset_name)
 
-            image_id += 1
+        for shard_path in shard_paths:
+            shard_path.unlink()
+        shards_dir.rmdir()
 
-        # Save COCO JSON
-        annotations_path = output_dir / "annotations.json"
-        with open(annotations_path, 'w') as f:
-            json.dump(coco_data, f, indent=2)
+        num_images = stats['num_images']
+        total_vehicles = stats['num_annotations']
 
         # Summary
         print("\n" + "=" * 60)
         print("📊 Auto-labeling Results")
         print("=" * 60)
-        print(f"\n✓ Images with detections: {len(coco_data['images'])}")
+        print(f"\n✓ Images with detections: {num_images}")
         print(f"✓ Total vehicles detected: {total_vehicles}")
-        print(f"✓ Average vehicles per image: {total_vehicles / len(coco_data['images']):.1f}")
 
-        # Class distribution
-        class_counts = {}
-        for ann in coco_data['annotations']:
-            cat_id = ann['category_id']
-            cat_name = next(c['name'] for c in coco_data['categories'] if c['id'] == cat_id)
-            class_counts[cat_name] = class_counts.get(cat_name, 0) + 1
+        if total_vehicles == 0:
+            print(f"\n💾 Saved to: {annotations_path}")
+            return True
+
+        print(f"✓ Average vehicles per image: {total_vehicles / num_images:.1f}")
 
         print(f"\n📈 Class Distribution:")
-        for class_name, count in sorted(class_counts.items()):
+        for class_name, count in sorted(stats['class_counts'].items()):
             percentage = count / total_vehicles * 100
             print(f"   {class_name}: {count} ({percentage:.1f}%)")
 
-        # Confidence distribution
-        confidences = [ann['confidence'] for ann in coco_data['annotations']]
-        avg_conf = np.mean(confidences)
-        min_conf = np.min(confidences)
-        max_conf = np.max(confidences)
-
         print(f"\n🎯 Confidence Statistics:")
-        print(f"   Average: {avg_conf:.3f}")
-        print(f"   Min: {min_conf:.3f}")
-        print(f"   Max: {max_conf:.3f}")
+        print(f"   Average: {stats['conf_sum'] / total_vehicles:.3f}")
+        print(f"   Min: {stats['conf_min']:.3f}")
+        print(f"   Max: {stats['conf_max']:.3f}")
 
         print(f"\n💾 Saved to:")
         print(f"   Images: {images_output_dir}/")
@@ -310,8 +395,157 @@ class AutoLabeler:
 
         return True
 
-def label_dota_dataset(split='train'):
-    """Auto-label DOTA dataset (train/val/test splits)"""
+    def label_images_to_shard(self, image_files, resized, images_output_dir, shard_path):
+        """
+        Detect vehicles in `image_files` and append one JSONL record per image to `shard_path`
+
+        Records hold the image file name, size and detections; COCO ids are
+        assigned later by merge_shards().
+        """
+        num_images = 0
+
+        with open(shard_path, 'w') as shard:
+            for image_path in tqdm(image_files, desc=f"Auto-labeling ({Path(shard_path).stem})"):
+                # Detect vehicles
+                inference_path, scale = resized.get(image_path, (image_path, 1.0))
+                detections = self.detect_vehicles(inference_path, scale=scale)
+
+                if len(detections) == 0:
+                    continue  # Skip images with no detections
+
+                # Read dimensions from the file header only (no full decode)
+                try:
+                    with Image.open(image_path) as im:
+                        width, height = im.size
+                except OSError:
+                    continue
+
+                # Link / clone image into the output directory
+                output_image_path = images_output_dir / image_path.name
+                if not output_image_path.exists():
+                    fast_clone(image_path, output_image_path, link=True)
+
+                shard.write(json.dumps({
+                    "file_name": image_path.name,
+                    "width": width,
+                    "height": height,
+                    "detections": [
+                        {
+                            "bbox": detection['bbox'],
+                            "category_id": CUSTOM_CLASSES[detection['class']],
+                            "confidence": detection['confidence']
+                        }
+                        for detection in detections
+                    ]
+                }) + "\n")
+                num_images += 1
+
+        return num_images
+
+def _label_shard_worker(job):
+    """Pool worker: build a labeler in this process and label one shard"""
+    config, image_files, resized, images_output_dir, shard_path = job
+    labeler = AutoLabeler(**config)
+    return labeler.label_images_to_shard(image_files, resized, images_output_dir, shard_path)
+
+def _iter_shard_records(shard_paths):
+    for shard_path in shard_paths:
+        with open(shard_path, 'r') as shard:
+            for line in shard:
+                yield json.loads(line)
+
+def merge_shards(shard_paths, annotations_path, dataset_name):
+    """
+    Merge JSONL shards into one COCO JSON with contiguous image/annotation ids
+
+    Streams the output (images pass, then annotations pass) so memory stays
+    bounded by a single record rather than the whole dataset.
+
+    Returns:
+        Summary stats: image/annotation counts, class counts, confidence sum/min/max
+    """
+    info = {
+        "description": f"Auto-labeled Dataset - {dataset_name}",
+        "url": "",
+        "version": "1.0",
+        "year": datetime.now().year,
+        "contributor": "YOLOv8 Auto-Labeler",
+        "date_created": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    }
+    categories = [
+        {"id": category_id, "name": name, "supercategory": "vehicle"}
+        for name, category_id in CUSTOM_CLASSES.items()
+    ]
+    category_names = {category_id: name for name, category_id in CUSTOM_CLASSES.items()}
+
+    stats = {
+        'num_images': 0,
+        'num_annotations': 0,
+        'class_counts': {},
+        'conf_sum': 0.0,
+        'conf_min': float('inf'),
+        'conf_max': float('-inf')
+    }
+
+    with open(annotations_path, 'w') as f:
+        f.write('{"info": ' + json.dumps(info))
+        f.write(', "licenses": [], "categories": ' + json.dumps(categories))
+
+        # Images
+        f.write(', "images": [')
+        for image_id, record in enumerate(_iter_shard_records(shard_paths), start=1):
+            if image_id > 1:
+                f.write(', ')
+            f.write(json.dumps({
+                "id": image_id,
+                "file_name": record['file_name'],
+                "width": record['width'],
+                "height": record['height']
+            }))
+            stats['num_images'] = image_id
+
+        # Annotations (same record order -> same image ids)
+        f.write('], "annotations": [')
+        annotation_id = 1
+        for image_id, record in enumerate(_iter_shard_records(shard_paths), start=1):
+            for detection in record['detections']:
+                bbox = detection['bbox']
+                confidence = detection['confidence']
+
+                if annotation_id > 1:
+                    f.write(', ')
+                f.write(json.dumps({
+                    "id": annotation_id,
+                    "image_id": image_id,
+                    "category_id": detection['category_id'],
+                    "bbox": bbox,
+                    "area": bbox[2] * bbox[3],
+                    "iscrowd": 0,
+                    "confidence": confidence
+                }))
+                annotation_id += 1
+
+                class_name = category_names[detection['category_id']]
+                stats['class_counts'][class_name] = stats['class_counts'].get(class_name, 0) + 1
+                stats['conf_sum'] += confidence
+                stats['conf_min'] = min(stats['conf_min'], confidence)
+                stats['conf_max'] = max(stats['conf_max'], confidence)
+
+        f.write(']}')
+
+    stats['num_annotations'] = annotation_id - 1
+    return stats
+
+def label_dota_dataset(labeler, split='train', pre_resize=1280, workers=1):
+    """
+    Auto-label a DOTA split (train/val/test)
+
+    Args:
+        labeler: Shared AutoLabeler (model is loaded once for all splits)
+        split: DOTA split name
+        pre_resize: Long edge for cached pre-resized tiles (0/None = off)
+        workers: Number of labeling processes
+    """
 
     split_dir = DATA_RAW_DOTA / split / "images"
 
@@ -319,19 +553,14 @@ def label_dota_dataset(split='train'):
         print(f"\n❌ DOTA {split} split not found: {split_dir}")
         return False
 
-    # Initialize auto-labeler
-    labeler = AutoLabeler(
-        model_name='yolov8x.pt',  # Largest model for best accuracy
-        conf_threshold=0.5,  # Moderate threshold
-        device='mps'  # M3 Max GPU
-    )
-
     # Label the split
     output_dir = DATA_AUTO_LABELED / f"dota_{split}"
     labeler.label_directory(
         input_dir=split_dir,
         output_dir=output_dir,
-        dataset_name=f"DOTA-{split.upper()}"
+        dataset_name=f"DOTA-{split.upper()}",
+        pre_resize=pre_resize,
+        workers=workers
     )
 
     return True
@@ -373,8 +602,22 @@ def main():
         '--device',
         type=str,
         default='mps',
-        choices=['mps', 'cuda', 'cpu'],
-        help='Device to run on'
+        choices=['mps', 'ane', 'cuda', 'cpu'],
+        help="Device to run on ('ane' = CoreML export on Apple Neural Engine)"
+    )
+
+    parser.add_argument(
+        '--pre-resize',
+        type=int,
+        default=None,
+        help='Pre-resize images to this long edge once and cache them (DOTA default: 1280, 0 = off)'
+    )
+
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=1,
+        help='Number of labeling processes (each loads its own model)'
     )
 
     args = parser.parse_args()
@@ -383,12 +626,20 @@ def main():
         # Label all DOTA splits
         print("\n🚀 Auto-labeling DOTA dataset...")
 
+        # Load the model once and reuse it across all splits
+        labeler = AutoLabeler(
+            model_name=args.model,
+            conf_threshold=args.conf,
+            device=args.device
+        )
+
         for split in ['train', 'val', 'test']:
             print(f"\n{'='*60}")
             print(f"Processing DOTA {split.upper()} split")
             print(f"{'='*60}")
 
-            if label_dota_dataset(split):
+            pre_resize = 1280 if args.pre_resize is None else args.pre_resize
+            if label_dota_dataset(labeler, split, pre_resize=pre_resize, workers=args.workers):
                 print(f"✓ Successfully labeled DOTA {split} split")
             else:
                 print(f"⚠️  Skipped DOTA {split} split (not found)")
@@ -408,7 +659,9 @@ def main():
         labeler.label_directory(
             input_dir=args.input,
             output_dir=args.output,
-            dataset_name=Path(args.input).name
+            dataset_name=Path(args.input).name,
+            pre_resize=args.pre_resize,
+            workers=args.workers
         )
 
     else:
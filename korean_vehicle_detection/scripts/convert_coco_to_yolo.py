@@ -3,31 +3,275 @@ Convert COCO format annotations to YOLO format for YOLOv8 training
 """
 
 import json
+import os
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from tqdm import tqdm
 
+from _jsonio import load_json
+from _yolo_kernels import coco_to_yolo
+
+try:
+    import ijson  # Streaming JSON parser (C backend if yajl2_c is available)
+except ImportError:
+    ijson = None
+
 PROJECT_ROOT = Path(__file__).parent.parent
 DATA_DIR = PROJECT_ROOT / "data"
 
-def convert_bbox_coco_to_yolo(coco_bbox, img_width, img_height):
+# Threads writing label files (I/O bound: the lines are formatted up front)
+LABEL_WRITE_WORKERS = 16
+
+def convert_bbox_coco_to_yolo(coco_bboxes, img_width, img_height):
+    """
+    Convert COCO bboxes [x, y, width, height] to YOLO format [x_center, y_center, width, height]
+
+    Works on a single bbox or an (N, 4) array. All values are normalized
+    and clipped to [0, 1].
+    """
+    bboxes = np.asarray(coco_bboxes, dtype=np.float64)
+    flat = bboxes.reshape(-1, 4)
+    wh = np.broadcast_to(np.array([img_width, img_height], dtype=np.float64), (len(flat), 2))
+    return coco_to_yolo(flat, wh).reshape(bboxes.shape)
+
+def _sort_by_image(image_ids, category_ids, bboxes):
+    """Group annotation arrays by image id (stable: keeps file order within an image)"""
+    order = np.argsort(image_ids, kind='stable')
+    return {
+        'image_id': image_ids[order],
+        'category_id': category_ids[order],
+        'bbox': bboxes[order]
+    }
+
+def _annotation_signature(ann_file):
+    stat = ann_file.stat()
+    return np.array([stat.st_mtime_ns, stat.st_size], dtype=np.int64)
+
+def _load_annotation_cache(cache_file, sig):
+    """Return (categories, images, annotations) from the .npz cache, or None if stale"""
+    if not cache_file.exists():
+        return None
+
+    try:
+        with np.load(cache_file) as cache:
+            if not np.array_equal(cache['sig'], sig):
+                return None
+
+            categories = json.loads(cache['categories'].item())
+            images = [
+                {'id': img_id, 'file_name': file_name, 'width': width, 'height': height}
+                for img_id, file_name, width, height in zip(
+                    cache['img_ids'].tolist(), cache['img_file_names'].tolist(),
+                    cache['img_widths'].tolist(), cache['img_heights'].tolist()
+                )
+            ]
+            annotations = {
+                'image_id': cache['ann_image_ids'],
+                'category_id': cache['ann_category_ids'],
+                'bbox': cache['ann_bboxes']
+            }
+    except (OSError, ValueError, KeyError):
+        return None  # Corrupt or old-format cache: re-parse
+
+    return categories, images, annotations
+
+def _save_annotation_cache(cache_file, sig, categories, images, annotations):
+    try:
+        np.savez(
+            cache_file,
+            sig=sig,
+            categories=np.array(json.dumps(categories)),
+            img_ids=np.array([img['id'] for img in images], dtype=np.int64),
+            img_file_names=np.array([img['file_name'] for img in images], dtype=str),
+            img_widths=np.array([img['width'] for img in images]),
+            img_heights=np.array([img['height'] for img in images]),
+            ann_image_ids=annotations['image_id'],
+            ann_category_ids=annotations['category_id'],
+            ann_bboxes=annotations['bbox']
+        )
+    except OSError as e:
+        print(f"   ⚠️  Could not write annotation cache: {e}")
+
+def load_coco_annotations(ann_file):
+    """
+    Load categories, images and annotations from a COCO JSON (cached)
+
+    The parsed arrays are cached next to the JSON as annotations.cache.npz,
+    keyed by the JSON's mtime and size, so unchanged splits skip parsing.
+    """
+    ann_file = Path(ann_file)
+    cache_file = ann_file.with_name(ann_file.stem + '.cache.npz')
+    sig = _annotation_signature(ann_file)
+
+    cached = _load_annotation_cache(cache_file, sig)
+    if cached is not None:
+        print(f"   ⚡ Loaded parsed annotations from cache: {cache_file.name}")
+        return cached
+
+    categories, images, annotations = parse_coco_annotations(ann_file)
+    _save_annotation_cache(cache_file, sig, categories, images, annotations)
+    return categories, images, annotations
+
+def parse_coco_annotations(ann_file):
+    """
+    Parse categories, images and annotations from a COCO JSON
+
+    Annotations are kept as parallel NumPy arrays (structure of arrays)
+    sorted by image id, instead of one Python dict per annotation.
+    With ijson installed the file is streamed section by section, so the
+    full dict tree of the file is never held in memory at once.
+
+    Returns:
+        (categories, images, annotations) where annotations is
+        {'image_id': (N,), 'category_id': (N,), 'bbox': (N, 4)}
+    """
+    if ijson is None:
+        coco_data = load_json(ann_file)
+        anns = coco_data['annotations']
+
+        image_ids = np.empty(len(anns), dtype=np.int64)
+        category_ids = np.empty(len(anns), dtype=np.int64)
+        bboxes = np.empty((len(anns), 4), dtype=np.float64)
+        for i, ann in enumerate(anns):
+            image_ids[i] = ann['image_id']
+            category_ids[i] = ann['category_id']
+            bboxes[i] = ann['bbox']
+
+        annotations = _sort_by_image(image_ids, category_ids, bboxes)
+        return coco_data['categories'], coco_data['images'], annotations
+
+    with open(ann_file, 'rb') as f:
+        categories = list(ijson.items(f, 'categories.item', use_float=True))
+    with open(ann_file, 'rb') as f:
+        images = list(ijson.items(f, 'images.item', use_float=True))
+
+    # Count is unknown while streaming: collect flat scalars, convert once
+    image_ids = []
+    category_ids = []
+    bboxes = []
+    with open(ann_file, 'rb') as f:
+        for ann in ijson.items(f, 'annotations.item', use_float=True):
+            image_ids.append(ann['image_id'])
+            category_ids.append(ann['category_id'])
+            bboxes.extend(ann['bbox'])
+
+    annotations = _sort_by_image(
+        np.asarray(image_ids, dtype=np.int64),
+        np.asarray(category_ids, dtype=np.int64),
+        np.asarray(bboxes, dtype=np.float64).reshape(-1, 4)
+    )
+    return categories, images, annotations
+
+def _write_label_file(label_file, data):
+    """Write bytes with a raw fd (no Path/TextIOWrapper overhead)"""
+    fd = os.open(label_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        os.write(fd, data)
+    finally:
+        os.close(fd)
+
+def _write_one_label(img_info, label_lines, row_ranges, labels_dir):
+    """
+    Write the YOLO label file for one image
+
+    Returns:
+        True if the image had annotations, False if an empty label was written
+    """
+    # Get label file path (same name as image but .txt extension)
+    label_file = labels_dir / (Path(img_info['file_name']).stem + '.txt')
+
+    # This image's lines of the split-wide formatted label array
+    start, end = row_ranges[img_info['id']]
+
+    if start == end:
+        # Create empty label file
+        _write_label_file(label_file, b'')
+        return False
+
+    _write_label_file(label_file, b''.join(label_lines[start:end].tolist()))
+    return True
+
+def format_label_lines(label_rows):
     """
-    Convert COCO bbox [x, y, width, height] to YOLO format [x_center, y_center, width, height]
-    All values normalized to [0, 1]
+    Format all YOLO label lines of a split in one vectorized pass
+
+    Args:
+        label_rows: (N, 5) [class, x_c, y_c, w, h] array (build_label_rows)
+
+    Returns:
+        (N,) bytes array, one newline-terminated line per row
     """
-    x, y, w, h = coco_bbox
+    # YOLO format: <class_id> <x_center> <y_center> <width> <height>
+    line = np.char.mod('%d', label_rows[:, 0].astype(np.int64))
+    for col in range(1, 5):
+        line = np.char.add(line, np.char.mod(' %.6f', label_rows[:, col]))
+    return np.char.add(line, '\n').astype(np.bytes_)
 
-    # Calculate center coordinates
-    x_center = (x + w / 2) / img_width
-    y_center = (y + h / 2) / img_height
+def build_label_rows(images, annotations, category_map):
+    """
+    Convert every annotation of a split in one kernel call
 
-    # Normalize width and height
-    width = w / img_width
-    height = h / img_height
+    Args:
+        images: COCO image dicts
+        annotations: Annotation arrays sorted by image id (load_coco_annotations)
+        category_map: COCO category id -> YOLO class index
 
-    return x_center, y_center, width, height
+    Returns:
+        (label_rows, row_ranges): (N, 5) [class, x_c, y_c, w, h] array with
+        rows grouped by image, and {image_id: (start, end)} into it
+    """
+    # One pass over the images for ids and sizes
+    img_ids = np.empty(len(images), dtype=np.int64)
+    img_wh = np.empty((len(images), 2), dtype=np.float64)
+    for i, img_info in enumerate(images):
+        img_ids[i] = img_info['id']
+        img_wh[i] = (img_info['width'], img_info['height'])
+
+    # Normalizing by a 0 size would write inf/NaN labels
+    unsized = ~(img_wh > 0).all(axis=1)
+    if unsized.any():
+        raise ValueError(
+            f"{int(unsized.sum())} images have no width/height (e.g. id {int(img_ids[unsized][0])}); "
+            f"re-run preprocess_data.py to write their sizes"
+        )
+
+    # Match each annotation to its image (annotations of unknown images are dropped)
+    ann_img_ids = annotations['image_id']
+    img_order = np.argsort(img_ids, kind='stable')
+    sorted_img_ids = img_ids[img_order]
+    pos = np.minimum(np.searchsorted(sorted_img_ids, ann_img_ids), max(len(img_ids) - 1, 0))
+    known = sorted_img_ids[pos] == ann_img_ids if len(img_ids) else np.zeros(len(ann_img_ids), dtype=bool)
+
+    ann_img_ids = ann_img_ids[known]
+    wh = img_wh[img_order][pos[known]]
+
+    # COCO category id -> YOLO class via a sorted lookup table
+    cat_keys = np.array(sorted(category_map), dtype=np.int64)
+    cat_values = np.array([category_map[k] for k in cat_keys.tolist()], dtype=np.float64)
+    category_ids = annotations['category_id'][known]
+    cat_pos = np.minimum(np.searchsorted(cat_keys, category_ids), max(len(cat_keys) - 1, 0))
+    if len(category_ids) and not np.array_equal(cat_keys[cat_pos], category_ids):
+        raise KeyError(f"Unknown category ids: {sorted(set(category_ids.tolist()) - set(category_map))}")
+
+    yolo = coco_to_yolo(annotations['bbox'][known], wh)
+    label_rows = np.column_stack([cat_values[cat_pos], yolo])
+
+    # Rows are already grouped by image: each image's slice is [start, end)
+    starts = np.searchsorted(ann_img_ids, img_ids, side='left')
+    ends = np.searchsorted(ann_img_ids, img_ids, side='right')
+    row_ranges = dict(zip(img_ids.tolist(), zip(starts.tolist(), ends.tolist())))
+
+    return label_rows, row_ranges
+
+def convert_split_to_yolo(split_name, workers=None):
+    """
+    Convert a single split (train/val/test) from COCO to YOLO format
 
-def convert_split_to_yolo(split_name):
-    """Convert a single split (train/val/test) from COCO to YOLO format"""
+    Args:
+        split_name: Split directory name under data/
+        workers: Label-writing threads (default: LABEL_WRITE_WORKERS)
+    """
 
     split_dir = DATA_DIR / split_name
     ann_file = split_dir / "annotations.json"
@@ -42,69 +286,26 @@ def convert_split_to_yolo(split_name):
     print(f"{'='*60}")
 
     # Load COCO annotations
-    with open(ann_file, 'r') as f:
-        coco_data = json.load(f)
+    categories, images, annotations = load_coco_annotations(ann_file)
 
     # Create category ID to index mapping (0-indexed for YOLO)
-    category_map = {cat['id']: idx for idx, cat in enumerate(coco_data['categories'])}
-
-    # Create image ID to image info mapping
-    image_map = {img['id']: img for img in coco_data['images']}
-
-    # Group annotations by image ID
-    annotations_by_image = {}
-    for ann in coco_data['annotations']:
-        img_id = ann['image_id']
-        if img_id not in annotations_by_image:
-            annotations_by_image[img_id] = []
-        annotations_by_image[img_id].append(ann)
-
-    # Convert each image's annotations
-    converted_count = 0
-    skipped_count = 0
-
-    for img_info in tqdm(coco_data['images'], desc=f"  Converting {split_name}"):
-        img_id = img_info['id']
-        file_name = img_info['file_name']
-        img_width = img_info['width']
-        img_height = img_info['height']
-
-        # Get label file path (same name as image but .txt extension)
-        label_file = labels_dir / (Path(file_name).stem + '.txt')
-
-        # Get annotations for this image
-        anns = annotations_by_image.get(img_id, [])
-
-        if not anns:
-            # Create empty label file
-            label_file.write_text('')
-            skipped_count += 1
-            continue
-
-        # Convert annotations to YOLO format
-        yolo_lines = []
-        for ann in anns:
-            # Get category index (0-indexed)
-            cat_idx = category_map[ann['category_id']]
-
-            # Convert bbox
-            x_center, y_center, width, height = convert_bbox_coco_to_yolo(
-                ann['bbox'], img_width, img_height
-            )
-
-            # Ensure values are within [0, 1]
-            x_center = max(0.0, min(1.0, x_center))
-            y_center = max(0.0, min(1.0, y_center))
-            width = max(0.0, min(1.0, width))
-            height = max(0.0, min(1.0, height))
-
-            # YOLO format: <class_id> <x_center> <y_center> <width> <height>
-            yolo_line = f"{cat_idx} {x_center:.6f} {y_center:.6f} {width:.6f} {height:.6f}"
-            yolo_lines.append(yolo_line)
-
-        # Write label file
-        label_file.write_text('\n'.join(yolo_lines) + '\n')
-        converted_count += 1
+    category_map = {cat['id']: idx for idx, cat in enumerate(categories)}
+
+    # Convert all bboxes at once, then write one label file per image in parallel
+    label_rows, row_ranges = build_label_rows(images, annotations, category_map)
+    label_lines = format_label_lines(label_rows)
+
+    # Only file writes are left (they release the GIL), so threads share
+    # the formatted lines instead of pickling them into processes
+    with ThreadPoolExecutor(max_workers=workers or LABEL_WRITE_WORKERS) as executor:
+        results = list(tqdm(
+            executor.map(lambda img_info: _write_one_label(img_info, label_lines, row_ranges, labels_dir), images),
+            total=len(images),
+            desc=f"  Converting {split_name}"
+        ))
+
+    converted_count = sum(results)
+    skipped_count = len(results) - converted_count
 
     print(f"\n   ✓ Converted: {converted_count} images")
     print(f"   ⏭️  Empty labels: {skipped_count}")
@@ -128,13 +329,11 @@ def main():
     print(f"✅ Total images converted: {total_converted}")
     print("=" * 60)
 
-    # Print category information
-    ann_file = DATA_DIR / "train" / "annotations.json"
-    with open(ann_file, 'r') as f:
-        coco_data = json.load(f)
+    # Print category information (served from the annotation cache written above)
+    categories, _, _ = load_coco_annotations(DATA_DIR / "train" / "annotations.json")
 
     print("\n📋 Class mapping for YOLO:")
-    for idx, cat in enumerate(coco_data['categories']):
+    for idx, cat in enumerate(categories):
         print(f"   {idx}: {cat['name']}")
     print()
 
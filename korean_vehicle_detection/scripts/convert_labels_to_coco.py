@@ -4,12 +4,20 @@ Processes manual labels from sample_image1 and sample_image2
 """
 
 import os
-import json
-import xml.etree.ElementTree as ET
 from pathlib import Path
+from multiprocessing import Pool
+from concurrent.futures import ThreadPoolExecutor
 from PIL import Image
 from datetime import datetime
 
+from _fileops import fast_clone
+from _jsonio import dump_json
+
+try:
+    from lxml import etree as ET  # C parser, streams with iterparse
+except ImportError:
+    import xml.etree.ElementTree as ET
+
 # Project paths
 PROJECT_ROOT = Path(__file__).parent.parent
 LABELING_DIR = PROJECT_ROOT / "data" / "labeling"
@@ -31,6 +39,43 @@ CLASSES = {
     2: "large-vehicle"
 }
 
+def _parse_object(obj, warnings):
+    """
+    Parse one LabelImg <object> element
+
+    Returns None (and appends a message to `warnings`) if it should be skipped.
+    """
+    name = obj.findtext('name').lower()
+
+    # Map class
+    if name not in CLASS_MAPPING:
+        warnings.append(f"Unknown class: {name}, skipping")
+        return None
+
+    class_id = CLASS_MAPPING[name]
+
+    # Bounding box
+    bndbox = obj.find('bndbox')
+    xmin = float(bndbox.findtext('xmin'))
+    ymin = float(bndbox.findtext('ymin'))
+    xmax = float(bndbox.findtext('xmax'))
+    ymax = float(bndbox.findtext('ymax'))
+
+    # Convert to COCO format [x, y, width, height]
+    bbox_width = xmax - xmin
+    bbox_height = ymax - ymin
+
+    if bbox_width <= 0 or bbox_height <= 0:
+        warnings.append(f"Invalid bbox: {xmin},{ymin},{xmax},{ymax}, skipping")
+        return None
+
+    return {
+        "class_id": class_id,
+        "class_name": CLASSES[class_id],
+        "bbox": [xmin, ymin, bbox_width, bbox_height],
+        "area": bbox_width * bbox_height
+    }
+
 def parse_xml_annotation(xml_file: Path):
     """
     Parse LabelImg XML format
@@ -53,54 +98,38 @@ def parse_xml_annotation(xml_file: Path):
         </object>
     </annotation>
     """
-    tree = ET.parse(xml_file)
-    root = tree.getroot()
-
-    # Image info
-    filename = root.find('filename').text
-    size = root.find('size')
-    width = int(size.find('width').text)
-    height = int(size.find('height').text)
-
-    # Objects
+    filename = None
+    width = height = None
     objects = []
-    for obj in root.findall('object'):
-        name = obj.find('name').text.lower()
+    warnings = []  # Printed by the caller (this runs in pool workers)
 
-        # Map class
-        if name not in CLASS_MAPPING:
-            print(f"  ⚠️  Unknown class: {name}, skipping")
-            continue
+    # Stream elements instead of building the whole tree, clearing each
+    # <object> once it has been read so memory stays flat
+    for _, elem in ET.iterparse(str(xml_file), events=('end',)):
+        if elem.tag == 'filename':
+            filename = elem.text
 
-        class_id = CLASS_MAPPING[name]
+        elif elem.tag == 'size':
+            # Image info
+            width = int(elem.findtext('width'))
+            height = int(elem.findtext('height'))
 
-        # Bounding box
-        bndbox = obj.find('bndbox')
-        xmin = float(bndbox.find('xmin').text)
-        ymin = float(bndbox.find('ymin').text)
-        xmax = float(bndbox.find('xmax').text)
-        ymax = float(bndbox.find('ymax').text)
+        elif elem.tag == 'object':
+            obj = _parse_object(elem, warnings)
+            if obj is not None:
+                objects.append(obj)
 
-        # Convert to COCO format [x, y, width, height]
-        bbox_width = xmax - xmin
-        bbox_height = ymax - ymin
-
-        if bbox_width <= 0 or bbox_height <= 0:
-            print(f"  ⚠️  Invalid bbox: {xmin},{ymin},{xmax},{ymax}, skipping")
-            continue
-
-        objects.append({
-            "class_id": class_id,
-            "class_name": CLASSES[class_id],
-            "bbox": [xmin, ymin, bbox_width, bbox_height],
-            "area": bbox_width * bbox_height
-        })
+            elem.clear()
+            if hasattr(elem, 'getprevious'):  # lxml: drop processed siblings too
+                while elem.getprevious() is not None:
+                    del elem.getparent()[0]
 
     return {
         "filename": filename,
         "width": width,
         "height": height,
-        "objects": objects
+        "objects": objects,
+        "warnings": warnings
     }
 
 def create_coco_dataset():
@@ -150,13 +179,16 @@ def create_coco_dataset():
 
     annotation_id = 1
 
-    # Process each XML file
+    # Parse all XML files in parallel (parse_xml_annotation is pure)
     print("\n📝 Processing labels...")
-    for image_id, xml_file in enumerate(xml_files, start=1):
-        print(f"\n{image_id}. {xml_file.name}")
+    with Pool() as pool:
+        parsed_list = pool.map(parse_xml_annotation, xml_files)
 
-        # Parse XML
-        parsed = parse_xml_annotation(xml_file)
+    # Merge in file order so image/annotation ids stay deterministic
+    for image_id, (xml_file, parsed) in enumerate(zip(xml_files, parsed_list), start=1):
+        print(f"\n{image_id}. {xml_file.name}")
+        for warning in parsed["warnings"]:
+            print(f"  ⚠️  {warning}")
 
         # Add image info
         image_path = IMAGES_DIR / parsed["filename"]
@@ -192,19 +224,27 @@ def create_coco_dataset():
 
     # Save COCO JSON
     output_json = OUTPUT_DIR / "annotations.json"
-    with open(output_json, 'w') as f:
-        json.dump(coco_data, f, indent=2)
+    dump_json(coco_data, output_json)
 
     # Copy images
     images_output = OUTPUT_DIR / "images"
     images_output.mkdir(exist_ok=True)
 
-    for img_info in coco_data["images"]:
-        src = IMAGES_DIR / img_info["file_name"]
-        dst = images_output / img_info["file_name"]
-        if src.exists() and not dst.exists():
-            import shutil
-            shutil.copy2(src, dst)
+    # Hardlink the labeler's originals (no data copy); fast_clone falls back
+    # to a real copy across filesystems
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        futures = {}
+        for img_info in coco_data["images"]:
+            src = IMAGES_DIR / img_info["file_name"]
+            dst = images_output / img_info["file_name"]
+            if src.exists() and not dst.exists():
+                futures[executor.submit(fast_clone, src, dst, True)] = dst.name
+
+        for future, name in futures.items():
+            try:
+                future.result()
+            except OSError as e:
+                print(f"   ⚠️  Could not copy {name}: {e}")
 
     # Statistics
     print("\n" + "=" * 60)
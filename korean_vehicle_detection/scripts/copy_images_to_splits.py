@@ -1,16 +1,27 @@
 """
 Copy images from raw directories to train/val/test directories
+
+By default images are symlinked and a data/{split}.txt manifest is written,
+plus data/data_manifests.yaml (data.yaml pointing YOLO at the manifests);
+use --materialize for real copies. data.yaml itself keeps the
+data/{split}/images directories, which every split writer fills.
 """
 
+import os
 import json
-import shutil
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from tqdm import tqdm
 
+from _fileops import fast_clone
+
 PROJECT_ROOT = Path(__file__).parent.parent
 DATA_DIR = PROJECT_ROOT / "data"
 DATA_RAW = DATA_DIR / "raw"
 
+# Concurrent image copies
+COPY_WORKERS = 32
+
 # Source directories where images are located
 SOURCE_DIRS = [
     DATA_RAW / "roboflow" / "dota" / "train",
@@ -25,26 +36,111 @@ SOURCE_DIRS = [
     DATA_DIR / "manual_labeled" / "images",
 ]
 
-def find_image_file(file_name, source_dirs):
-    """Find image file in source directories"""
+def build_image_index(source_dirs):
+    """
+    Index every file under the source directories by file name (single walk)
+
+    Earlier source directories win, and within a directory shallower files
+    win, matching the old per-image direct-path-then-rglob lookup order.
+    """
+    index = {}
     for source_dir in source_dirs:
         if not source_dir.exists():
             continue
 
-        # Try direct path
-        image_path = source_dir / file_name
-        if image_path.exists():
-            return image_path
+        for dirpath, _, filenames in os.walk(source_dir):
+            for name in filenames:
+                index.setdefault(name, Path(dirpath) / name)
+
+    return index
+
+def find_image_file(file_name, image_index):
+    """Find image file in the prebuilt source index"""
+    return image_index.get(file_name)
+
+def is_current_copy(source_path, entry):
+    """
+    Check whether a placed image (os.DirEntry in the split) matches its source
+
+    Same size plus either the same inode (symlink/hardlink) or the same
+    mtime (copies keep it via copystat). Truncated or stale files fail.
+    """
+    try:
+        dest_stat = entry.stat()  # Follows symlinks
+    except FileNotFoundError:  # Dangling symlink
+        return False
+
+    source_stat = os.stat(source_path)
+    if source_stat.st_size != dest_stat.st_size:
+        return False
+
+    return (
+        (source_stat.st_dev, source_stat.st_ino) == (dest_stat.st_dev, dest_stat.st_ino)
+        or source_stat.st_mtime_ns == dest_stat.st_mtime_ns
+    )
+
+def symlink_image(source_path, dest_path):
+    """Place an image in a split without copying its bytes"""
+    os.symlink(Path(source_path).resolve(), dest_path)
+
+def write_split_manifest(split_name, images_dir, file_names):
+    """
+    Write data/{split}.txt listing the split's images (absolute paths)
+
+    Paths point into data/{split}/images/, so YOLO still resolves labels
+    from data/{split}/labels/.
+    """
+    manifest_path = DATA_DIR / f"{split_name}.txt"
+    lines = [
+        str((images_dir / file_name).absolute())
+        for file_name in file_names
+        if (images_dir / file_name).exists()
+    ]
+    manifest_path.write_text('\n'.join(lines) + '\n' if lines else '')
+    return manifest_path, len(lines)
+
+def write_manifest_yaml(manifest_paths):
+    """
+    Write data/data_manifests.yaml: data.yaml with path/train/val/test
+    pointing at this run's split manifests
+
+    Only the key lines are rewritten, so class names and comments stay in
+    sync with data.yaml.
+    """
+    yaml_path = DATA_DIR / "data_manifests.yaml"
+    overrides = {'path': str(DATA_DIR.absolute())}
+    overrides.update(
+        (split_name, manifest_path.name)
+        for split_name, manifest_path in manifest_paths.items()
+        if manifest_path is not None
+    )
 
-        # Try recursive search
-        found = list(source_dir.rglob(file_name))
-        if found:
-            return found[0]
+    lines = []
+    for line in (PROJECT_ROOT / "data.yaml").read_text().splitlines():
+        key = line.split(':', 1)[0]
+        if key in overrides:
+            line = f"{key}: {overrides[key]}"
+        lines.append(line)
 
-    return None
+    yaml_path.write_text('\n'.join(lines) + '\n')
+    return yaml_path
 
-def copy_images_for_split(split_name):
-    """Copy images for a specific split (train/val/test)"""
+def copy_images_for_split(split_name, image_index, materialize=False, link=False):
+    """
+    Place images for a specific split (train/val/test) and write its manifest
+
+    By default images are symlinked to their source (no image bytes are
+    written); with `materialize=True` they are copied for a portable dataset.
+
+    Args:
+        split_name: Split directory name under data/
+        image_index: File name -> source path index (build_image_index)
+        materialize: Copy image bodies instead of symlinking
+        link: When materializing, hardlink instead of copying when possible
+
+    Returns:
+        (manifest path or None if the split has no annotations, all images found)
+    """
 
     split_dir = DATA_DIR / split_name
     ann_file = split_dir / "annotations.json"
@@ -52,7 +148,7 @@ def copy_images_for_split(split_name):
 
     if not ann_file.exists():
         print(f"❌ Annotations not found: {ann_file}")
-        return False
+        return None, False
 
     images_dir.mkdir(parents=True, exist_ok=True)
 
@@ -67,57 +163,112 @@ def copy_images_for_split(split_name):
     print(f"   Images to copy: {len(data['images'])}")
     print(f"   Target directory: {images_dir}/")
 
-    # Copy each image
-    copied = 0
+    # Resolve sources first, then copy with many copies in flight
+    copy_jobs = []
     skipped_exists = 0
+    replaced = 0
     not_found = 0
 
-    for img_info in tqdm(data['images'], desc=f"  Copying {split_name}"):
+    # One directory scan instead of a stat per image
+    with os.scandir(images_dir) as it:
+        existing = {entry.name: entry for entry in it}
+
+    for img_info in data['images']:
         file_name = img_info['file_name']
         dest_path = images_dir / file_name
 
-        # Skip if already copied
-        if dest_path.exists():
-            skipped_exists += 1
-            continue
-
         # Find source image
-        source_path = find_image_file(file_name, SOURCE_DIRS)
+        source_path = find_image_file(file_name, image_index)
+
+        # Skip if already placed and up to date; replace stale/truncated files
+        entry = existing.get(file_name)
+        if entry is not None:
+            if source_path is None or is_current_copy(source_path, entry):
+                skipped_exists += 1
+                continue
+            os.unlink(dest_path)
+            replaced += 1
 
         if source_path is None:
             print(f"   ⚠️  Not found: {file_name}")
             not_found += 1
             continue
 
-        # Copy image
-        try:
-            shutil.copy2(source_path, dest_path)
-            copied += 1
-        except Exception as e:
-            print(f"   ⚠️  Error copying {file_name}: {e}")
-            not_found += 1
+        copy_jobs.append((source_path, dest_path))
+
+    # Copy images (I/O-bound: threads keep the SSD queue busy)
+    copied = 0
+    with ThreadPoolExecutor(max_workers=COPY_WORKERS) as executor:
+        futures = {
+            (
+                executor.submit(fast_clone, source_path, dest_path, link)
+                if materialize
+                else executor.submit(symlink_image, source_path, dest_path)
+            ): dest_path.name
+            for source_path, dest_path in copy_jobs
+        }
+        for future in tqdm(as_completed(futures), total=len(futures), desc=f"  Copying {split_name}"):
+            try:
+                future.result()
+                copied += 1
+            except Exception as e:
+                print(f"   ⚠️  Error copying {futures[future]}: {e}")
+                not_found += 1
+
+    manifest_path, manifest_count = write_split_manifest(
+        split_name, images_dir, [img_info['file_name'] for img_info in data['images']]
+    )
 
-    print(f"\n   ✓ Copied: {copied} images")
+    print(f"\n   ✓ {'Copied' if materialize else 'Linked'}: {copied} images")
+    print(f"   📝 Manifest: {manifest_path} ({manifest_count} images)")
     if skipped_exists > 0:
         print(f"   ⏭️  Skipped (already exists): {skipped_exists}")
+    if replaced > 0:
+        print(f"   🔄 Replaced (stale or truncated): {replaced}")
     if not_found > 0:
         print(f"   ❌ Not found: {not_found} images")
 
-    return not_found == 0
+    return manifest_path, not_found == 0
 
 def main():
     """Main execution"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Copy images into train/val/test splits')
+    parser.add_argument(
+        '--materialize',
+        action='store_true',
+        help='Copy image files into the splits (default: symlink + manifest only)'
+    )
+    parser.add_argument(
+        '--link',
+        action='store_true',
+        help='With --materialize, hardlink instead of copying (shares data with the source files)'
+    )
+    args = parser.parse_args()
 
     print("\n" + "=" * 60)
     print("📦 Copying Images to Train/Val/Test Splits")
     print("=" * 60)
 
+    # Index source images once for all splits
+    print("\n🔍 Indexing source directories...")
+    image_index = build_image_index(SOURCE_DIRS)
+    print(f"   Indexed files: {len(image_index)}")
+
     # Copy for each split
     success = True
+    manifest_paths = {}
     for split in ['train', 'val', 'test']:
-        if not copy_images_for_split(split):
+        manifest_path, split_ok = copy_images_for_split(
+            split, image_index, materialize=args.materialize, link=args.link
+        )
+        manifest_paths[split] = manifest_path
+        if not split_ok:
             success = False
 
+    yaml_path = write_manifest_yaml(manifest_paths)
+
     print("\n" + "=" * 60)
     if success:
         print("✅ All images copied successfully!")
@@ -132,5 +283,8 @@ def main():
             count = len(list(images_dir.glob("*")))
             print(f"   {split}: {count} images")
 
+    print(f"\n📝 YOLO dataset config using the manifests: {yaml_path}")
+    print(f"   (data.yaml reads data/{{split}}/images directly and works as well)")
+
 if __name__ == "__main__":
     main()
@@ -5,14 +5,30 @@ Downloads DOTA dataset from Kaggle and prepares for Korean region filtering
 
 import os
 import sys
-import subprocess
+import time
 from pathlib import Path
 
+from _fileops import create_tar_zst, extract_tar_gz, extract_tar_zst, extract_zip
+
+try:
+    from stream_unzip import stream_unzip  # Extract while the zip is still downloading
+except ImportError:
+    stream_unzip = None
+
 # Project paths
 PROJECT_ROOT = Path(__file__).parent.parent
 DATA_RAW = PROJECT_ROOT / "data" / "raw"
 DATA_RAW.mkdir(parents=True, exist_ok=True)
 
+# Download attempts (exponential backoff between them)
+KAGGLE_RETRIES = 4
+
+# Bytes read from the download stream at a time
+STREAM_CHUNK_SIZE = 1024 * 1024
+
+# Local zstd snapshot of the extracted data (outside data/raw so it isn't archived into itself)
+DOTA_SNAPSHOT = DATA_RAW.parent / "dota_raw.tar.zst"
+
 def check_kaggle_api():
     """Check if Kaggle API is configured"""
     kaggle_json = Path.home() / ".kaggle" / "kaggle.json"
@@ -35,8 +51,61 @@ def check_kaggle_api():
 
     return True
 
-def download_dota_kaggle():
-    """Download DOTA dataset from Kaggle"""
+def stream_extract_dataset(api, dataset, dest):
+    """
+    Stream a Kaggle dataset zip and extract members as bytes arrive
+
+    The zip itself is never written to disk, so peak disk usage is only the
+    extracted files and network transfer overlaps decompression.
+    """
+    owner, name = dataset.split("/")
+    response = api.datasets_download(owner, name, _preload_content=False)
+    dest = dest.resolve()
+
+    try:
+        for file_name, _, chunks in stream_unzip(response.stream(STREAM_CHUNK_SIZE)):
+            target = (dest / file_name.decode("utf-8")).resolve()
+            if dest not in target.parents:
+                raise ValueError(f"Unsafe path in archive: {file_name!r}")
+
+            if file_name.endswith(b"/"):
+                target.mkdir(parents=True, exist_ok=True)
+                for _ in chunks:  # Members must be fully consumed
+                    pass
+                continue
+
+            target.parent.mkdir(parents=True, exist_ok=True)
+            with open(target, "wb") as f:
+                for chunk in chunks:
+                    f.write(chunk)
+    finally:
+        response.release_conn()
+
+def extract_nested_archives(dest):
+    """Unpack .tar.gz archives shipped inside the Kaggle zip (pigz when available)"""
+    for archive in sorted(list(dest.glob("*.tar.gz")) + list(dest.glob("*.tgz"))):
+        print(f"📦 압축 해제 중: {archive.name}")
+        method = extract_tar_gz(archive, dest)
+        print(f"   ✓ {method}")
+        archive.unlink()
+
+def restore_snapshot():
+    """Restore data/raw from the local zstd snapshot instead of re-downloading"""
+    print(f"\n⚡ 로컬 스냅샷에서 복원: {DOTA_SNAPSHOT}")
+    try:
+        extract_tar_zst(DOTA_SNAPSHOT, DATA_RAW)
+    except ImportError as e:
+        print(f"   ⚠️  {e} (pip install zstandard)")
+        return False
+    return True
+
+def download_dota_kaggle(keep_zip=False):
+    """
+    Download DOTA dataset from Kaggle
+
+    With `keep_zip` the archive is left packed in data/raw;
+    filter_korea_region.py then extracts only the in-region files from it.
+    """
 
     if not check_kaggle_api():
         return False
@@ -46,45 +115,72 @@ def download_dota_kaggle():
     print("\n⏳ 예상 시간: 30-60분 (네트워크 속도에 따라 다름)")
     print("📦 예상 크기: ~30-50GB\n")
 
-    # Kaggle dataset download command
-    # Note: Actual dataset name might differ - user needs to find correct Kaggle dataset
     try:
-        # Option 1: DOTA from Kaggle
-        cmd = [
-            "kaggle", "datasets", "download",
-            "-d", "chandlertimm/dota-data",  # Example dataset
-            "-p", str(DATA_RAW),
-            "--unzip"
-        ]
-
-        print(f"💡 실행 명령: {' '.join(cmd)}\n")
-        result = subprocess.run(cmd, check=True, capture_output=True, text=True)
-
-        print("✅ 다운로드 완료!")
-        print(f"📁 데이터 위치: {DATA_RAW}")
-        return True
-
-    except subprocess.CalledProcessError as e:
-        print(f"\n❌ 다운로드 실패!")
-        print(f"에러: {e.stderr}")
-        print("\n🔍 대안 다운로드 방법:")
-        print("\n1. IEEE DataPort (공식):")
-        print("   https://ieee-dataport.org/documents/dota")
-        print("   - 회원가입 후 수동 다운로드")
-        print("\n2. Roboflow Universe:")
-        print("   https://universe.roboflow.com/felipe-coradesque-6gmum/dota-aerial-images")
-        print("   - API를 통한 데이터셋 접근")
-        print("\n3. 공식 웹사이트:")
-        print("   https://captain-whu.github.io/DOTA/dataset.html")
-        print("   - DOTA-v1.0 + DOTA-v2.0 extras 다운로드")
-        return False
-
-    except FileNotFoundError:
-        print("\n❌ Kaggle CLI가 설치되지 않았습니다!")
+        from kaggle.api.kaggle_api_extended import KaggleApi
+    except ImportError:
+        print("\n❌ Kaggle 패키지가 설치되지 않았습니다!")
         print("💡 설치 명령:")
         print("   pip install kaggle")
         return False
 
+    # Call the Kaggle API in-process (no CLI subprocess, live progress)
+    # Note: Actual dataset name might differ - user needs to find correct Kaggle dataset
+    dataset = "chandlertimm/dota-data"  # Example dataset
+    print(f"💡 데이터셋: {dataset}\n")
+
+    api = KaggleApi()
+    api.authenticate()
+
+    # stream_unzip needs the raw response from the (pre-1.7) swagger client
+    streaming = not keep_zip and stream_unzip is not None and hasattr(api, "datasets_download")
+    if not streaming and not keep_zip:
+        print("💡 pip install stream-unzip 로 다운로드와 압축 해제를 동시에 진행할 수 있습니다.\n")
+
+    last_error = None
+    for attempt in range(KAGGLE_RETRIES):
+        try:
+            if streaming:
+                stream_extract_dataset(api, dataset, DATA_RAW)
+            else:
+                # Download the zip, then extract it with a thread pool
+                # (kaggle's own unzip is single-threaded)
+                api.dataset_download_files(dataset, path=str(DATA_RAW), unzip=False, quiet=False, force=False)
+                if keep_zip:
+                    print("✅ 다운로드 완료! (압축 유지)")
+                    return True
+
+                zip_path = DATA_RAW / f"{dataset.split('/')[-1]}.zip"
+                print(f"\n📦 압축 해제 중: {zip_path.name}")
+                extract_zip(zip_path, DATA_RAW)
+                zip_path.unlink()
+
+            extract_nested_archives(DATA_RAW)
+
+            print("✅ 다운로드 완료!")
+            print(f"📁 데이터 위치: {DATA_RAW}")
+            return True
+
+        except Exception as e:
+            last_error = e
+            if attempt < KAGGLE_RETRIES - 1:
+                wait = 2 ** attempt
+                print(f"\n⚠️  다운로드 실패 ({e}), {wait}초 후 재시도 ({attempt + 2}/{KAGGLE_RETRIES})...")
+                time.sleep(wait)
+
+    print(f"\n❌ 다운로드 실패!")
+    print(f"에러: {last_error}")
+    print("\n🔍 대안 다운로드 방법:")
+    print("\n1. IEEE DataPort (공식):")
+    print("   https://ieee-dataport.org/documents/dota")
+    print("   - 회원가입 후 수동 다운로드")
+    print("\n2. Roboflow Universe:")
+    print("   https://universe.roboflow.com/felipe-coradesque-6gmum/dota-aerial-images")
+    print("   - API를 통한 데이터셋 접근")
+    print("\n3. 공식 웹사이트:")
+    print("   https://captain-whu.github.io/DOTA/dataset.html")
+    print("   - DOTA-v1.0 + DOTA-v2.0 extras 다운로드")
+    return False
+
 def check_downloaded_data():
     """Check if DOTA data exists"""
     dota_files = list(DATA_RAW.glob("*.zip")) + list(DATA_RAW.glob("images/"))
@@ -101,6 +197,21 @@ def check_downloaded_data():
 
 def main():
     """Main execution"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Download the DOTA dataset')
+    parser.add_argument(
+        '--snapshot',
+        action='store_true',
+        help=f'After downloading, save a zstd snapshot ({DOTA_SNAPSHOT.name}) for fast re-extraction'
+    )
+    parser.add_argument(
+        '--keep-zip',
+        action='store_true',
+        help='Keep the Kaggle zip packed; filter_korea_region.py extracts only in-region files from it'
+    )
+    args = parser.parse_args()
+
     print("\n" + "=" * 60)
     print("📦 DOTA v2.0 Dataset Download")
     print("=" * 60)
@@ -110,8 +221,14 @@ def main():
         print("\n💡 이미 데이터가 존재합니다. 다시 다운로드하려면 data/raw 폴더를 삭제하세요.")
         return
 
-    # Download from Kaggle
-    success = download_dota_kaggle()
+    # Restore from a local snapshot, else download from Kaggle
+    success = DOTA_SNAPSHOT.exists() and restore_snapshot()
+    if not success:
+        success = download_dota_kaggle(keep_zip=args.keep_zip)
+
+        if success and args.snapshot and not args.keep_zip:
+            print(f"\n💾 스냅샷 저장 중: {DOTA_SNAPSHOT}")
+            create_tar_zst(DATA_RAW, DOTA_SNAPSHOT)
 
     if success:
         print("\n" + "=" * 60)
@@ -6,16 +6,40 @@ Automatically downloads and processes multiple Kaggle datasets for vehicle detec
 import os
 import sys
 import shutil
-import zipfile
-import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 from datetime import datetime
 
+from _download import DEFAULT_CONNECTIONS, download_file, make_session
+from _fileops import extract_zip, walk_sizes
+
 # Project paths
 PROJECT_ROOT = Path(__file__).parent.parent
 DATA_RAW = PROJECT_ROOT / "data" / "raw" / "kaggle"
 DATA_RAW.mkdir(parents=True, exist_ok=True)
 
+# Concurrent dataset downloads (bandwidth / Kaggle rate limits cap the useful number)
+DEFAULT_PARALLEL = 3
+
+# Extracted size relative to the zip (the datasets are mostly JPEG/PNG
+# images, which zip barely compresses); the zip and its extraction exist
+# side by side until the zip is deleted
+EXTRACTED_SIZE_RATIO = 1.0
+
+# Disk space (GB) reserved by downloads in progress, so concurrent downloads
+# don't all count the same free space. Held until a download finishes, so
+# its partly written bytes count twice meanwhile (errs on the safe side).
+_reserved_gb = 0.0
+_reserve_lock = threading.Lock()
+
+# Download attempts when Kaggle rate-limits us (exponential backoff between them)
+KAGGLE_RETRIES = 4
+
+# Kaggle REST endpoint that redirects to a signed, range-capable archive URL
+KAGGLE_DOWNLOAD_URL = "https://www.kaggle.com/api/v1/datasets/download/{}"
+
 # Top Kaggle datasets for aerial vehicle detection
 DATASETS = [
     {
@@ -79,7 +103,66 @@ def check_kaggle_credentials():
     print(f"✓ Kaggle credentials found: {kaggle_json}")
     return True
 
-def download_dataset(dataset_info, skip_existing=True):
+def get_kaggle_api():
+    """
+    Authenticated KaggleApi client, or None if the package is missing
+
+    One client is shared by all downloads so its HTTP connection pool stays
+    warm across datasets (no CLI process per dataset).
+    """
+    try:
+        from kaggle.api.kaggle_api_extended import KaggleApi
+    except ImportError:
+        print(f"\n❌ Kaggle package not found!")
+        print("Install with: pip install kaggle")
+        return None
+
+    api = KaggleApi()
+    api.authenticate()
+    return api
+
+def resolve_download_url(api, kaggle_id, session):
+    """Signed archive URL that the Kaggle download endpoint redirects to"""
+    response = session.get(
+        KAGGLE_DOWNLOAD_URL.format(kaggle_id),
+        auth=(api.config_values['username'], api.config_values['key']),
+        allow_redirects=False,
+        timeout=60
+    )
+    response.raise_for_status()
+    response.close()
+
+    location = response.headers.get('Location')
+    if not response.is_redirect or not location:
+        raise OSError(f"No signed download URL for {kaggle_id}")
+    return location
+
+def fetch_archive(api, kaggle_id, dataset_dir, zip_path, parts):
+    """
+    Download a dataset zip over `parts` concurrent range requests
+
+    Falls back to the Kaggle client's single-connection download if the
+    signed URL can't be resolved or the parallel download fails.
+    """
+    if parts > 1:
+        try:
+            session = make_session(parts)
+            url = resolve_download_url(api, kaggle_id, session)
+            method = download_file(url, zip_path, parts, session)
+            print(f"   ⚡ [{zip_path.stem}] {method}, {parts} parts")
+            return
+        except Exception as e:
+            if '429' in str(e):
+                raise  # Rate limited: let the caller back off
+            print(f"   ⚠️  [{zip_path.stem}] Parallel download unavailable ({e}), using Kaggle API")
+
+    # A failed parallel or aria2c download leaves a full-size, partly
+    # zero-filled zip behind; the Kaggle client would skip the download
+    # as up to date if it found it
+    zip_path.unlink(missing_ok=True)
+    api.dataset_download_files(kaggle_id, path=str(dataset_dir), unzip=False, quiet=False)
+
+def download_dataset(dataset_info, api, skip_existing=True, parts=DEFAULT_CONNECTIONS):
     """Download a single Kaggle dataset"""
 
     name = dataset_info["name"]
@@ -94,6 +177,28 @@ def download_dataset(dataset_info, skip_existing=True):
         print(f"\n⏭️  Skipping {name} (already exists)")
         return True
 
+    # Fail fast if the space this one needs (zip + extraction) is taken,
+    # counting what concurrent downloads have reserved but not written yet
+    zip_gb, extracted_gb = disk_needed_gb(dataset_info)
+    required_gb = zip_gb + extracted_gb
+    available_gb = reserve_disk_gb(required_gb)
+    if available_gb is not None:
+        print(f"\n❌ Not enough disk space for {name}: "
+              f"{available_gb:.1f} GB available, {required_gb:.1f} GB required "
+              f"({zip_gb:.1f} GB zip + {extracted_gb:.1f} GB extracted)")
+        return False
+
+    try:
+        return _download_reserved(dataset_info, api, dataset_dir, dataset_slug, parts)
+    finally:
+        # Everything is on disk (or deleted) now; free_disk_gb() accounts for it
+        release_disk_gb(required_gb)
+
+def _download_reserved(dataset_info, api, dataset_dir, dataset_slug, parts):
+    """download_dataset after its disk space has been reserved"""
+    name = dataset_info["name"]
+    kaggle_id = dataset_info["kaggle_id"]
+
     dataset_dir.mkdir(parents=True, exist_ok=True)
 
     print(f"\n" + "=" * 60)
@@ -107,51 +212,39 @@ def download_dataset(dataset_info, skip_existing=True):
     print()
 
     try:
-        # Download using Kaggle CLI
-        cmd = [
-            "kaggle", "datasets", "download",
-            "-d", kaggle_id,
-            "-p", str(dataset_dir),
-            "--unzip"
-        ]
-
-        print(f"🚀 Running: {' '.join(cmd)}")
+        print(f"🚀 Downloading via Kaggle API: {kaggle_id}")
         print()
 
-        # Run with real-time output
-        process = subprocess.Popen(
-            cmd,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.STDOUT,
-            universal_newlines=True
-        )
+        zip_path = dataset_dir / f"{dataset_slug}.zip"
+        for attempt in range(KAGGLE_RETRIES):
+            try:
+                fetch_archive(api, kaggle_id, dataset_dir, zip_path, parts)
+                break
+            except Exception as e:
+                rate_limited = getattr(e, 'status', None) == 429 or '429' in str(e) or 'Too Many Requests' in str(e)
+                if not rate_limited or attempt == KAGGLE_RETRIES - 1:
+                    raise
 
-        # Print output in real-time
-        for line in process.stdout:
-            print(line, end='')
+                wait = 2 ** attempt
+                print(f"\n⏳ [{dataset_slug}] Rate limited by Kaggle, retrying in {wait}s "
+                      f"({attempt + 2}/{KAGGLE_RETRIES})...")
+                time.sleep(wait)
 
-        process.wait()
+        # Extract with all cores (the client's own unzip is single-threaded)
+        print(f"\n📦 [{dataset_slug}] Extracting {zip_path.name}...")
+        extract_zip(zip_path, dataset_dir)
+        zip_path.unlink()
 
-        if process.returncode == 0:
-            print(f"\n✓ Successfully downloaded: {name}")
+        print(f"\n✓ Successfully downloaded: {name}")
 
-            # Check what was downloaded
-            files = list(dataset_dir.rglob("*"))
-            total_size = sum(f.stat().st_size for f in files if f.is_file())
+        # Check what was downloaded
+        file_count, total_size = walk_sizes(dataset_dir)
 
-            print(f"   Files: {len([f for f in files if f.is_file()])} files")
-            print(f"   Total size: {total_size / (1024**3):.2f} GB")
+        print(f"   Files: {file_count} files")
+        print(f"   Total size: {total_size / (1024**3):.2f} GB")
 
-            return True
-        else:
-            print(f"\n✗ Failed to download: {name}")
-            print(f"   Error code: {process.returncode}")
-            return False
+        return True
 
-    except FileNotFoundError:
-        print(f"\n❌ Kaggle CLI not found!")
-        print("Install with: pip install kaggle")
-        return False
     except Exception as e:
         print(f"\n❌ Error downloading {name}: {e}")
         return False
@@ -173,16 +266,55 @@ def list_datasets():
 
     print("\n" + "=" * 60)
 
+def _parse_gb(size):
+    """Parse a dataset size string ("34GB", "500MB") into GB"""
+    size = size.strip().upper()
+    for suffix, scale in (("TB", 1024), ("GB", 1), ("MB", 1 / 1024)):
+        if size.endswith(suffix):
+            return float(size[:-len(suffix)]) * scale
+    return float(size)
+
+def disk_needed_gb(dataset_info):
+    """(zip, extracted) GB a dataset takes while both are on disk"""
+    zip_gb = _parse_gb(dataset_info['size'])
+    return zip_gb, zip_gb * EXTRACTED_SIZE_RATIO
+
+def free_disk_gb():
+    """Free space on the DATA_RAW filesystem in GB (one statvfs call on POSIX)"""
+    if hasattr(os, 'statvfs'):
+        st = os.statvfs(DATA_RAW)
+        return st.f_bavail * st.f_frsize / (1024**3)
+    return shutil.disk_usage(DATA_RAW).free / (1024**3)
+
+def reserve_disk_gb(required_gb):
+    """
+    Reserve `required_gb` of free space for a download
+
+    Returns:
+        None if reserved (release it with release_disk_gb), else the GB
+        available after other downloads' reservations
+    """
+    global _reserved_gb
+    with _reserve_lock:
+        available_gb = free_disk_gb() - _reserved_gb
+        if available_gb < required_gb:
+            return available_gb
+        _reserved_gb += required_gb
+        return None
+
+def release_disk_gb(required_gb):
+    """Return space reserved with reserve_disk_gb"""
+    global _reserved_gb
+    with _reserve_lock:
+        _reserved_gb -= required_gb
+
 def check_disk_space(required_gb=100):
     """Check if sufficient disk space is available"""
-    import shutil
-
-    total, used, free = shutil.disk_usage(DATA_RAW)
-    free_gb = free / (1024**3)
+    free_gb = free_disk_gb()
 
     print(f"\n💾 Disk Space Check:")
     print(f"   Available: {free_gb:.1f} GB")
-    print(f"   Required: {required_gb} GB")
+    print(f"   Required: {required_gb:.1f} GB")
 
     if free_gb < required_gb:
         print(f"\n⚠️  Warning: Low disk space!")
@@ -193,8 +325,16 @@ def check_disk_space(required_gb=100):
     print(f"   ✓ Sufficient disk space available")
     return True
 
-def download_all(skip_existing=True, priorities=None):
-    """Download all datasets or selected priorities"""
+def download_all(skip_existing=True, priorities=None, parallel=DEFAULT_PARALLEL, parts=DEFAULT_CONNECTIONS):
+    """
+    Download all datasets or selected priorities
+
+    Args:
+        skip_existing: Skip datasets whose directory is already populated
+        priorities: Only download datasets with these priorities
+        parallel: Number of datasets downloaded concurrently
+        parts: Range requests per dataset archive (1 = Kaggle client download)
+    """
 
     print("\n" + "=" * 60)
     print("🌐 Kaggle Aerial Vehicle Datasets Download")
@@ -205,8 +345,8 @@ def download_all(skip_existing=True, priorities=None):
     if not check_kaggle_credentials():
         return False
 
-    # Check disk space
-    if not check_disk_space():
+    api = get_kaggle_api()
+    if api is None:
         return False
 
     # Filter datasets by priority
@@ -214,6 +354,11 @@ def download_all(skip_existing=True, priorities=None):
     if priorities:
         datasets_to_download = [ds for ds in DATASETS if ds['priority'] in priorities]
 
+    # Check disk space for the selected datasets (zip + extraction, as
+    # download_dataset reserves it)
+    if not check_disk_space(sum(sum(disk_needed_gb(ds)) for ds in datasets_to_download)):
+        return False
+
     # Sort by priority
     datasets_to_download = sorted(datasets_to_download, key=lambda x: x['priority'])
 
@@ -228,15 +373,19 @@ def download_all(skip_existing=True, priorities=None):
         print("Download cancelled")
         return False
 
-    # Download each dataset
-    successful = []
-    failed = []
+    # Download datasets concurrently (network-bound)
+    results = {}
+    with ThreadPoolExecutor(max_workers=max(1, parallel)) as executor:
+        futures = {
+            executor.submit(download_dataset, dataset_info, api, skip_existing, parts): dataset_info['name']
+            for dataset_info in datasets_to_download
+        }
+        for future in as_completed(futures):
+            results[futures[future]] = future.result()
 
-    for dataset_info in datasets_to_download:
-        if download_dataset(dataset_info, skip_existing):
-            successful.append(dataset_info['name'])
-        else:
-            failed.append(dataset_info['name'])
+    # Report in priority order
+    successful = [ds['name'] for ds in datasets_to_download if results[ds['name']]]
+    failed = [ds['name'] for ds in datasets_to_download if not results[ds['name']]]
 
     # Summary
     print("\n" + "=" * 60)
@@ -259,15 +408,13 @@ def download_all(skip_existing=True, priorities=None):
 
         for dataset_dir in DATA_RAW.iterdir():
             if dataset_dir.is_dir():
-                files = list(dataset_dir.rglob("*"))
-                dataset_files = [f for f in files if f.is_file()]
-                dataset_size = sum(f.stat().st_size for f in dataset_files)
+                dataset_files, dataset_size = walk_sizes(dataset_dir)
 
-                total_files += len(dataset_files)
+                total_files += dataset_files
                 total_size += dataset_size
 
                 print(f"\n{dataset_dir.name}:")
-                print(f"   Files: {len(dataset_files)}")
+                print(f"   Files: {dataset_files}")
                 print(f"   Size: {dataset_size / (1024**3):.2f} GB")
 
         print(f"\n📁 Total:")
@@ -318,6 +465,18 @@ def main():
         action='store_true',
         help='Re-download even if dataset exists'
     )
+    parser.add_argument(
+        '--parallel',
+        type=int,
+        default=DEFAULT_PARALLEL,
+        help=f'Number of datasets to download concurrently (default: {DEFAULT_PARALLEL})'
+    )
+    parser.add_argument(
+        '--download-parts',
+        type=int,
+        default=DEFAULT_CONNECTIONS,
+        help=f'Parallel range requests per archive, via aria2c if installed (default: {DEFAULT_CONNECTIONS})'
+    )
 
     args = parser.parse_args()
 
@@ -327,7 +486,12 @@ def main():
 
     skip_existing = args.skip_existing and not args.force
 
-    download_all(skip_existing=skip_existing, priorities=args.priorities)
+    download_all(
+        skip_existing=skip_existing,
+        priorities=args.priorities,
+        parallel=args.parallel,
+        parts=args.download_parts
+    )
 
 if __name__ == "__main__":
     main()
@@ -6,11 +6,44 @@ Public aerial vehicle detection datasets from Roboflow Universe
 import os
 from pathlib import Path
 
+from _fileops import extract_zip, walk_sizes
+
 # Project paths
 PROJECT_ROOT = Path(__file__).parent.parent
 DATA_RAW = PROJECT_ROOT / "data" / "raw" / "roboflow"
 DATA_RAW.mkdir(parents=True, exist_ok=True)
 
+ROBOFLOW_API_URL = "https://api.roboflow.com"
+
+def download_version(version, api_key: str, location: Path, fmt: str = "coco"):
+    """
+    Download a Roboflow dataset version export
+
+    Fetches the export zip over parallel range requests on a pooled
+    session, then extracts it on all cores. Falls back to the SDK's
+    single-connection download if the export link isn't available.
+    """
+    from _download import make_session, parallel_download
+
+    try:
+        session = make_session()
+        response = session.get(
+            f"{ROBOFLOW_API_URL}/{version.id}/{fmt}", params={"api_key": api_key}, timeout=60
+        )
+        response.raise_for_status()
+        link = response.json()["export"]["link"]
+
+        location.mkdir(parents=True, exist_ok=True)
+        zip_path = location.with_suffix(".zip")
+        connections = parallel_download(link, zip_path, session=session)
+        print(f"   ⚡ {connections}개 연결로 다운로드")
+
+        extract_zip(zip_path, location)
+        zip_path.unlink()
+    except Exception as e:
+        print(f"   ⚠️  병렬 다운로드 불가 ({e}), SDK로 다운로드합니다")
+        version.download(fmt, location=str(location))
+
 def download_roboflow_dataset(api_key: str = None):
     """
     Download aerial vehicle detection dataset from Roboflow
@@ -49,7 +82,7 @@ def download_roboflow_dataset(api_key: str = None):
 
         try:
             project = rf.workspace("felipe-coradesque-6gmum").project("dota-aerial-images")
-            dataset = project.version(1).download("coco", location=str(DATA_RAW / "dota"))
+            download_version(project.version(1), api_key, DATA_RAW / "dota")
             print(f"   ✓ 다운로드 완료: {DATA_RAW / 'dota'}")
         except Exception as e:
             print(f"   ✗ 실패: {e}")
@@ -62,7 +95,7 @@ def download_roboflow_dataset(api_key: str = None):
             # Search for public aerial vehicle datasets
             # Note: Actual dataset name may vary
             project = rf.workspace().project("aerial-vehicle-detection")
-            dataset = project.version(1).download("coco", location=str(DATA_RAW / "aerial"))
+            download_version(project.version(1), api_key, DATA_RAW / "aerial")
             print(f"   ✓ 다운로드 완료: {DATA_RAW / 'aerial'}")
         except Exception as e:
             print(f"   ✗ 실패: {e}")
@@ -80,7 +113,7 @@ def download_roboflow_dataset(api_key: str = None):
 
             for ds in datasets:
                 if ds.is_dir():
-                    size = sum(f.stat().st_size for f in ds.rglob("*") if f.is_file())
+                    _, size = walk_sizes(ds)
                     print(f"   - {ds.name}: {size / (1024**2):.1f} MB")
 
         print(f"\n📁 저장 경로: {DATA_RAW}/")
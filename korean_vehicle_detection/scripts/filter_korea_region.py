@@ -5,18 +5,49 @@ Reduces dataset size from 30-50GB to 5-10GB
 """
 
 import os
+import io
 import json
+import posixpath
+import re
 import shutil
+import sqlite3
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from functools import lru_cache
 from pathlib import Path
 from typing import Dict, List, Tuple
 import xml.etree.ElementTree as ET
 
+import numpy as np
+
+from _fileops import fast_clone, walk_sizes
+
+try:
+    import ijson  # Streaming JSON parser: stop reading once GPS is found
+except ImportError:
+    ijson = None
+
 # Project paths
 PROJECT_ROOT = Path(__file__).parent.parent
 DATA_RAW = PROJECT_ROOT / "data" / "raw"
 DATA_PROCESSED = PROJECT_ROOT / "data" / "processed"
 DATA_PROCESSED.mkdir(parents=True, exist_ok=True)
 
+# Image types picked up from the raw data (directories and zip archives)
+IMAGE_EXTENSIONS = ['.png', '.jpg', '.jpeg', '.tif', '.tiff']
+
+# Concurrent file copies into data/processed
+COPY_WORKERS = 4
+
+# Label-file scans in flight (threads; bounded prefetch)
+LABEL_WORKERS = 8
+LABEL_PREFETCH = 64
+
+# Per-image classification results reused across runs
+CLASSIFY_CACHE_NAME = ".classify_cache.sqlite"
+CACHE_COMMIT_EVERY = 1000
+
 # Korea and East Asia geographic bounds
 # Korea: 33°N-43°N, 124°E-132°E
 # Similar urban environments in China/Japan
@@ -44,7 +75,92 @@ REGION_BOUNDS = {
     }
 }
 
-def extract_gps_from_metadata(image_path: Path) -> Tuple[float, float]:
+# REGION_BOUNDS as arrays (in dict order: earlier regions win overlaps)
+REGION_NAMES = [bounds["name"] for bounds in REGION_BOUNDS.values()]
+REGION_LAT_MIN = np.array([bounds["lat_min"] for bounds in REGION_BOUNDS.values()])
+REGION_LAT_MAX = np.array([bounds["lat_max"] for bounds in REGION_BOUNDS.values()])
+REGION_LON_MIN = np.array([bounds["lon_min"] for bounds in REGION_BOUNDS.values()])
+REGION_LON_MAX = np.array([bounds["lon_max"] for bounds in REGION_BOUNDS.values()])
+
+# Bounding box around all regions: points outside it skip the per-region checks
+UNION_LAT_MIN = float(REGION_LAT_MIN.min())
+UNION_LAT_MAX = float(REGION_LAT_MAX.max())
+UNION_LON_MIN = float(REGION_LON_MIN.min())
+UNION_LON_MAX = float(REGION_LON_MAX.max())
+
+# Vehicle class names looked for in DOTA label files
+VEHICLE_CLASS_RE = re.compile(
+    r'\b(small-vehicle|large-vehicle|car|truck|bus)\b', re.IGNORECASE
+)
+
+# ijson prefixes of the GPS fields we look for
+_GPS_PREFIXES = {
+    'latitude': ('top', 0),
+    'longitude': ('top', 1),
+    'gps.lat': ('gps', 0),
+    'gps.lon': ('gps', 1)
+}
+
+def _gps_from_json(meta_file) -> Tuple[float, float]:
+    """
+    Read latitude/longitude (or gps.lat/gps.lon) from a metadata JSON
+
+    `meta_file` is a path or a binary file object (e.g. a zip member).
+    With ijson the file is scanned as an event stream and reading stops as
+    soon as a full coordinate pair has been seen, so large metadata files
+    are not parsed in full.
+    """
+    if not hasattr(meta_file, 'read'):
+        with open(meta_file, 'rb') as f:
+            return _gps_from_json(f)
+
+    if ijson is None:
+        data = json.load(meta_file)
+        if 'latitude' in data and 'longitude' in data:
+            return float(data['latitude']), float(data['longitude'])
+        if 'gps' in data:
+            return float(data['gps']['lat']), float(data['gps']['lon'])
+        return None, None
+
+    found = {'top': [None, None], 'gps': [None, None]}
+    for prefix, event, value in ijson.parse(meta_file, use_float=True):
+        if event not in ('number', 'string') or prefix not in _GPS_PREFIXES:
+            continue
+        group, idx = _GPS_PREFIXES[prefix]
+        found[group][idx] = float(value)
+        if None not in found[group]:
+            return tuple(found[group])
+
+    return None, None
+
+def _gps_from_xml(meta_file) -> Tuple[float, float]:
+    root = ET.parse(meta_file).getroot()
+    lat = root.find('.//latitude')
+    lon = root.find('.//longitude')
+    if lat is not None and lon is not None:
+        return float(lat.text), float(lon.text)
+    return None, None
+
+@lru_cache(maxsize=None)
+def _list_dir(dir_path: str) -> frozenset:
+    """File names in a directory, listed once and reused for every image in it"""
+    try:
+        return frozenset(os.listdir(dir_path))
+    except OSError:
+        return frozenset()
+
+@lru_cache(maxsize=None)
+def _load_dir_metadata(dir_path: str) -> Tuple[float, float]:
+    """GPS from a directory's shared metadata.json (checked and parsed once per directory)"""
+    if 'metadata.json' not in _list_dir(dir_path):
+        return None, None
+    meta_file = os.path.join(dir_path, 'metadata.json')
+    try:
+        return _gps_from_json(meta_file)
+    except Exception:
+        return None, None
+
+def extract_gps_from_metadata(image_path, present: frozenset = None) -> Tuple[float, float]:
     """
     Extract GPS coordinates from image metadata
 
@@ -54,38 +170,32 @@ def extract_gps_from_metadata(image_path: Path) -> Tuple[float, float]:
     - Filename pattern
     - Accompanying XML annotation
 
+    Args:
+        image_path: Image file (str or Path)
+        present: File names in the image's directory (listed once per
+            directory if not given), used instead of per-file exists() calls
+
     Returns:
         (latitude, longitude) or (None, None) if not found
     """
-    # Try to find metadata file
-    metadata_files = [
-        image_path.with_suffix('.json'),
-        image_path.with_suffix('.xml'),
-        image_path.parent / 'metadata.json'
-    ]
-
-    for meta_file in metadata_files:
-        if meta_file.exists():
+    # Plain string ops: this runs once per image
+    dir_path, file_name = os.path.split(os.fspath(image_path))
+    stem = os.path.splitext(file_name)[0]
+    if present is None:
+        present = _list_dir(dir_path)
+
+    # Try the image's own metadata files first
+    for meta_name, parse in ((stem + '.json', _gps_from_json), (stem + '.xml', _gps_from_xml)):
+        if meta_name in present:
             try:
-                if meta_file.suffix == '.json':
-                    with open(meta_file, 'r') as f:
-                        data = json.load(f)
-                        if 'latitude' in data and 'longitude' in data:
-                            return float(data['latitude']), float(data['longitude'])
-                        if 'gps' in data:
-                            return float(data['gps']['lat']), float(data['gps']['lon'])
-
-                elif meta_file.suffix == '.xml':
-                    tree = ET.parse(meta_file)
-                    root = tree.getroot()
-                    lat = root.find('.//latitude')
-                    lon = root.find('.//longitude')
-                    if lat is not None and lon is not None:
-                        return float(lat.text), float(lon.text)
+                lat, lon = parse(os.path.join(dir_path, meta_name))
+                if lat is not None:
+                    return lat, lon
             except Exception as e:
                 continue
 
-    return None, None
+    # Then the directory-wide metadata.json (shared by sibling images)
+    return _load_dir_metadata(dir_path)
 
 def is_in_target_region(lat: float, lon: float) -> Tuple[bool, str]:
     """
@@ -104,7 +214,36 @@ def is_in_target_region(lat: float, lon: float) -> Tuple[bool, str]:
 
     return False, ""
 
-def filter_by_vehicle_class(annotation_path: Path) -> bool:
+def classify_regions(lats: np.ndarray, lons: np.ndarray) -> np.ndarray:
+    """
+    Vectorized is_in_target_region for many points at once
+
+    Args:
+        lats, lons: (N,) coordinates; NaN for images without GPS
+
+    Returns:
+        (N,) index into REGION_NAMES of the first matching region, -1 if none
+    """
+    lats = np.asarray(lats, dtype=np.float64)
+    lons = np.asarray(lons, dtype=np.float64)
+    result = np.full(lats.shape, -1, dtype=np.int64)
+
+    # Most points miss every region: only those inside the union of all
+    # regions (NaN never is) go through the (N x regions) comparison
+    inside = np.flatnonzero(
+        (lats >= UNION_LAT_MIN) & (lats <= UNION_LAT_MAX) &
+        (lons >= UNION_LON_MIN) & (lons <= UNION_LON_MAX)
+    )
+    lats = lats[inside, None]
+    lons = lons[inside, None]
+    mask = (
+        (lats >= REGION_LAT_MIN) & (lats <= REGION_LAT_MAX) &
+        (lons >= REGION_LON_MIN) & (lons <= REGION_LON_MAX)
+    )
+    result[inside] = np.where(mask.any(axis=1), mask.argmax(axis=1), -1)
+    return result
+
+def filter_by_vehicle_class(annotation_path) -> bool:
     """
     Check if annotation contains vehicle classes
 
@@ -112,29 +251,171 @@ def filter_by_vehicle_class(annotation_path: Path) -> bool:
     - small-vehicle
     - large-vehicle
     - (optionally: plane, ship for diverse training)
-    """
-    target_classes = [
-        "small-vehicle",
-        "large-vehicle",
-        "car",
-        "truck",
-        "bus"
-    ]
-
-    if not annotation_path.exists():
-        return False
 
+    Scans line by line and stops at the first match. A missing label
+    file counts as no vehicles.
+    """
     try:
-        with open(annotation_path, 'r') as f:
-            content = f.read().lower()
-            for cls in target_classes:
-                if cls in content:
-                    return True
+        with open(annotation_path, 'r', buffering=65536) as f:
+            return _has_vehicle_lines(f)
     except Exception:
-        pass
+        return False
 
+def _has_vehicle_lines(lines) -> bool:
+    for line in lines:
+        if VEHICLE_CLASS_RE.search(line):
+            return True
     return False
 
+@lru_cache(maxsize=None)
+def _label_dir(image_dir: str) -> str:
+    """<split>/labelTxt for an <split>/images directory"""
+    return os.path.join(os.path.dirname(image_dir), "labelTxt")
+
+def find_label_file(img_path) -> str:
+    """DOTA label for an image: <split>/labelTxt/<stem>.txt"""
+    dir_path, file_name = os.path.split(os.fspath(img_path))
+    return os.path.join(_label_dir(dir_path), os.path.splitext(file_name)[0] + ".txt")
+
+def open_classification_cache(path: Path = None) -> sqlite3.Connection:
+    """
+    Open the on-disk cache of per-image GPS / vehicle-class results
+
+    Rows are keyed by image path and valid while the image's mtime and size
+    match. Region membership is not cached, so REGION_BOUNDS can be tuned
+    between runs without invalidating anything.
+    """
+    conn = sqlite3.connect(str(path or DATA_PROCESSED / CLASSIFY_CACHE_NAME))
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS classify ("
+        "path TEXT PRIMARY KEY, mtime_ns INTEGER, size INTEGER, "
+        "lat REAL, lon REAL, has_vehicles INTEGER)"
+    )
+    return conn
+
+def lookup_classification(conn: sqlite3.Connection, img_path: str, sig: Tuple[int, int]):
+    """
+    Returns:
+        (lat, lon, has_vehicles) if cached for this mtime/size, else None;
+        has_vehicles is None if the label was never checked
+    """
+    row = conn.execute(
+        "SELECT mtime_ns, size, lat, lon, has_vehicles FROM classify WHERE path = ?",
+        (str(img_path),)
+    ).fetchone()
+    if row is None or (row[0], row[1]) != sig:
+        return None
+    return row[2], row[3], row[4]
+
+def store_classifications(conn: sqlite3.Connection, rows: List[Tuple]):
+    """INSERT OR REPLACE (path, mtime_ns, size, lat, lon, has_vehicles) rows, committing every CACHE_COMMIT_EVERY"""
+    for start in range(0, len(rows), CACHE_COMMIT_EVERY):
+        with conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO classify VALUES (?, ?, ?, ?, ?, ?)",
+                rows[start:start + CACHE_COMMIT_EVERY]
+            )
+
+def bounded_map(executor, fn, items, limit):
+    """
+    executor.map with at most `limit` calls in flight (results in order)
+
+    Bounds memory/fd use when `items` is large while still prefetching
+    ahead of the consumer.
+    """
+    pending = deque()
+    for item in items:
+        if len(pending) >= limit:
+            yield pending.popleft().result()
+        pending.append(executor.submit(fn, item))
+    while pending:
+        yield pending.popleft().result()
+
+def _zip_gps(zf: zipfile.ZipFile, name: str, members: frozenset, dir_gps: Dict) -> Tuple[float, float]:
+    """extract_gps_from_metadata for an image inside a zip archive"""
+    base = posixpath.splitext(name)[0]
+    for suffix, parse in (('.json', _gps_from_json), ('.xml', _gps_from_xml)):
+        if base + suffix in members:
+            try:
+                with zf.open(base + suffix) as f:
+                    lat, lon = parse(f)
+                if lat is not None:
+                    return lat, lon
+            except Exception:
+                continue
+
+    # Directory-wide metadata.json, parsed once per directory
+    dir_name = posixpath.dirname(name)
+    if dir_name not in dir_gps:
+        dir_gps[dir_name] = None, None
+        meta_name = posixpath.join(dir_name, 'metadata.json')
+        if meta_name in members:
+            try:
+                with zf.open(meta_name) as f:
+                    dir_gps[dir_name] = _gps_from_json(f)
+            except Exception:
+                pass
+    return dir_gps[dir_name]
+
+def _zip_label_name(name: str) -> str:
+    """find_label_file for a zip member name"""
+    dir_name, file_name = posixpath.split(name)
+    return posixpath.join(posixpath.dirname(dir_name), 'labelTxt', posixpath.splitext(file_name)[0] + '.txt')
+
+def _extract_member(zf: zipfile.ZipFile, name: str, dst: Path):
+    with zf.open(name) as src, open(dst, 'wb') as out:
+        shutil.copyfileobj(src, out, 1024 * 1024)
+
+def filter_zip_archive(zip_path: Path, stats: Dict, target_img_dir: Path, target_lbl_dir: Path, planned: set):
+    """
+    Filter a raw dataset zip without unpacking it
+
+    Sidecar metadata and label members are read straight from the archive,
+    and only in-region images with vehicles (and their labels) are written
+    out, so the non-matching bulk of the archive never touches the disk.
+    """
+    with zipfile.ZipFile(zip_path) as zf:
+        members = frozenset(zf.namelist())
+        images = sorted(
+            name for name in members
+            if posixpath.splitext(name)[1].lower() in IMAGE_EXTENSIONS
+        )
+        print(f"   총 이미지: {len(images)}장")
+        stats["total_images"] += len(images)
+
+        # 1. GPS from sidecar members
+        dir_gps = {}
+        coords = [_zip_gps(zf, name, members, dir_gps) for name in images]
+        has_gps = np.array([bool(lat and lon) for lat, lon in coords], dtype=bool)
+        lats = np.array([lat if ok else np.nan for (lat, _), ok in zip(coords, has_gps)], dtype=np.float64)
+        lons = np.array([lon if ok else np.nan for (_, lon), ok in zip(coords, has_gps)], dtype=np.float64)
+
+        # 2. Regions in one vectorized pass
+        region_idx = classify_regions(lats, lons)
+        in_region = np.flatnonzero(region_idx >= 0)
+        stats["with_gps"] += int(has_gps.sum())
+        stats["in_region"] += len(in_region)
+
+        # 3. Vehicle classes and extraction, in-region images only
+        for i in in_region.tolist():
+            region_name = REGION_NAMES[region_idx[i]]
+            stats["regions"][region_name] = stats["regions"].get(region_name, 0) + 1
+
+            label_name = _zip_label_name(images[i])
+            if label_name not in members:
+                continue
+            with zf.open(label_name) as f:
+                if not _has_vehicle_lines(io.TextIOWrapper(f, errors='replace')):
+                    continue
+
+            stats["with_vehicles"] += 1
+            for name, target_dir in ((images[i], target_img_dir), (label_name, target_lbl_dir)):
+                dst = target_dir / posixpath.basename(name)
+                if dst not in planned and not dst.exists():
+                    planned.add(dst)
+                    _extract_member(zf, name, dst)
+            stats["copied"] += 1
+
 def parse_dota_structure():
     """
     Parse DOTA dataset structure
@@ -173,10 +454,11 @@ def filter_dataset():
     print("🔍 한국 지역 데이터 필터링 시작")
     print("=" * 60)
 
-    # Parse DOTA structure
+    # Parse DOTA structure (extracted directories and/or raw zip archives)
     dota_dirs = parse_dota_structure()
+    dota_zips = sorted(DATA_RAW.glob("*.zip"))
 
-    if not dota_dirs:
+    if not dota_dirs and not dota_zips:
         print("\n❌ DOTA 데이터셋을 찾을 수 없습니다!")
         print(f"📂 확인 경로: {DATA_RAW}")
         print("\n💡 다음을 확인하세요:")
@@ -186,6 +468,8 @@ def filter_dataset():
         return
 
     print(f"\n✅ DOTA 데이터셋 발견: {len(dota_dirs)}개 디렉토리")
+    if dota_zips:
+        print(f"   + 압축 파일 {len(dota_zips)}개 (필요한 파일만 추출)")
 
     # Statistics
     stats = {
@@ -197,64 +481,116 @@ def filter_dataset():
         "regions": {}
     }
 
+    target_img_dir = DATA_PROCESSED / "images"
+    target_lbl_dir = DATA_PROCESSED / "labels"
+    target_img_dir.mkdir(parents=True, exist_ok=True)
+    target_lbl_dir.mkdir(parents=True, exist_ok=True)
+
+    # Label scans and copies run on threads (syscall-bound, release the GIL);
+    # copies start as soon as a directory is classified
+    label_executor = ThreadPoolExecutor(max_workers=LABEL_WORKERS)
+    copy_executor = ThreadPoolExecutor(max_workers=COPY_WORKERS)
+    copy_futures = []
+    planned = set()
+
+    def plan_copy(src, dst):
+        if dst not in planned and not dst.exists():
+            planned.add(dst)
+            copy_futures.append(copy_executor.submit(fast_clone, src, dst, metadata=False))
+
+    cache = open_classification_cache()
+
     # Filter each directory
     for dota_dir in dota_dirs:
         print(f"\n📁 처리 중: {dota_dir}")
 
         # Find images
-        image_extensions = ['.png', '.jpg', '.jpeg', '.tif', '.tiff']
         images = []
-        for ext in image_extensions:
+        for ext in IMAGE_EXTENSIONS:
             images.extend(dota_dir.glob(f"**/*{ext}"))
 
         print(f"   총 이미지: {len(images)}장")
         stats["total_images"] += len(images)
 
-        # Process each image
-        for img_path in images:
-            # Extract GPS
-            lat, lon = extract_gps_from_metadata(img_path)
-
-            if lat and lon:
-                stats["with_gps"] += 1
-
-                # Check if in target region
-                in_region, region_name = is_in_target_region(lat, lon)
-
-                if in_region:
-                    stats["in_region"] += 1
-                    stats["regions"][region_name] = stats["regions"].get(region_name, 0) + 1
-
-                    # Check for vehicle annotations
-                    label_dir = img_path.parent.parent / "labelTxt"
-                    label_file = label_dir / f"{img_path.stem}.txt"
-
-                    has_vehicles = filter_by_vehicle_class(label_file)
-
-                    if has_vehicles:
-                        stats["with_vehicles"] += 1
-
-                        # Copy to processed directory
-                        target_img_dir = DATA_PROCESSED / "images"
-                        target_lbl_dir = DATA_PROCESSED / "labels"
-                        target_img_dir.mkdir(parents=True, exist_ok=True)
-                        target_lbl_dir.mkdir(parents=True, exist_ok=True)
-
-                        # Copy image
-                        target_img = target_img_dir / img_path.name
-                        if not target_img.exists():
-                            shutil.copy2(img_path, target_img)
-
-                        # Copy label
-                        if label_file.exists():
-                            target_lbl = target_lbl_dir / label_file.name
-                            if not target_lbl.exists():
-                                shutil.copy2(label_file, target_lbl)
-
-                        stats["copied"] += 1
-
-                        if stats["copied"] % 10 == 0:
-                            print(f"   ✓ 복사됨: {stats['copied']}장", end='\r')
+        # Work on path strings from here on (cheaper to build, hash and pickle)
+        images = [str(img_path) for img_path in images]
+
+        # Reuse earlier results for images unchanged since the last run
+        sigs = [(st.st_mtime_ns, st.st_size) for st in map(os.stat, images)]
+        cached = [lookup_classification(cache, img_path, sig) for img_path, sig in zip(images, sigs)]
+        gps_misses = [i for i, row in enumerate(cached) if row is None]
+
+        with ProcessPoolExecutor(max_workers=os.cpu_count()) as executor:
+            # 1. GPS for every image (parallel metadata reads)
+            coords = [row[:2] if row is not None else None for row in cached]
+            fresh = executor.map(extract_gps_from_metadata, [images[i] for i in gps_misses], chunksize=64)
+            for i, lat_lon in zip(gps_misses, fresh):
+                coords[i] = lat_lon
+
+            has_gps = np.array([bool(lat and lon) for lat, lon in coords], dtype=bool)
+            lats = np.array([lat if ok else np.nan for (lat, _), ok in zip(coords, has_gps)], dtype=np.float64)
+            lons = np.array([lon if ok else np.nan for (_, lon), ok in zip(coords, has_gps)], dtype=np.float64)
+
+            # 2. Region of every image in one vectorized pass
+            region_idx = classify_regions(lats, lons)
+            in_region = np.flatnonzero(region_idx >= 0)
+
+            # 3. Vehicle classes, only for in-region images not already checked
+            label_files = [find_label_file(images[i]) for i in in_region]
+            vehicle_flags = {
+                i: bool(cached[i][2]) for i in in_region.tolist()
+                if cached[i] is not None and cached[i][2] is not None
+            }
+            vehicle_misses = [(i, label_file) for i, label_file in zip(in_region.tolist(), label_files) if i not in vehicle_flags]
+            fresh = bounded_map(
+                label_executor, filter_by_vehicle_class,
+                [label_file for _, label_file in vehicle_misses], LABEL_PREFETCH
+            )
+            for (i, _), flag in zip(vehicle_misses, fresh):
+                vehicle_flags[i] = flag
+            has_vehicles = [vehicle_flags[i] for i in in_region.tolist()]
+
+        # Store new results
+        updated = sorted(set(gps_misses) | {i for i, _ in vehicle_misses})
+        store_classifications(cache, [
+            (images[i], *sigs[i], *coords[i], vehicle_flags.get(i)) for i in updated
+        ])
+        if len(images) > len(gps_misses):
+            print(f"   ⚡ 캐시 사용: {len(images) - len(gps_misses)}장")
+
+        stats["with_gps"] += int(has_gps.sum())
+        stats["in_region"] += len(in_region)
+
+        # Aggregate in image order
+        for i, label_file, vehicles in zip(in_region.tolist(), label_files, has_vehicles):
+            region_name = REGION_NAMES[region_idx[i]]
+            stats["regions"][region_name] = stats["regions"].get(region_name, 0) + 1
+
+            if vehicles:
+                stats["with_vehicles"] += 1
+                img_path = images[i]
+
+                # Queue image + label for copying (first source per name wins)
+                plan_copy(img_path, target_img_dir / os.path.basename(img_path))
+                if os.path.exists(label_file):
+                    plan_copy(label_file, target_lbl_dir / os.path.basename(label_file))
+
+                stats["copied"] += 1
+
+    cache.close()
+    label_executor.shutdown()
+
+    # Zip archives: read in place, extract only the matches
+    for zip_path in dota_zips:
+        print(f"\n📦 처리 중: {zip_path}")
+        filter_zip_archive(zip_path, stats, target_img_dir, target_lbl_dir, planned)
+
+    # Wait for the copies into the processed directory
+    for done, future in enumerate(as_completed(copy_futures), start=1):
+        future.result()
+        if done % 10 == 0:
+            print(f"   ✓ 복사됨: {done}/{len(copy_futures)}개 파일", end='\r')
+    copy_executor.shutdown()
 
     # Print statistics
     print("\n\n" + "=" * 60)
@@ -273,7 +609,7 @@ def filter_dataset():
 
     # Calculate size
     if stats["copied"] > 0:
-        total_size = sum(f.stat().st_size for f in DATA_PROCESSED.glob("**/*") if f.is_file())
+        _, total_size = walk_sizes(DATA_PROCESSED)
         print(f"\n💾 저장 공간: {total_size / (1024**3):.2f} GB")
         print(f"📂 저장 경로: {DATA_PROCESSED}/")
 
@@ -3,17 +3,35 @@ Merge All Datasets into Single COCO Dataset
 Combines Roboflow, Kaggle, auto-labeled, and manual datasets
 """
 
-import json
-import shutil
+import os
+import fnmatch
 import hashlib
-import random
+import shutil
+import tempfile
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from itertools import accumulate, islice
 from pathlib import Path
 from datetime import datetime
-from collections import defaultdict
+from collections import Counter, defaultdict
 from tqdm import tqdm
 import cv2
 import numpy as np
 
+from _jsonio import dump_json, dump_json_stream, dumps_json, json_sections, load_json, loads_json
+
+try:
+    # Columnar .beton export: one sequential file instead of a PNG per image
+    from ffcv.fields import NDArrayField, RGBImageField
+    from ffcv.writer import DatasetWriter
+except ImportError:
+    DatasetWriter = None
+
+# Images are decoded on our own thread pool; keep OpenCV from starting
+# its own worker threads inside every call
+cv2.setNumThreads(0)
+
 # Project paths
 PROJECT_ROOT = Path(__file__).parent.parent
 DATA_RAW = PROJECT_ROOT / "data" / "raw"
@@ -22,6 +40,9 @@ DATA_TRAIN = DATA_FINAL / "train"
 DATA_VAL = DATA_FINAL / "val"
 DATA_TEST = DATA_FINAL / "test"
 
+# Image hashes + sizes from earlier runs, keyed by file size + mtime + path
+HASH_CACHE = DATA_FINAL / ".merge_cache.json"
+
 # Class mapping - map all variants to our 2 classes
 CLASS_MAPPING = {
     # Small vehicles
@@ -54,12 +75,213 @@ CLASS_MAPPING = {
     'human': None,
 }
 
+# Files indexed when looking up images outside the images directory root
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.tif', '.tiff', '.bmp')
+
+# FFCV export: boxes per image (padded with label -1) and image encoding
+FFCV_MAX_BOXES = 256
+FFCV_MAX_RESOLUTION = 1024
+FFCV_JPEG_QUALITY = 90
+
+# gzip level for --gzip splits (3: most of level 6's ratio at a fraction
+# of the time) and how many annotations go in their readable preview
+GZIP_LEVEL = 3
+PREVIEW_ANNOTATIONS = 100
+
 # Our target classes
 TARGET_CLASSES = {
     'small-vehicle': 1,
     'large-vehicle': 2,
 }
 
+# Lower-cased source class name -> (target category id, target class name)
+CATEGORY_REMAP = {
+    name: (TARGET_CLASSES[target], target)
+    for name, target in CLASS_MAPPING.items() if target is not None
+}
+
+@lru_cache(maxsize=None)
+def image_name_index(images_dir):
+    """
+    {file name: path} of every image under `images_dir`, from one os.scandir walk
+
+    Built once per directory (and reused across datasets sharing it);
+    the first path found wins when names repeat.
+    """
+    index = {}
+    stack = [str(images_dir)]
+    while stack:
+        try:
+            it = os.scandir(stack.pop())
+        except OSError:
+            continue
+        with it:
+            for entry in it:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif entry.name.lower().endswith(IMAGE_EXTENSIONS):
+                    index.setdefault(entry.name, entry.path)
+    return index
+
+def _find_annotation_file(dataset_dir):
+    """First *annotations*.json under `dataset_dir` (top-down os.walk, stops at the first hit)"""
+    for dirpath, dirnames, filenames in os.walk(dataset_dir):
+        dirnames.sort()
+        for name in sorted(filenames):
+            if fnmatch.fnmatch(name, '*annotations*.json'):
+                return Path(dirpath) / name
+    return None
+
+def find_datasets(root):
+    """
+    (dataset name, annotation file, images dir) for each dataset directory under `root`
+
+    Each dataset directory is walked once with os.scandir/os.walk, stopping
+    at its first *annotations*.json; images live in an `images/` folder next
+    to it, or alongside it.
+    """
+    datasets = []
+    with os.scandir(root) as it:
+        for entry in it:
+            if not entry.is_dir():
+                continue
+
+            ann_file = _find_annotation_file(entry.path)
+            if ann_file is None:
+                continue
+
+            images_dir = ann_file.parent / "images"
+            if not images_dir.is_dir():
+                images_dir = ann_file.parent
+            datasets.append((entry.name, ann_file, images_dir))
+    return datasets
+
+def coco_sections(coco_json_path):
+    """
+    (categories, annotations, images) item iterables of a COCO file
+
+    Streamed with ijson when installed, else the file is loaded once
+    (see _jsonio.json_sections).
+    """
+    return json_sections(coco_json_path, ('categories', 'annotations', 'images'))
+
+class AnnotationStore:
+    """
+    Append-only, disk-backed list of merged annotations
+
+    Each annotation is encoded once as a JSON line in an anonymous spool
+    file under data/; only its byte offset, image id and category id stay
+    in memory (24 bytes instead of a ~350-byte dict). Records are read
+    back by offset with os.pread.
+    """
+
+    def __init__(self, spool_dir):
+        os.makedirs(spool_dir, exist_ok=True)
+        self._spool = tempfile.TemporaryFile(dir=spool_dir)
+        self._offsets = array('q', [0])
+        self._image_ids = array('q')
+        self._category_ids = array('q')
+
+    def __len__(self):
+        return len(self._image_ids)
+
+    def append(self, ann):
+        self.extend([ann])
+
+    def extend(self, anns):
+        """Append a batch of annotations with one spool write"""
+        records = [dumps_json(ann) + b'\n' for ann in anns]
+        self._spool.write(b''.join(records))
+        self._offsets.extend(islice(accumulate(map(len, records), initial=self._offsets[-1]), 1, None))
+        self._image_ids.extend([ann['image_id'] for ann in anns])
+        self._category_ids.extend([ann['category_id'] for ann in anns])
+
+    @property
+    def image_ids(self):
+        return np.frombuffer(self._image_ids, dtype=np.int64) if len(self) else np.empty(0, np.int64)
+
+    @property
+    def category_ids(self):
+        return np.frombuffer(self._category_ids, dtype=np.int64) if len(self) else np.empty(0, np.int64)
+
+    def read_raw(self, row):
+        """Encoded JSON of one annotation (with a trailing newline)"""
+        self._spool.flush()
+        start = self._offsets[row]
+        return os.pread(self._spool.fileno(), self._offsets[row + 1] - start, start)
+
+    def __getitem__(self, row):
+        return loads_json(self.read_raw(row))
+
+class AnnotationIndex:
+    """
+    Annotations grouped by image id in CSR layout
+
+    Annotations of image i are annotations[order[offsets[i]:offsets[i + 1]]];
+    built with one stable argsort instead of a Python list per image.
+    """
+
+    def __init__(self, annotations):
+        image_ids = annotations.image_ids
+        order = np.argsort(image_ids, kind='stable')
+        max_id = int(image_ids.max()) if len(image_ids) else -1
+
+        self.annotations = annotations
+        self.order = order.tolist()
+        self.offsets = np.searchsorted(image_ids[order], np.arange(max_id + 2)).tolist()
+
+    def rows_of(self, image_id):
+        """Row numbers of one image's annotations, in their original order"""
+        if not 0 <= image_id < len(self.offsets) - 1:
+            return []
+        return self.order[self.offsets[image_id]:self.offsets[image_id + 1]]
+
+    def annotations_of(self, image_id):
+        """Annotations of one image, in their original order"""
+        return [self.annotations[row] for row in self.rows_of(image_id)]
+
+class FFCVSplitDataset:
+    """
+    Indexed (image, bboxes, labels) view of a split for ffcv's DatasetWriter
+
+    Images are decoded as RGB uint8; boxes are COCO [x, y, w, h] padded to
+    FFCV_MAX_BOXES rows (extra boxes are dropped), labels padded with -1.
+
+    DatasetWriter pickles the dataset into its worker processes, and the
+    AnnotationStore's spool file can't be pickled: the split's boxes and
+    labels are copied out into flat arrays (CSR, like AnnotationIndex) and
+    image paths kept as strings.
+    """
+
+    def __init__(self, split_images, image_to_anns, image_paths):
+        rows = [image_to_anns.rows_of(img['id'])[:FFCV_MAX_BOXES] for img in split_images]
+        flat_rows = [row for image_rows in rows for row in image_rows]
+        annotations = image_to_anns.annotations
+
+        self.image_paths = [str(image_paths[img['id']]) for img in split_images]
+        self.offsets = np.fromiter(accumulate(map(len, rows), initial=0), dtype=np.int64)
+        self.bboxes = np.array(
+            [annotations[row]['bbox'] for row in flat_rows], dtype=np.float32
+        ).reshape(-1, 4)
+        self.labels = annotations.category_ids[flat_rows]
+
+    def __len__(self):
+        return len(self.image_paths)
+
+    def __getitem__(self, index):
+        image = cv2.imread(self.image_paths[index], cv2.IMREAD_COLOR)
+        if image is None:
+            raise OSError(f"Cannot read image: {self.image_paths[index]}")
+
+        start, end = self.offsets[index], self.offsets[index + 1]
+
+        bboxes = np.zeros((FFCV_MAX_BOXES, 4), dtype=np.float32)
+        labels = np.full(FFCV_MAX_BOXES, -1, dtype=np.int64)
+        bboxes[:end - start] = self.bboxes[start:end]
+        labels[:end - start] = self.labels[start:end]
+
+        return cv2.cvtColor(image, cv2.COLOR_BGR2RGB), bboxes, labels
+
 class DatasetMerger:
     """Merge multiple COCO datasets into one"""
 
@@ -75,7 +297,7 @@ class DatasetMerger:
             },
             "licenses": [],
             "images": [],
-            "annotations": [],
+            "annotations": AnnotationStore(DATA_FINAL),
             "categories": [
                 {"id": 1, "name": "small-vehicle", "supercategory": "vehicle"},
                 {"id": 2, "name": "large-vehicle", "supercategory": "vehicle"}
@@ -84,21 +306,62 @@ class DatasetMerger:
 
         self.image_id_counter = 1
         self.annotation_id_counter = 1
-        self.image_hashes = {}  # For duplicate detection
+        self.image_hashes = defaultdict(set)  # dHash (int) -> content digests kept, for duplicate detection
+        self.image_paths = {}  # image id -> source file (for exports that need pixels)
+        self.hash_cache = self.load_hash_cache()
         self.stats = defaultdict(int)
 
-    def compute_image_hash(self, image_path):
-        """Compute hash of image for duplicate detection"""
+    @staticmethod
+    def load_hash_cache():
+        """{'<size>:<mtime_ns>:<path>': [dHash, width, height, digest]} saved by an earlier run (empty if none)"""
         try:
-            img = cv2.imread(str(image_path))
+            return load_json(HASH_CACHE)
+        except (OSError, ValueError):
+            return {}
+
+    def save_hash_cache(self):
+        """Persist image hashes so the next merge skips decoding unchanged images"""
+        HASH_CACHE.parent.mkdir(parents=True, exist_ok=True)
+        dump_json(self.hash_cache, HASH_CACHE, indent=False)
+
+    def decode_and_hash(self, image_path):
+        """
+        Decode an image once for its size, a perceptual hash and a content digest
+
+        64-bit dHash: the grayscale image is shrunk to 9x8 and each bit
+        records whether a pixel is brighter than its left neighbour. It only
+        picks candidate duplicates: flat tiles (sea, fields, night) all hash
+        to 0, so a duplicate is confirmed by the BLAKE2b digest of the file
+        bytes. The file is read into memory once for both and decoded with
+        imdecode; width/height come from the same decode, so COCO headers
+        with missing sizes need no second read.
+
+        Images whose size, mtime and path match a cached entry aren't
+        read at all.
+
+        Returns:
+            (dHash as an int, width, height, digest), or None if the image can't be read
+        """
+        try:
+            st = os.stat(image_path)
+            fast_key = f"{st.st_size}:{st.st_mtime_ns}:{os.path.abspath(image_path)}"
+            cached = self.hash_cache.get(fast_key)
+            if isinstance(cached, list) and len(cached) == 4:  # older entries carry no digest
+                return tuple(cached)
+
+            buf = np.fromfile(image_path, dtype=np.uint8)
+            digest = hashlib.blake2b(buf, digest_size=16).hexdigest()
+            img = cv2.imdecode(buf, cv2.IMREAD_GRAYSCALE)
             if img is None:
                 return None
 
-            # Resize to small size for faster hashing
-            img_small = cv2.resize(img, (64, 64))
-            img_bytes = img_small.tobytes()
+            height, width = img.shape
+            img_small = cv2.resize(img, (9, 8), interpolation=cv2.INTER_AREA)
+            diff = img_small[:, 1:] > img_small[:, :-1]
 
-            return hashlib.md5(img_bytes).hexdigest()
+            img_hash = int.from_bytes(np.packbits(diff).tobytes(), 'big')
+            self.hash_cache[fast_key] = [img_hash, width, height, digest]
+            return img_hash, width, height, digest
         except Exception as e:
             print(f"⚠️  Error hashing {image_path}: {e}")
             return None
@@ -113,58 +376,52 @@ class DatasetMerger:
         if not coco_json_path.exists():
             return []
 
-        with open(coco_json_path, 'r') as f:
-            data = json.load(f)
+        categories, annotations, images = coco_sections(coco_json_path)
 
-        # Build category ID mapping
-        cat_id_to_name = {}
-        if 'categories' in data:
-            for cat in data['categories']:
-                cat_id_to_name[cat['id']] = cat['name'].lower()
+        # Resolve each source category to (target id, target name) once,
+        # instead of lower-casing and looking up names per annotation
+        # (None: not a vehicle class)
+        cat_remap = {cat['id']: CATEGORY_REMAP.get(cat['name'].lower()) for cat in categories}
 
-        # Build image ID to annotations mapping
+        # Map annotations to our classes while grouping them by image;
+        # non-vehicle annotations are dropped as they stream past
         image_to_anns = defaultdict(list)
-        if 'annotations' in data:
-            for ann in data['annotations']:
-                image_to_anns[ann['image_id']].append(ann)
+        for ann in annotations:
+            remap = cat_remap.get(ann['category_id'])
+            if remap is None:
+                continue  # Skip non-vehicle classes
+
+            # Keep only the fields add_dataset writes out (drops segmentation
+            # polygons etc. as soon as each annotation is parsed)
+            bbox = ann['bbox']
+            image_to_anns[ann['image_id']].append({
+                "category_id": remap[0],
+                "category_name": remap[1],
+                "bbox": bbox,
+                "area": ann.get('area', bbox[2] * bbox[3]),
+                "iscrowd": ann.get('iscrowd', 0)
+            })
 
         # Process images
         result = []
-        for img_info in data.get('images', []):
-            image_id = img_info['id']
+        for img_info in images:
+            # Only include images with valid annotations
+            mapped_anns = image_to_anns.get(img_info['id'])
+            if not mapped_anns:
+                continue
+
             file_name = img_info['file_name']
 
             # Find image file
             image_path = images_dir / file_name
             if not image_path.exists():
-                # Try subdirectories
-                found = list(images_dir.rglob(file_name))
-                if found:
-                    image_path = found[0]
-                else:
+                # Try subdirectories (one indexed walk instead of a search per image)
+                found = image_name_index(images_dir).get(os.path.basename(file_name))
+                if found is None or not found.endswith(file_name):
                     continue
+                image_path = Path(found)
 
-            # Get annotations
-            anns = image_to_anns.get(image_id, [])
-
-            # Map annotations to our classes
-            mapped_anns = []
-            for ann in anns:
-                cat_id = ann['category_id']
-                cat_name = cat_id_to_name.get(cat_id, '').lower()
-
-                # Map to our classes
-                mapped_class = CLASS_MAPPING.get(cat_name, None)
-                if mapped_class is None:
-                    continue  # Skip non-vehicle classes
-
-                new_ann = ann.copy()
-                new_ann['category_name'] = mapped_class
-                new_ann['category_id'] = TARGET_CLASSES[mapped_class]
-                mapped_anns.append(new_ann)
-
-            if mapped_anns:  # Only include images with valid annotations
-                result.append((img_info, mapped_anns, image_path))
+            result.append((img_info, mapped_anns, image_path))
 
         return result
 
@@ -191,10 +448,22 @@ class DatasetMerger:
         added_annotations = 0
         skipped_duplicates = 0
 
-        for img_info, annotations, image_path in tqdm(dataset, desc=f"  Merging"):
-            # Check for duplicates
-            img_hash = self.compute_image_hash(image_path)
-            if img_hash and img_hash in self.image_hashes:
+        # Decode + hash on threads (cv2 releases the GIL); results come back
+        # in dataset order, so which duplicate is kept doesn't change
+        with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+            decoded = list(tqdm(
+                executor.map(self.decode_and_hash, [image_path for _, _, image_path in dataset]),
+                total=len(dataset), desc=f"  Hashing"
+            ))
+
+        for (img_info, annotations, image_path), result in zip(tqdm(dataset, desc=f"  Merging"), decoded):
+            if result is not None:
+                img_hash, width, height, digest = result
+            else:
+                img_hash, width, height, digest = None, img_info.get('width'), img_info.get('height'), None
+
+            # Check for duplicates: same dHash and the same bytes
+            if img_hash is not None and digest in self.image_hashes.get(img_hash, ()):
                 skipped_duplicates += 1
                 continue
 
@@ -202,34 +471,35 @@ class DatasetMerger:
             new_image_info = {
                 "id": self.image_id_counter,
                 "file_name": image_path.name,
-                "width": img_info['width'],
-                "height": img_info['height'],
+                "width": width,
+                "height": height,
                 "source": dataset_name
             }
 
             self.merged_data['images'].append(new_image_info)
+            self.image_paths[self.image_id_counter] = image_path
 
-            if img_hash:
-                self.image_hashes[img_hash] = self.image_id_counter
+            if img_hash is not None:
+                self.image_hashes[img_hash].add(digest)
 
-            # Add annotations
-            for ann in annotations:
-                new_ann = {
-                    "id": self.annotation_id_counter,
+            # Add annotations (one batch per image)
+            self.merged_data['annotations'].extend([
+                {
+                    "id": ann_id,
                     "image_id": self.image_id_counter,
                     "category_id": ann['category_id'],
                     "bbox": ann['bbox'],
-                    "area": ann.get('area', ann['bbox'][2] * ann['bbox'][3]),
-                    "iscrowd": ann.get('iscrowd', 0)
+                    "area": ann['area'],
+                    "iscrowd": ann['iscrowd']
                 }
+                for ann_id, ann in enumerate(annotations, self.annotation_id_counter)
+            ])
 
-                self.merged_data['annotations'].append(new_ann)
-
-                # Update stats
-                cat_name = ann['category_name']
-                self.stats[f"{dataset_name}_{cat_name}"] += 1
-                self.annotation_id_counter += 1
-                added_annotations += 1
+            # Update stats
+            for ann in annotations:
+                self.stats[f"{dataset_name}_{ann['category_name']}"] += 1
+            self.annotation_id_counter += len(annotations)
+            added_annotations += len(annotations)
 
             added_images += 1
             self.image_id_counter += 1
@@ -247,16 +517,12 @@ class DatasetMerger:
         print("📊 Splitting Dataset")
         print(f"{'='*60}")
 
-        random.seed(seed)
-
         # Group annotations by image_id
-        image_to_anns = defaultdict(list)
-        for ann in self.merged_data['annotations']:
-            image_to_anns[ann['image_id']].append(ann)
+        image_to_anns = AnnotationIndex(self.merged_data['annotations'])
 
-        # Shuffle images
-        images = self.merged_data['images'].copy()
-        random.shuffle(images)
+        # Shuffle image indices (no copy of the image list)
+        images = self.merged_data['images']
+        order = np.random.default_rng(seed).permutation(len(images))
 
         # Split
         total = len(images)
@@ -264,9 +530,8 @@ class DatasetMerger:
         val_end = int(total * (train_ratio + val_ratio))
 
         splits = {
-            'train': images[:train_end],
-            'val': images[train_end:val_end],
-            'test': images[val_end:]
+            name: [images[i] for i in idx.tolist()]
+            for name, idx in zip(('train', 'val', 'test'), np.split(order, [train_end, val_end]))
         }
 
         print(f"\n   Total images: {total}")
@@ -276,8 +541,19 @@ class DatasetMerger:
 
         return splits, image_to_anns
 
-    def save_split(self, split_name, split_images, image_to_anns, output_dir):
-        """Save a dataset split"""
+    def save_split(self, split_name, split_images, image_to_anns, output_dir, compress=False):
+        """
+        Save a dataset split
+
+        The annotations.json is streamed: annotation records are copied
+        from the spool still encoded, so the split is never built as one
+        dict tree or dumped into one string. With `compress`, it is written
+        as annotations.json.gz instead, next to an indented
+        annotations_preview.json holding the first few annotations.
+
+        Returns:
+            The split's info, images and categories, and its annotation count
+        """
 
         output_dir.mkdir(parents=True, exist_ok=True)
         images_dir = output_dir / "images"
@@ -287,37 +563,83 @@ class DatasetMerger:
         split_data = {
             "info": self.merged_data['info'].copy(),
             "images": [],
-            "annotations": [],
+            "num_annotations": 0,
             "categories": self.merged_data['categories']
         }
         split_data['info']['description'] += f" - {split_name.upper()}"
 
-        # Copy images and annotations
+        # Collect images and annotation rows
+        rows = []
         for img_info in tqdm(split_images, desc=f"  Saving {split_name}"):
             # Add image info
             split_data['images'].append(img_info)
 
             # Add annotations
-            anns = image_to_anns.get(img_info['id'], [])
-            split_data['annotations'].extend(anns)
+            rows.extend(image_to_anns.rows_of(img_info['id']))
 
             # Note: Images are not copied here to save disk space
             # They should already be in data/raw directories
-            # If you want to copy them, uncomment below:
+            # If you want them in the split, hardlink rather than copy
+            # (from _fileops import fast_clone), uncomment below:
             # source_path = ... (find original image)
             # dest_path = images_dir / img_info['file_name']
-            # shutil.copy2(source_path, dest_path)
+            # fast_clone(source_path, dest_path, link=True)
 
-        # Save annotations
-        ann_path = output_dir / "annotations.json"
-        with open(ann_path, 'w') as f:
-            json.dump(split_data, f, indent=2)
+        split_data['num_annotations'] = len(rows)
 
-        print(f"   ✓ Saved {split_name}: {len(split_data['images'])} images, {len(split_data['annotations'])} annotations")
+        # Save annotations
+        annotations = self.merged_data['annotations']
+        ann_path = output_dir / ("annotations.json.gz" if compress else "annotations.json")
+        dump_json_stream(ann_path, [
+            ("info", split_data['info']),
+            ("images", split_data['images']),
+            ("annotations", (annotations.read_raw(row).rstrip(b'\n') for row in rows)),
+            ("categories", split_data['categories'])
+        ], compresslevel=GZIP_LEVEL if compress else None)
+
+        if compress:
+            preview_rows = rows[:PREVIEW_ANNOTATIONS]
+            image_ids = annotations.image_ids
+            preview_ids = {int(image_ids[row]) for row in preview_rows}
+            dump_json({
+                "info": split_data['info'],
+                "images": [img for img in split_data['images'] if img['id'] in preview_ids],
+                "annotations": [annotations[row] for row in preview_rows],
+                "categories": split_data['categories']
+            }, output_dir / "annotations_preview.json")
+
+        print(f"   ✓ Saved {split_name}: {len(split_data['images'])} images, {len(rows)} annotations")
         print(f"      Location: {output_dir}/")
 
         return split_data
 
+    def export_to_ffcv(self, split_name, split_images, image_to_anns, out_path):
+        """
+        Write a split as one FFCV .beton file (image, bboxes, labels columns)
+
+        Training then reads one file sequentially, decoding with ffcv's
+        compiled pipeline, instead of opening every PNG and the COCO JSON.
+        """
+        if DatasetWriter is None:
+            print("   ⚠️  ffcv is not installed (pip install ffcv), skipping .beton export")
+            return False
+
+        dataset = FFCVSplitDataset(split_images, image_to_anns, self.image_paths)
+        truncated = sum(
+            len(image_to_anns.rows_of(img['id'])) > FFCV_MAX_BOXES for img in split_images
+        )
+        writer = DatasetWriter(str(out_path), {
+            'image': RGBImageField(max_resolution=FFCV_MAX_RESOLUTION, jpeg_quality=FFCV_JPEG_QUALITY),
+            'bboxes': NDArrayField(shape=(FFCV_MAX_BOXES, 4), dtype=np.dtype('float32')),
+            'labels': NDArrayField(shape=(FFCV_MAX_BOXES,), dtype=np.dtype('int64'))
+        }, num_workers=os.cpu_count())
+        writer.from_indexed_dataset(dataset)
+
+        print(f"   ✓ Exported {split_name}: {out_path}")
+        if truncated:
+            print(f"      ⚠️  {truncated} images had more than {FFCV_MAX_BOXES} boxes (truncated)")
+        return True
+
     def print_statistics(self):
         """Print dataset statistics"""
 
@@ -329,33 +651,44 @@ class DatasetMerger:
         print(f"\n🖼️  Total Images: {len(self.merged_data['images'])}")
         print(f"🏷️  Total Annotations: {len(self.merged_data['annotations'])}")
 
-        # Class distribution
-        class_counts = defaultdict(int)
-        for ann in self.merged_data['annotations']:
-            cat_id = ann['category_id']
-            cat_name = next(c['name'] for c in self.merged_data['categories'] if c['id'] == cat_id)
-            class_counts[cat_name] += 1
+        # Class distribution (counted in C by np.unique)
+        annotations = self.merged_data['annotations']
+        id_to_name = {c['id']: c['name'] for c in self.merged_data['categories']}
+        class_counts = Counter()
+        for cat_id, count in zip(*np.unique(annotations.category_ids, return_counts=True)):
+            class_counts[id_to_name[int(cat_id)]] += int(count)
 
         print(f"\n📊 Class Distribution:")
         for class_name in sorted(class_counts.keys()):
             count = class_counts[class_name]
-            percentage = count / len(self.merged_data['annotations']) * 100
+            percentage = count / len(annotations) * 100
             print(f"   {class_name}: {count} ({percentage:.1f}%)")
 
-        # Source distribution
+        # Source distribution (np.unique returns sources sorted)
         print(f"\n📁 Sources:")
-        source_counts = defaultdict(int)
-        for img in self.merged_data['images']:
-            source = img.get('source', 'unknown')
-            source_counts[source] += 1
-
-        for source in sorted(source_counts.keys()):
-            count = source_counts[source]
-            percentage = count / len(self.merged_data['images']) * 100
+        images = self.merged_data['images']
+        sources = np.array([img.get('source', 'unknown') for img in images], dtype=str)
+
+        for source, count in zip(*np.unique(sources, return_counts=True)):
+            percentage = count / len(images) * 100
             print(f"   {source}: {count} images ({percentage:.1f}%)")
 
 def main():
     """Main execution"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Merge all datasets into train/val/test COCO splits')
+    parser.add_argument(
+        '--ffcv',
+        action='store_true',
+        help='Also write each split as an FFCV dataset.beton (requires ffcv)'
+    )
+    parser.add_argument(
+        '--gzip',
+        action='store_true',
+        help='Write annotations.json.gz (plus a short annotations_preview.json) instead of annotations.json'
+    )
+    args = parser.parse_args()
 
     print("\n" + "=" * 60)
     print("🔗 Merging All Datasets")
@@ -367,42 +700,27 @@ def main():
     # 1. Add Roboflow datasets
     roboflow_dir = DATA_RAW / "roboflow"
     if roboflow_dir.exists():
-        for dataset_dir in roboflow_dir.iterdir():
-            if dataset_dir.is_dir():
-                # Find annotations.json
-                ann_files = list(dataset_dir.rglob("*annotations*.json"))
-                if ann_files:
-                    ann_file = ann_files[0]
-                    images_dir = ann_file.parent / "images"
-                    if not images_dir.exists():
-                        images_dir = ann_file.parent
-
-                    merger.add_dataset(f"roboflow_{dataset_dir.name}", ann_file, images_dir)
+        for name, ann_file, images_dir in find_datasets(roboflow_dir):
+            merger.add_dataset(f"roboflow_{name}", ann_file, images_dir)
 
     # 2. Add Kaggle datasets
     kaggle_dir = DATA_RAW / "kaggle"
     if kaggle_dir.exists():
-        for dataset_dir in kaggle_dir.iterdir():
-            if dataset_dir.is_dir():
-                ann_files = list(dataset_dir.rglob("*annotations*.json"))
-                if ann_files:
-                    ann_file = ann_files[0]
-                    images_dir = ann_file.parent / "images"
-                    if not images_dir.exists():
-                        images_dir = ann_file.parent
-
-                    merger.add_dataset(f"kaggle_{dataset_dir.name}", ann_file, images_dir)
+        for name, ann_file, images_dir in find_datasets(kaggle_dir):
+            merger.add_dataset(f"kaggle_{name}", ann_file, images_dir)
 
     # 3. Add auto-labeled datasets
     auto_labeled_dir = DATA_RAW / "auto_labeled"
     if auto_labeled_dir.exists():
-        for dataset_dir in auto_labeled_dir.iterdir():
-            if dataset_dir.is_dir():
-                ann_file = dataset_dir / "annotations.json"
-                images_dir = dataset_dir / "images"
+        with os.scandir(auto_labeled_dir) as it:
+            dataset_dirs = [Path(entry.path) for entry in it if entry.is_dir()]
 
-                if ann_file.exists():
-                    merger.add_dataset(f"auto_{dataset_dir.name}", ann_file, images_dir)
+        for dataset_dir in dataset_dirs:
+            ann_file = dataset_dir / "annotations.json"
+            images_dir = dataset_dir / "images"
+
+            if ann_file.exists():
+                merger.add_dataset(f"auto_{dataset_dir.name}", ann_file, images_dir)
 
     # 4. Add manual labeled dataset
     manual_dir = DATA_RAW.parent / "manual_labeled"
@@ -413,6 +731,8 @@ def main():
         if ann_file.exists():
             merger.add_dataset("manual", ann_file, images_dir)
 
+    merger.save_hash_cache()
+
     # Print statistics
     merger.print_statistics()
 
@@ -435,7 +755,9 @@ def main():
 
     for split_name in ['train', 'val', 'test']:
         output_dir = DATA_FINAL / split_name
-        merger.save_split(split_name, splits[split_name], image_to_anns, output_dir)
+        merger.save_split(split_name, splits[split_name], image_to_anns, output_dir, compress=args.gzip)
+        if args.ffcv:
+            merger.export_to_ffcv(split_name, splits[split_name], image_to_anns, output_dir / "dataset.beton")
 
     # Final summary
     print(f"\n{'='*60}")
@@ -443,16 +765,17 @@ def main():
     print(f"{'='*60}")
     print(f"End time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
 
+    ann_name = "annotations.json.gz" if args.gzip else "annotations.json"
     print(f"\n📂 Output Structure:")
     print(f"   {DATA_TRAIN}/")
     print(f"   ├── images/")
-    print(f"   └── annotations.json")
+    print(f"   └── {ann_name}")
     print(f"   {DATA_VAL}/")
     print(f"   ├── images/")
-    print(f"   └── annotations.json")
+    print(f"   └── {ann_name}")
     print(f"   {DATA_TEST}/")
     print(f"   ├── images/")
-    print(f"   └── annotations.json")
+    print(f"   └── {ann_name}")
 
     print(f"\n🚀 Next Steps:")
     print(f"   1. Verify dataset:")
@@ -4,6 +4,8 @@ Converts PDFs to high-quality PNG images and sets up LabelImg environment
 """
 
 import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from pdf2image import convert_from_path
 from PIL import Image
@@ -15,6 +17,10 @@ LABELING_DIR = PROJECT_ROOT / "korean_vehicle_detection" / "data" / "labeling"
 IMAGES_DIR = LABELING_DIR / "images"
 LABELS_DIR = LABELING_DIR / "labels"
 
+# zlib level for the page PNGs (1: several times faster than PIL's default 6,
+# ~20% larger files; these are labeling intermediates)
+PNG_COMPRESS_LEVEL = 1
+
 # Create directories
 IMAGES_DIR.mkdir(parents=True, exist_ok=True)
 LABELS_DIR.mkdir(parents=True, exist_ok=True)
@@ -23,6 +29,10 @@ def convert_pdf_to_png(pdf_path: Path, output_dir: Path, dpi: int = 300):
     """
     Convert PDF to high-resolution PNG
 
+    Pages are rasterized by Poppler on all cores to uncompressed PPM files
+    (no PIL image per page held in memory), then encoded to
+    <stem>_page<N>.png with fast zlib settings on a thread pool.
+
     Args:
         pdf_path: Path to PDF file
         output_dir: Output directory for PNG
@@ -31,27 +41,33 @@ def convert_pdf_to_png(pdf_path: Path, output_dir: Path, dpi: int = 300):
     print(f"\n📄 Converting {pdf_path.name}...")
 
     try:
-        # Convert PDF to images
-        images = convert_from_path(pdf_path, dpi=dpi)
-
-        print(f"   Pages found: {len(images)}")
-
-        # Save each page
-        for i, image in enumerate(images):
-            # Generate output filename
-            output_name = f"{pdf_path.stem}_page{i+1}.png"
-            output_path = output_dir / output_name
-
-            # Save as PNG
-            image.save(output_path, "PNG")
-
-            # Get image info
-            width, height = image.size
-            file_size = output_path.stat().st_size / (1024**2)  # MB
-
-            print(f"   ✓ {output_name}")
-            print(f"     Resolution: {width}x{height} pixels")
-            print(f"     Size: {file_size:.1f} MB")
+        # Render pages to raw PPM files in a scratch dir
+        with tempfile.TemporaryDirectory(dir=output_dir) as tmp_dir:
+            pages = convert_from_path(
+                pdf_path,
+                dpi=dpi,
+                fmt='ppm',
+                thread_count=os.cpu_count(),
+                output_folder=tmp_dir,
+                output_file=pdf_path.stem,
+                paths_only=True
+            )
+
+            print(f"   Pages found: {len(pages)}")
+
+            # Encode pages to PNG in parallel (zlib releases the GIL);
+            # pages come back in page order
+            output_paths = [output_dir / f"{pdf_path.stem}_page{i+1}.png" for i in range(len(pages))]
+            with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+                sizes = list(executor.map(save_png, pages, output_paths))
+
+            for output_path, (width, height) in zip(output_paths, sizes):
+                output_name = output_path.name
+                file_size = output_path.stat().st_size / (1024**2)  # MB
+
+                print(f"   ✓ {output_name}")
+                print(f"     Resolution: {width}x{height} pixels")
+                print(f"     Size: {file_size:.1f} MB")
 
         return True
 
@@ -59,6 +75,12 @@ def convert_pdf_to_png(pdf_path: Path, output_dir: Path, dpi: int = 300):
         print(f"   ✗ Error: {e}")
         return False
 
+def save_png(src_path, output_path):
+    """Re-encode a rendered page as PNG; returns its (width, height)"""
+    with Image.open(src_path) as image:
+        image.save(output_path, "PNG", compress_level=PNG_COMPRESS_LEVEL, optimize=False)
+        return image.size
+
 def create_class_file():
     """Create classes.txt for LabelImg"""
     classes = [
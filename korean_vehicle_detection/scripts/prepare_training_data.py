@@ -4,12 +4,15 @@ Splits data into train/val/test sets
 """
 
 import os
-import json
-import shutil
-import random
 from pathlib import Path
+from collections import Counter
 from datetime import datetime
 
+import numpy as np
+
+from _fileops import fast_clone, walk_sizes
+from _jsonio import dump_json, load_json
+
 # Project paths
 PROJECT_ROOT = Path(__file__).parent.parent
 MANUAL_DATA = PROJECT_ROOT / "data" / "manual_labeled"
@@ -34,8 +37,7 @@ def split_data(train_ratio=0.7, val_ratio=0.2, test_ratio=0.1, seed=42):
         print(f"\n❌ Manual annotations not found: {manual_json}")
         return False
 
-    with open(manual_json, 'r') as f:
-        manual_data = json.load(f)
+    manual_data = load_json(manual_json)
 
     print(f"\n✓ Loaded manual annotations")
     print(f"   Images: {len(manual_data['images'])}")
@@ -45,8 +47,8 @@ def split_data(train_ratio=0.7, val_ratio=0.2, test_ratio=0.1, seed=42):
     image_ids = [img['id'] for img in manual_data['images']]
 
     # Shuffle
-    random.seed(seed)
-    random.shuffle(image_ids)
+    order = np.random.default_rng(seed).permutation(len(image_ids))
+    image_ids = [image_ids[i] for i in order.tolist()]
 
     # Split
     total = len(image_ids)
@@ -97,11 +99,12 @@ def split_data(train_ratio=0.7, val_ratio=0.2, test_ratio=0.1, seed=42):
             if img['id'] in ids:
                 split_data['images'].append(img)
 
-                # Copy image
+                # Hardlink image (shares the inode; training only reads it),
+                # falling back to a reflink / copy across filesystems
                 src = MANUAL_DATA / "images" / img['file_name']
                 dst = images_dir / img['file_name']
                 if src.exists() and not dst.exists():
-                    shutil.copy2(src, dst)
+                    fast_clone(src, dst, link=True)
 
         # Filter annotations
         for ann in manual_data['annotations']:
@@ -110,8 +113,7 @@ def split_data(train_ratio=0.7, val_ratio=0.2, test_ratio=0.1, seed=42):
 
         # Save annotations
         ann_file = split_dir / "annotations.json"
-        with open(ann_file, 'w') as f:
-            json.dump(split_data, f, indent=2)
+        dump_json(split_data, ann_file)
 
         print(f"\n✓ {split_name.upper()} set created:")
         print(f"   Images: {len(split_data['images'])}")
@@ -124,25 +126,17 @@ def split_data(train_ratio=0.7, val_ratio=0.2, test_ratio=0.1, seed=42):
     print("=" * 60)
 
     # Load train data
-    with open(TRAIN_DIR / "annotations.json", 'r') as f:
-        train_data = json.load(f)
+    train_data = load_json(TRAIN_DIR / "annotations.json")
 
-    class_counts = {}
-    for ann in train_data['annotations']:
-        cid = ann['category_id']
-        class_counts[cid] = class_counts.get(cid, 0) + 1
+    id_to_name = {c['id']: c['name'] for c in train_data['categories']}
+    class_counts = Counter(ann['category_id'] for ann in train_data['annotations'])
 
     for cid, count in sorted(class_counts.items()):
-        cat = next(c for c in train_data['categories'] if c['id'] == cid)
         percentage = count / len(train_data['annotations']) * 100
-        print(f"   {cat['name']}: {count} ({percentage:.1f}%)")
+        print(f"   {id_to_name[cid]}: {count} ({percentage:.1f}%)")
 
     # Calculate total size
-    total_size = 0
-    for split_dir in [TRAIN_DIR, VAL_DIR, TEST_DIR]:
-        for f in split_dir.rglob("*"):
-            if f.is_file():
-                total_size += f.stat().st_size
+    total_size = sum(walk_sizes(split_dir)[1] for split_dir in [TRAIN_DIR, VAL_DIR, TEST_DIR])
 
     print(f"\n💾 Total Size: {total_size / (1024**2):.1f} MB")
 
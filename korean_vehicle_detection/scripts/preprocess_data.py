@@ -4,13 +4,27 @@ Converts DOTA/AI Hub data to COCO format and splits into train/val/test sets
 """
 
 import os
-import json
-import shutil
 from pathlib import Path
 from typing import Dict, List
 import random
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import datetime
 
+from _dota_labels import CLASS_MAPPING, parse_dota_annotation
+from _fileops import fast_clone, tree_size
+from _jsonio import dump_json, dump_json_stream, load_json
+
+try:
+    import imagesize  # Reads only the PNG/JPEG/TIFF header bytes for sizes
+except ImportError:
+    imagesize = None
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None  # Sizes then default to 1024x1024 unless imagesize reads them
+
 # Project paths
 PROJECT_ROOT = Path(__file__).parent.parent
 DATA_PROCESSED = PROJECT_ROOT / "data" / "processed"
@@ -18,16 +32,9 @@ DATA_TRAIN = PROJECT_ROOT / "data" / "train"
 DATA_VAL = PROJECT_ROOT / "data" / "val"
 DATA_TEST = PROJECT_ROOT / "data" / "test"
 
-# Vehicle classes mapping
-# DOTA classes → Our unified classes
-CLASS_MAPPING = {
-    "small-vehicle": 1,
-    "large-vehicle": 2,
-    "car": 1,  # Maps to small-vehicle
-    "truck": 2,  # Maps to large-vehicle
-    "bus": 2,  # Maps to large-vehicle
-    "vehicle": 1,  # Generic vehicle → small
-}
+# Image sizes from earlier runs, keyed by name + file size + mtime (split
+# images are links to the processed ones, so entries survive re-splits)
+DIM_CACHE = DATA_PROCESSED / ".dim_cache.json"
 
 CLASSES = {
     0: "background",
@@ -35,85 +42,102 @@ CLASSES = {
     2: "large-vehicle"
 }
 
-def parse_dota_annotation(label_file: Path) -> List[Dict]:
-    """
-    Parse DOTA annotation format
+# Threads reading image headers (I/O bound, so more than the core count)
+SIZE_PROBE_WORKERS = min(32, (os.cpu_count() or 1) * 4)
+
+# Threads linking / copying files into the split directories
+COPY_WORKERS = 16
+
+def index_labels(labels_dir: Path) -> Dict[str, str]:
+    """{stem: path} of the .txt label files in `labels_dir` (empty if it doesn't exist)"""
+    try:
+        with os.scandir(labels_dir) as it:
+            return {entry.name[:-4]: entry.path for entry in it if entry.name.endswith('.txt')}
+    except FileNotFoundError:
+        return {}
+
+def load_dim_cache() -> Dict:
+    """{'<name>:<size>:<mtime_ns>': [width, height]} saved by an earlier run (empty if none)"""
+    try:
+        return load_json(DIM_CACHE)
+    except (OSError, ValueError):
+        return {}
+
+def save_dim_cache(dim_cache: Dict):
+    """Persist image sizes so the next run skips opening unchanged images"""
+    DIM_CACHE.parent.mkdir(parents=True, exist_ok=True)
+    dump_json(dim_cache, DIM_CACHE, indent=False)
+
+def probe_image_size(image_file: Path, dim_cache: Dict = None):
+    """(width, height) from the image header; 1024x1024 if it can't be read"""
+    try:
+        key = None
+        if dim_cache is not None:
+            st = image_file.stat()
+            key = f"{image_file.name}:{st.st_size}:{st.st_mtime_ns}"
+            cached = dim_cache.get(key)
+            if cached is not None:
+                return tuple(cached)
+
+        size = imagesize.get(str(image_file)) if imagesize is not None else (-1, -1)
+        if size[0] <= 0 or size[1] <= 0:
+            # Unsupported format or imagesize missing
+            if Image is None:
+                return 1024, 1024
+            with Image.open(image_file) as img:
+                size = img.size
 
-    DOTA format (labelTxt):
-    x1 y1 x2 y2 x3 y3 x4 y4 class difficulty
+        if key is not None:
+            dim_cache[key] = list(size)
+        return size
+    except Exception:
+        # Default size if image can't be opened
+        return 1024, 1024
 
-    Returns:
-        List of bounding boxes with class and difficulty
+def read_image_records(image_files: List[Path], dim_cache: Dict = None):
     """
-    annotations = []
-
-    if not label_file.exists():
-        return annotations
-
-    with open(label_file, 'r') as f:
-        lines = f.readlines()
+    Size and parsed DOTA annotations of every image
 
-    for line in lines:
-        line = line.strip()
-        if not line or line.startswith('imagesource') or line.startswith('gsd'):
-            continue
+    Image sizes found in `dim_cache` (see load_dim_cache) are not re-read;
+    new ones are added to it.
 
-        parts = line.split()
-        if len(parts) < 9:
-            continue
-
-        try:
-            # Parse coordinates (8 points for oriented bbox)
-            x1, y1, x2, y2, x3, y3, x4, y4 = map(float, parts[:8])
-            class_name = parts[8].lower()
-            difficulty = int(parts[9]) if len(parts) > 9 else 0
-
-            # Map class name
-            if class_name not in CLASS_MAPPING:
-                continue
-
-            class_id = CLASS_MAPPING[class_name]
-
-            # Convert oriented bbox to axis-aligned bbox (COCO format)
-            x_coords = [x1, x2, x3, x4]
-            y_coords = [y1, y2, y3, y4]
-
-            x_min = min(x_coords)
-            y_min = min(y_coords)
-            x_max = max(x_coords)
-            y_max = max(y_coords)
-
-            width = x_max - x_min
-            height = y_max - y_min
-
-            # Filter out invalid boxes
-            if width <= 0 or height <= 0:
-                continue
-
-            annotations.append({
-                "bbox": [x_min, y_min, width, height],  # COCO format: [x, y, w, h]
-                "category_id": class_id,
-                "difficulty": difficulty,
-                "area": width * height,
-                "iscrowd": 0
-            })
-
-        except Exception as e:
-            print(f"Error parsing line: {line[:50]}... - {e}")
-            continue
-
-    return annotations
-
-def create_coco_dataset(image_files: List[Path], output_path: Path, split_name: str):
+    Returns:
+        (list of (width, height), list of annotation lists), in image order
     """
-    Create COCO format JSON from DOTA annotations
+    # Label file of each image (None if it has none), from one listing of
+    # each ../labels directory instead of a path build + stat per image
+    label_indexes = {}
+    label_files = []
+    for image_file in image_files:
+        labels = label_indexes.get(image_file.parent)
+        if labels is None:
+            labels = label_indexes[image_file.parent] = index_labels(image_file.parent.parent / "labels")
+        label_files.append(labels.get(image_file.stem))
+
+    # Parse label files on all cores while image headers are read on a
+    # thread pool; map keeps input order, so image and annotation ids stay
+    # the same as a serial pass
+    with ProcessPoolExecutor(max_workers=os.cpu_count()) as process_executor:
+        existing = [label_file for label_file in label_files if label_file is not None]
+        parsed = process_executor.map(parse_dota_annotation, existing, chunksize=64)
+
+        with ThreadPoolExecutor(max_workers=SIZE_PROBE_WORKERS) as executor:
+            sizes = list(executor.map(
+                lambda image_file: probe_image_size(image_file, dim_cache), image_files, chunksize=32
+            ))
+
+        parsed = iter(list(parsed))
+
+    annotations_per_image = [next(parsed) if label_file is not None else [] for label_file in label_files]
+    return sizes, annotations_per_image
+
+def build_coco_dataset(image_files: List[Path], sizes: List, annotations_per_image: List[List[Dict]],
+                       output_path: Path, split_name: str):
+    """
+    Assemble and write a split's COCO JSON from read_image_records output
 
-    COCO format:
-    {
-        "images": [...],
-        "annotations": [...],
-        "categories": [...]
-    }
+    Returns:
+        (coco_data, Counter of annotations per category id)
     """
     coco_data = {
         "info": {
@@ -131,17 +155,10 @@ def create_coco_dataset(image_files: List[Path], output_path: Path, split_name:
     }
 
     annotation_id = 1
+    class_counts = Counter()
 
-    for image_id, image_file in enumerate(image_files, start=1):
+    for image_id, (image_file, (width, height), annotations) in enumerate(zip(image_files, sizes, annotations_per_image), start=1):
         # Image info
-        try:
-            from PIL import Image
-            with Image.open(image_file) as img:
-                width, height = img.size
-        except Exception:
-            # Default size if image can't be opened
-            width, height = 1024, 1024
-
         image_info = {
             "id": image_id,
             "file_name": image_file.name,
@@ -151,22 +168,91 @@ def create_coco_dataset(image_files: List[Path], output_path: Path, split_name:
         coco_data["images"].append(image_info)
 
         # Annotations
-        label_dir = image_file.parent.parent / "labels"
-        label_file = label_dir / f"{image_file.stem}.txt"
-
-        annotations = parse_dota_annotation(label_file)
-
         for ann in annotations:
             ann["id"] = annotation_id
             ann["image_id"] = image_id
             coco_data["annotations"].append(ann)
+            class_counts[ann["category_id"]] += 1
             annotation_id += 1
 
-    # Save COCO JSON
-    with open(output_path, 'w') as f:
-        json.dump(coco_data, f, indent=2)
+    # Save COCO JSON (compact, streamed one image / annotation at a time)
+    dump_json_stream(output_path, list(coco_data.items()))
+
+    return coco_data, class_counts
+
+def create_coco_dataset(image_files: List[Path], output_path: Path, split_name: str, dim_cache: Dict = None):
+    """
+    Create COCO format JSON from DOTA annotations
+
+    Image sizes found in `dim_cache` (see load_dim_cache) are not re-read;
+    new ones are added to it.
+
+    Returns:
+        (coco_data, Counter of annotations per category id)
+
+    COCO format:
+    {
+        "images": [...],
+        "annotations": [...],
+        "categories": [...]
+    }
+    """
+    sizes, annotations_per_image = read_image_records(image_files, dim_cache)
+    return build_coco_dataset(image_files, sizes, annotations_per_image, output_path, split_name)
+
+def create_coco_datasets(splits: Dict[str, tuple], dim_cache: Dict = None) -> Dict[str, tuple]:
+    """
+    create_coco_dataset for several splits with one read pass
 
-    return coco_data
+    All splits' images go through a single read_image_records call (one
+    process pool, one thread pool), then each split's JSON is written.
+
+    Args:
+        splits: {split_name: (image_files, output_path)}
+
+    Returns:
+        {split_name: (coco_data, Counter of annotations per category id)}
+    """
+    all_images = [image_file for image_files, _ in splits.values() for image_file in image_files]
+    sizes, annotations_per_image = read_image_records(all_images, dim_cache)
+
+    results = {}
+    start = 0
+    for split_name, (image_files, output_path) in splits.items():
+        end = start + len(image_files)
+        results[split_name] = build_coco_dataset(
+            image_files, sizes[start:end], annotations_per_image[start:end], output_path, split_name
+        )
+        start = end
+    return results
+
+def list_files(directory: Path, extensions: List[str] = None) -> List[Path]:
+    """
+    Files in `directory` from one os.scandir pass (file types come from the
+    listing, no stat per entry)
+
+    With `extensions`, only names with one of them (case-sensitive) are
+    kept, grouped by extension in the given order - the same list a
+    glob("*<ext>") per extension would build, minus directories. Otherwise
+    every file whose name contains a dot is returned, as with glob("*.*").
+    """
+    groups = {ext: [] for ext in extensions or ()}
+    files = []
+    with os.scandir(directory) as it:
+        for entry in it:
+            name = entry.name
+            if '.' not in name or not entry.is_file():
+                continue
+            if extensions is None:
+                files.append(Path(entry.path))
+                continue
+            group = groups.get(os.path.splitext(name)[1])
+            if group is not None:
+                group.append(Path(entry.path))
+
+    for group in groups.values():
+        files.extend(group)
+    return files
 
 def split_dataset(images_dir: Path, train_ratio=0.7, val_ratio=0.2, test_ratio=0.1, seed=42):
     """
@@ -181,9 +267,7 @@ def split_dataset(images_dir: Path, train_ratio=0.7, val_ratio=0.2, test_ratio=0
     """
     # Get all image files
     image_extensions = ['.png', '.jpg', '.jpeg', '.tif', '.tiff']
-    all_images = []
-    for ext in image_extensions:
-        all_images.extend(images_dir.glob(f"*{ext}"))
+    all_images = list_files(images_dir, image_extensions)
 
     if not all_images:
         print(f"❌ No images found in {images_dir}")
@@ -209,28 +293,38 @@ def split_dataset(images_dir: Path, train_ratio=0.7, val_ratio=0.2, test_ratio=0
 
     return train_images, val_images, test_images
 
+def _link_file(src: Path, dst: Path):
+    """fast_clone `src` to `dst` unless `dst` exists or `src` doesn't"""
+    if not dst.exists() and src.exists():
+        fast_clone(src, dst, link=True)
+
 def copy_images_and_labels(image_files: List[Path], target_dir: Path):
-    """Copy images and labels to target directory"""
+    """
+    Copy images and labels to target directory
+
+    Files are hardlinked when source and target share a filesystem (the
+    splits are only read), else copied in-kernel via fast_clone, on a
+    thread pool when they have to be copied.
+    """
     target_images_dir = target_dir / "images"
     target_labels_dir = target_dir / "labels"
 
     target_images_dir.mkdir(parents=True, exist_ok=True)
     target_labels_dir.mkdir(parents=True, exist_ok=True)
 
+    # Image + label pairs (labels live in ../labels next to each image dir)
+    sources = []
+    targets = []
     for img_file in image_files:
-        # Copy image
-        target_img = target_images_dir / img_file.name
-        if not target_img.exists():
-            shutil.copy2(img_file, target_img)
+        sources.append(img_file)
+        targets.append(target_images_dir / img_file.name)
 
-        # Copy label
-        label_dir = img_file.parent.parent / "labels"
-        label_file = label_dir / f"{img_file.stem}.txt"
+        label_name = f"{img_file.stem}.txt"
+        sources.append(img_file.parent.parent / "labels" / label_name)
+        targets.append(target_labels_dir / label_name)
 
-        if label_file.exists():
-            target_label = target_labels_dir / label_file.name
-            if not target_label.exists():
-                shutil.copy2(label_file, target_label)
+    with ThreadPoolExecutor(max_workers=COPY_WORKERS) as executor:
+        list(executor.map(_link_file, sources, targets))
 
 def main():
     """Main preprocessing pipeline"""
@@ -240,7 +334,7 @@ def main():
 
     # Check if processed data exists
     images_dir = DATA_PROCESSED / "images"
-    if not images_dir.exists() or not list(images_dir.glob("*.*")):
+    if not images_dir.exists() or not list_files(images_dir):
         print("\n❌ 처리된 데이터가 없습니다!")
         print("📂 확인 경로:", images_dir)
         print("\n💡 먼저 다음 스크립트를 실행하세요:")
@@ -261,25 +355,21 @@ def main():
     copy_images_and_labels(test_images, DATA_TEST)
 
     # Create COCO format annotations
+    # (from the split lists: the split dirs just received these same files,
+    # so they aren't listed again; labels resolve from the processed tree)
     print("\n🔄 COCO format 변환 중...")
+    dim_cache = load_dim_cache()
 
-    train_coco = create_coco_dataset(
-        list((DATA_TRAIN / "images").glob("*.*")),
-        DATA_TRAIN / "annotations.json",
-        "train"
-    )
+    coco_splits = create_coco_datasets({
+        "train": (train_images, DATA_TRAIN / "annotations.json"),
+        "val": (val_images, DATA_VAL / "annotations.json"),
+        "test": (test_images, DATA_TEST / "annotations.json")
+    }, dim_cache)
+    train_coco, train_classes = coco_splits["train"]
+    val_coco, _ = coco_splits["val"]
+    test_coco, _ = coco_splits["test"]
 
-    val_coco = create_coco_dataset(
-        list((DATA_VAL / "images").glob("*.*")),
-        DATA_VAL / "annotations.json",
-        "val"
-    )
-
-    test_coco = create_coco_dataset(
-        list((DATA_TEST / "images").glob("*.*")),
-        DATA_TEST / "annotations.json",
-        "test"
-    )
+    save_dim_cache(dim_cache)
 
     # Statistics
     print("\n" + "=" * 60)
@@ -295,23 +385,14 @@ def main():
     print(f"   Images: {len(test_coco['images']):,}장")
     print(f"   Annotations: {len(test_coco['annotations']):,}개")
 
-    # Class distribution
-    train_classes = {}
-    for ann in train_coco['annotations']:
-        cid = ann['category_id']
-        train_classes[cid] = train_classes.get(cid, 0) + 1
-
+    # Class distribution (counted while the annotations were built)
     print(f"\n클래스 분포 (Train):")
     for cid, count in train_classes.items():
         class_name = CLASSES[cid]
         print(f"   {class_name}: {count:,}개 ({count/len(train_coco['annotations'])*100:.1f}%)")
 
     # Calculate total size
-    total_size = 0
-    for data_dir in [DATA_TRAIN, DATA_VAL, DATA_TEST]:
-        for f in data_dir.glob("**/*"):
-            if f.is_file():
-                total_size += f.stat().st_size
+    total_size = sum(tree_size(data_dir) for data_dir in [DATA_TRAIN, DATA_VAL, DATA_TEST])
 
     print(f"\n💾 총 데이터 크기: {total_size / (1024**3):.2f} GB")
 
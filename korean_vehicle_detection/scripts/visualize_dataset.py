@@ -3,13 +3,19 @@ Visualize Dataset
 Check dataset quality and visualize annotations
 """
 
-import json
-import cv2
-import random
+import os
+import hashlib
 import numpy as np
+from array import array
 from pathlib import Path
 from collections import defaultdict
-import matplotlib.pyplot as plt
+from concurrent.futures import ThreadPoolExecutor
+from tqdm import tqdm
+
+from _jsonio import json_sections, load_json
+
+# cv2 and matplotlib are imported in the functions that draw, so quality
+# checks (--check-only) don't pay for loading them
 
 # Project paths
 PROJECT_ROOT = Path(__file__).parent.parent
@@ -26,7 +32,154 @@ CLASS_NAMES = {
     2: 'large-vehicle',
 }
 
-def visualize_samples(split='train', num_samples=20, output_dir=None):
+# Decoded-image cache for re-runs: raw BGR arrays (.npy, mmap'd on load)
+# or re-encoded JPEG bytes (smaller, still one decode per run)
+CACHE_FORMATS = ('npy', 'jpg', 'none')
+
+# Size cap for that cache: least recently used entries beyond it are
+# deleted after each run (a decoded .npy is tens of MB)
+CACHE_MAX_BYTES = 2 * 1024**3
+
+# Default sample pick for the CLI, so re-runs draw the same images and
+# hit the cache; pass --seed to look at a different set
+DEFAULT_SEED = 42
+
+# Rendered samples are for eyeballing boxes: quality 85 with optimized
+# Huffman tables is a fraction of OpenCV's default 95 in size
+SAMPLE_JPEG_QUALITY = 85
+
+# Parsed split arrays by annotation file, with the file's (mtime, size)
+# they were read at: --plot and the quality check share one parse
+_split_arrays_cache = {}
+
+def load_split_arrays(ann_file):
+    """
+    Image sizes, category ids and bbox sizes of a COCO file as arrays
+
+    Annotations are streamed (ijson when installed, see
+    _jsonio.json_sections) into packed number arrays, so no
+    per-annotation dicts are kept. Results are cached per file until it
+    changes on disk; callers must not modify the arrays.
+
+    Returns:
+        (image_sizes (N, 2), category_ids (M,), bbox_sizes (M, 2) float64)
+    """
+    stat = os.stat(ann_file)
+    stamp = (stat.st_mtime_ns, stat.st_size)
+    cached = _split_arrays_cache.get(str(ann_file))
+    if cached is not None and cached[0] == stamp:
+        return cached[1]
+
+    images, annotations = json_sections(ann_file, ('images', 'annotations'))
+    image_sizes = np.array([(img['width'], img['height']) for img in images]).reshape(-1, 2)
+
+    category_ids = array('q')
+    bbox_sizes = array('d')
+    for ann in annotations:
+        category_ids.append(ann['category_id'])
+        bbox = ann['bbox']
+        bbox_sizes.append(bbox[2])
+        bbox_sizes.append(bbox[3])
+
+    arrays = (
+        image_sizes,
+        np.array(category_ids, dtype=np.int64),
+        np.array(bbox_sizes, dtype=np.float64).reshape(-1, 2)
+    )
+    _split_arrays_cache[str(ann_file)] = (stamp, arrays)
+    return arrays
+
+def count_classes(category_ids):
+    """{category id: annotation count}, ascending by id"""
+    cat_ids, counts = np.unique(category_ids, return_counts=True)
+    return dict(zip(cat_ids.tolist(), counts.tolist()))
+
+def find_files(root, names):
+    """
+    {file name: path} for each of `names` found anywhere under `root`
+
+    One os.walk over the tree for all names; the first path found wins
+    when names repeat.
+    """
+    found = {}
+    for dirpath, _, filenames in os.walk(root):
+        for name in names.intersection(filenames):
+            found.setdefault(name, Path(dirpath) / name)
+    return found
+
+def load_cached_image(path, cache_dir, cache_format='npy'):
+    """
+    cv2.imread() through a decoded-image cache in `cache_dir`
+
+    Entries are keyed by the image's path, mtime and size, so an edited
+    or replaced image is decoded again. A hit refreshes the entry's mtime,
+    which prune_image_cache() uses as its last-used time. Returns None if
+    the image can't be read.
+    """
+    import cv2
+
+    if cache_format == 'none':
+        return cv2.imread(str(path))
+
+    stat = path.stat()
+    key = hashlib.blake2b(
+        f"{path}|{stat.st_mtime_ns}|{stat.st_size}".encode(), digest_size=8
+    ).hexdigest()
+    cached = cache_dir / f"{key}.{cache_format}"
+
+    if cached.exists():
+        os.utime(cached)
+        if cache_format == 'npy':
+            return np.load(cached, mmap_mode='r').copy()
+        img = cv2.imread(str(cached))
+        if img is not None:
+            return img
+
+    img = cv2.imread(str(path))
+    if img is None:
+        return None
+
+    # Write under a temporary name so an interrupted run leaves no
+    # truncated entry behind
+    tmp = cache_dir / f"{key}.tmp.{cache_format}"
+    if cache_format == 'npy':
+        with open(tmp, 'wb') as f:
+            np.save(f, img)
+    else:
+        cv2.imencode('.jpg', img)[1].tofile(str(tmp))
+    os.replace(tmp, cached)
+
+    return img
+
+def prune_image_cache(cache_dir, max_bytes=CACHE_MAX_BYTES):
+    """
+    Delete the least recently used entries of a load_cached_image() cache
+    until it is at most `max_bytes`
+
+    Returns:
+        Number of entries deleted
+    """
+    entries = []
+    for entry in os.scandir(cache_dir):
+        if entry.is_file():
+            stat = entry.stat()
+            entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+
+    total = sum(size for _, size, _ in entries)
+    removed = 0
+    for _, size, entry_path in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(entry_path)
+        except FileNotFoundError:
+            pass
+        total -= size
+        removed += 1
+
+    return removed
+
+def visualize_samples(split='train', num_samples=20, output_dir=None, cache_format='npy', seed=None):
     """
     Visualize random samples from dataset
 
@@ -34,8 +187,18 @@ def visualize_samples(split='train', num_samples=20, output_dir=None):
         split: 'train', 'val', or 'test'
         num_samples: Number of samples to visualize
         output_dir: Output directory (default: data/{split}/visualizations)
+        cache_format: Decoded-image cache under output_dir/.cache
+                      ('npy', 'jpg' or 'none', see CACHE_FORMATS), kept
+                      under CACHE_MAX_BYTES
+        seed: Seed for picking the samples (default: a different pick each run)
     """
 
+    import cv2
+
+    # Samples are rendered on our own thread pool; keep OpenCV from starting
+    # its own worker threads inside every call
+    cv2.setNumThreads(0)
+
     split_dir = DATA_DIR / split
     ann_file = split_dir / "annotations.json"
     images_dir = split_dir / "images"
@@ -49,22 +212,28 @@ def visualize_samples(split='train', num_samples=20, output_dir=None):
     print(f"   Images: {images_dir}/")
 
     # Load annotations
-    with open(ann_file, 'r') as f:
-        data = json.load(f)
+    data = load_json(ann_file)
 
     # Build image_id to annotations mapping
     image_to_anns = defaultdict(list)
     for ann in data['annotations']:
         image_to_anns[ann['image_id']].append(ann)
 
-    # Select random images with annotations
-    images_with_anns = [img for img in data['images'] if img['id'] in image_to_anns]
+    # Select random images with annotations: draw from the annotated
+    # image ids, then look up only the picked images
+    id_to_img = {img['id']: img for img in data['images']}
+    ann_image_ids = np.fromiter(
+        (image_id for image_id in image_to_anns if image_id in id_to_img), dtype=np.int64
+    )
 
-    if len(images_with_anns) == 0:
+    if ann_image_ids.size == 0:
         print("❌ No images with annotations found!")
         return
 
-    samples = random.sample(images_with_anns, min(num_samples, len(images_with_anns)))
+    picked = np.random.default_rng(seed).choice(
+        ann_image_ids, size=min(num_samples, ann_image_ids.size), replace=False
+    )
+    samples = [id_to_img[image_id] for image_id in picked.tolist()]
 
     # Create output directory
     if output_dir is None:
@@ -74,45 +243,68 @@ def visualize_samples(split='train', num_samples=20, output_dir=None):
 
     output_dir.mkdir(parents=True, exist_ok=True)
 
+    cache_dir = output_dir / ".cache"
+    if cache_format != 'none':
+        cache_dir.mkdir(exist_ok=True)
+
     print(f"\n🖼️  Visualizing {len(samples)} samples...")
 
-    for i, img_info in enumerate(samples, 1):
+    # Images missing from the split directory are looked up across the
+    # project in a single walk rather than one rglob per image
+    missing = {
+        os.path.basename(img['file_name']) for img in samples
+        if not (images_dir / img['file_name']).exists()
+    }
+    fallback_paths = find_files(PROJECT_ROOT, missing) if missing else {}
+
+    jpeg_params = [cv2.IMWRITE_JPEG_QUALITY, SAMPLE_JPEG_QUALITY, cv2.IMWRITE_JPEG_OPTIMIZE, 1]
+
+    # Box color, label text and its rendered size, resolved once per class
+    # so each annotation costs a single lookup
+    def _label_style(cat_id, name):
+        label_size = cv2.getTextSize(name, cv2.FONT_HERSHEY_SIMPLEX, 0.5, 1)[0]
+        return COLORS.get(cat_id, (255, 255, 255)), name, label_size
+
+    styles = {cat_id: _label_style(cat_id, name) for cat_id, name in CLASS_NAMES.items()}
+    unknown_style = _label_style(None, 'unknown')
+
+    def _render_sample(i, img_info):
+        """Draw one sample's boxes and write it out; None if it can't be read"""
         # Find image file
         image_path = images_dir / img_info['file_name']
 
         if not image_path.exists():
             # Try to find in raw directories
-            found = list(PROJECT_ROOT.rglob(img_info['file_name']))
-            if found:
-                image_path = found[0]
-            else:
-                print(f"   ⚠️  Image not found: {img_info['file_name']}")
-                continue
-
-        # Load image
-        img = cv2.imread(str(image_path))
+            image_path = fallback_paths.get(os.path.basename(img_info['file_name']))
+            if image_path is None:
+                tqdm.write(f"   ⚠️  Image not found: {img_info['file_name']}")
+                return None
+
+        # Load image (decoded once, then from the cache on re-runs)
+        img = load_cached_image(Path(image_path), cache_dir, cache_format)
         if img is None:
-            print(f"   ⚠️  Failed to load: {image_path}")
-            continue
+            tqdm.write(f"   ⚠️  Failed to load: {image_path}")
+            return None
 
         # Draw annotations
         annotations = image_to_anns[img_info['id']]
 
-        for ann in annotations:
-            bbox = ann['bbox']  # [x, y, width, height]
-            cat_id = ann['category_id']
+        # Box corners for every annotation at once; per box only the
+        # outline and the text go through OpenCV
+        boxes = np.array([ann['bbox'] for ann in annotations], dtype=np.float64).reshape(-1, 4)
+        boxes = boxes.astype(np.int64)
+        boxes[:, 2:] += boxes[:, :2]
 
-            x, y, w, h = map(int, bbox)
-            color = COLORS.get(cat_id, (255, 255, 255))
-            class_name = CLASS_NAMES.get(cat_id, 'unknown')
+        for (x, y, x2, y2), ann in zip(boxes.tolist(), annotations):
+            color, label, (label_w, label_h) = styles.get(ann['category_id'], unknown_style)
 
             # Draw bounding box
-            cv2.rectangle(img, (x, y), (x + w, y + h), color, 2)
+            cv2.rectangle(img, (x, y), (x2, y2), color, 2)
 
-            # Draw label
-            label = f"{class_name}"
-            label_size, _ = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, 0.5, 1)
-            cv2.rectangle(img, (x, y - label_size[1] - 5), (x + label_size[0], y), color, -1)
+            # Draw label (filled background as a slice, corners inclusive)
+            top = max(y - label_h - 5, 0)
+            left = max(x, 0)
+            img[top:max(y + 1, top), left:max(x + label_w + 1, left)] = color
             cv2.putText(img, label, (x, y - 5), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
 
         # Add info text
@@ -121,12 +313,22 @@ def visualize_samples(split='train', num_samples=20, output_dir=None):
 
         # Save
         output_path = output_dir / f"sample_{i:03d}.jpg"
-        cv2.imwrite(str(output_path), img)
+        cv2.imwrite(str(output_path), img, jpeg_params)
+
+        return i, output_path
+
+    # imread/imwrite and the JPEG codec release the GIL, so samples render
+    # in parallel; image_to_anns is only read from the workers
+    with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+        rendered = executor.map(_render_sample, range(1, len(samples) + 1), samples)
+        saved = sum(result is not None for result in tqdm(rendered, total=len(samples), desc=f"   {split}"))
 
-        if i % 5 == 0:
-            print(f"   Progress: {i}/{len(samples)}")
+    if cache_format != 'none':
+        removed = prune_image_cache(cache_dir)
+        if removed:
+            print(f"   Pruned {removed} old entries from {cache_dir}/")
 
-    print(f"\n✓ Saved {len(samples)} visualizations to: {output_dir}/")
+    print(f"\n✓ Saved {saved} visualizations to: {output_dir}/")
 
 def check_dataset_quality(split='train'):
     """
@@ -147,13 +349,12 @@ def check_dataset_quality(split='train'):
     print(f"🔍 Dataset Quality Check - {split.upper()}")
     print(f"{'='*60}")
 
-    # Load annotations
-    with open(ann_file, 'r') as f:
-        data = json.load(f)
+    # Load annotations (packed arrays, streamed)
+    image_sizes, category_ids, bbox_sizes = load_split_arrays(ann_file)
 
     # Basic stats
-    num_images = len(data['images'])
-    num_annotations = len(data['annotations'])
+    num_images = len(image_sizes)
+    num_annotations = len(category_ids)
 
     print(f"\n📊 Basic Statistics:")
     print(f"   Images: {num_images}")
@@ -161,58 +362,46 @@ def check_dataset_quality(split='train'):
     print(f"   Avg annotations per image: {num_annotations / num_images:.2f}")
 
     # Class distribution
-    class_counts = defaultdict(int)
-    for ann in data['annotations']:
-        cat_id = ann['category_id']
-        class_counts[cat_id] += 1
+    class_counts = count_classes(category_ids)
 
     print(f"\n📈 Class Distribution:")
-    for cat_id in sorted(class_counts.keys()):
-        count = class_counts[cat_id]
+    for cat_id, count in class_counts.items():
         percentage = count / num_annotations * 100
         class_name = CLASS_NAMES.get(cat_id, f'class_{cat_id}')
         print(f"   {class_name}: {count} ({percentage:.1f}%)")
 
-    # Bbox size distribution
-    bbox_areas = []
-    bbox_widths = []
-    bbox_heights = []
-
-    for ann in data['annotations']:
-        bbox = ann['bbox']
-        w, h = bbox[2], bbox[3]
-        area = w * h
-
-        bbox_areas.append(area)
-        bbox_widths.append(w)
-        bbox_heights.append(h)
+    # Bbox size distribution (reduced in NumPy)
+    bbox_widths = bbox_sizes[:, 0]
+    bbox_heights = bbox_sizes[:, 1]
+    bbox_areas = bbox_widths * bbox_heights
 
     print(f"\n📏 Bounding Box Statistics:")
     print(f"   Area (px²):")
-    print(f"      Min: {min(bbox_areas):.0f}")
-    print(f"      Max: {max(bbox_areas):.0f}")
-    print(f"      Mean: {np.mean(bbox_areas):.0f}")
+    print(f"      Min: {bbox_areas.min():.0f}")
+    print(f"      Max: {bbox_areas.max():.0f}")
+    print(f"      Mean: {bbox_areas.mean():.0f}")
     print(f"      Median: {np.median(bbox_areas):.0f}")
 
     print(f"   Width (px):")
-    print(f"      Min: {min(bbox_widths):.0f}")
-    print(f"      Max: {max(bbox_widths):.0f}")
-    print(f"      Mean: {np.mean(bbox_widths):.0f}")
+    print(f"      Min: {bbox_widths.min():.0f}")
+    print(f"      Max: {bbox_widths.max():.0f}")
+    print(f"      Mean: {bbox_widths.mean():.0f}")
 
     print(f"   Height (px):")
-    print(f"      Min: {min(bbox_heights):.0f}")
-    print(f"      Max: {max(bbox_heights):.0f}")
-    print(f"      Mean: {np.mean(bbox_heights):.0f}")
+    print(f"      Min: {bbox_heights.min():.0f}")
+    print(f"      Max: {bbox_heights.max():.0f}")
+    print(f"      Mean: {bbox_heights.mean():.0f}")
 
-    # Image size distribution
-    image_widths = [img['width'] for img in data['images']]
-    image_heights = [img['height'] for img in data['images']]
+    # Image size distribution (np.unique: one sort instead of a
+    # list.count() scan per distinct size)
+    widths, width_counts = np.unique(image_sizes[:, 0], return_counts=True)
+    heights, height_counts = np.unique(image_sizes[:, 1], return_counts=True)
 
     print(f"\n🖼️  Image Dimensions:")
-    print(f"   Width range: {min(image_widths)} - {max(image_widths)}")
-    print(f"   Height range: {min(image_heights)} - {max(image_heights)}")
-    print(f"   Most common width: {max(set(image_widths), key=image_widths.count)}")
-    print(f"   Most common height: {max(set(image_heights), key=image_heights.count)}")
+    print(f"   Width range: {widths[0]} - {widths[-1]}")
+    print(f"   Height range: {heights[0]} - {heights[-1]}")
+    print(f"   Most common width: {widths[width_counts.argmax()]}")
+    print(f"   Most common height: {heights[height_counts.argmax()]}")
 
     # Check for potential issues
     print(f"\n⚠️  Potential Issues:")
@@ -230,12 +419,12 @@ def check_dataset_quality(split='train'):
             issues.append(f"High class imbalance (ratio: {class_ratio:.1f}:1)")
 
     # Tiny bboxes
-    tiny_bboxes = sum(1 for area in bbox_areas if area < 100)
+    tiny_bboxes = int((bbox_areas < 100).sum())
     if tiny_bboxes > num_annotations * 0.1:
         issues.append(f"Many tiny bboxes ({tiny_bboxes}/{num_annotations})")
 
     # Huge bboxes
-    huge_bboxes = sum(1 for area in bbox_areas if area > 50000)
+    huge_bboxes = int((bbox_areas > 50000).sum())
     if huge_bboxes > 0:
         issues.append(f"Some huge bboxes ({huge_bboxes} > 50000 px²)")
 
@@ -252,6 +441,8 @@ def plot_statistics(output_dir=None):
     Args:
         output_dir: Output directory for plots
     """
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
 
     if output_dir is None:
         output_dir = DATA_DIR / "statistics"
@@ -262,65 +453,68 @@ def plot_statistics(output_dir=None):
 
     print(f"\n📊 Generating statistical plots...")
 
-    # Collect data from all splits
+    # Collect data from all splits: (image count, category id array)
     all_data = {}
 
     for split in ['train', 'val', 'test']:
         ann_file = DATA_DIR / split / "annotations.json"
         if ann_file.exists():
-            with open(ann_file, 'r') as f:
-                all_data[split] = json.load(f)
+            image_sizes, category_ids, _ = load_split_arrays(ann_file)
+            all_data[split] = (len(image_sizes), category_ids)
 
     if not all_data:
         print("❌ No datasets found!")
         return
 
+    # One Agg figure, created without pyplot (no interactive backend probe)
+    # and cleared between plots; tight_layout() once per plot instead of
+    # bbox_inches='tight', which renders the figure a second time to measure it
+    fig = Figure(figsize=(10, 6))
+    FigureCanvasAgg(fig)
+
     # 1. Dataset sizes
-    plt.figure(figsize=(10, 6))
+    ax = fig.subplots()
 
     splits = list(all_data.keys())
-    image_counts = [len(all_data[split]['images']) for split in splits]
-    ann_counts = [len(all_data[split]['annotations']) for split in splits]
+    image_counts = [all_data[split][0] for split in splits]
+    ann_counts = [len(all_data[split][1]) for split in splits]
 
     x = np.arange(len(splits))
     width = 0.35
 
-    plt.bar(x - width/2, image_counts, width, label='Images')
-    plt.bar(x + width/2, ann_counts, width, label='Annotations')
+    ax.bar(x - width/2, image_counts, width, label='Images')
+    ax.bar(x + width/2, ann_counts, width, label='Annotations')
 
-    plt.xlabel('Split')
-    plt.ylabel('Count')
-    plt.title('Dataset Size Distribution')
-    plt.xticks(x, splits)
-    plt.legend()
-    plt.grid(axis='y', alpha=0.3)
+    ax.set_xlabel('Split')
+    ax.set_ylabel('Count')
+    ax.set_title('Dataset Size Distribution')
+    ax.set_xticks(x, splits)
+    ax.legend()
+    ax.grid(axis='y', alpha=0.3)
 
-    plt.savefig(output_dir / 'dataset_sizes.png', dpi=150, bbox_inches='tight')
-    plt.close()
+    fig.tight_layout()
+    fig.savefig(output_dir / 'dataset_sizes.png', dpi=150)
 
     # 2. Class distribution
-    plt.figure(figsize=(12, 6))
+    fig.clear()
+    fig.set_size_inches(12, 6)
 
-    for i, split in enumerate(splits, 1):
-        plt.subplot(1, len(splits), i)
+    for ax, split in zip(np.atleast_1d(fig.subplots(1, len(splits))), splits):
+        class_counts = count_classes(all_data[split][1])
 
-        class_counts = defaultdict(int)
-        for ann in all_data[split]['annotations']:
-            cat_id = ann['category_id']
-            class_counts[cat_id] += 1
+        class_names = [CLASS_NAMES[cid] for cid in class_counts]
+        counts = list(class_counts.values())
 
-        class_names = [CLASS_NAMES[cid] for cid in sorted(class_counts.keys())]
-        counts = [class_counts[cid] for cid in sorted(class_counts.keys())]
+        ax.bar(class_names, counts, color=['green', 'red'])
+        ax.set_title(f'{split.upper()} Class Distribution')
+        ax.set_ylabel('Count')
+        ax.tick_params(axis='x', labelrotation=45)
+        for label in ax.get_xticklabels():
+            label.set_horizontalalignment('right')
+        ax.grid(axis='y', alpha=0.3)
 
-        plt.bar(class_names, counts, color=['green', 'red'])
-        plt.title(f'{split.upper()} Class Distribution')
-        plt.ylabel('Count')
-        plt.xticks(rotation=45, ha='right')
-        plt.grid(axis='y', alpha=0.3)
-
-    plt.tight_layout()
-    plt.savefig(output_dir / 'class_distribution.png', dpi=150, bbox_inches='tight')
-    plt.close()
+    fig.tight_layout()
+    fig.savefig(output_dir / 'class_distribution.png', dpi=150)
 
     print(f"✓ Saved plots to: {output_dir}/")
 
@@ -347,6 +541,18 @@ def main():
         action='store_true',
         help='Only check quality, do not visualize'
     )
+    parser.add_argument(
+        '--cache-format',
+        default='npy',
+        choices=CACHE_FORMATS,
+        help='Cache decoded sample images as raw arrays (npy), JPEG bytes (jpg) or not at all'
+    )
+    parser.add_argument(
+        '--seed',
+        type=int,
+        default=DEFAULT_SEED,
+        help='Seed for picking the samples (same seed, same samples)'
+    )
     parser.add_argument(
         '--plot',
         action='store_true',
@@ -366,7 +572,7 @@ def main():
 
         # Visualize samples
         if not args.check_only:
-            visualize_samples(split, args.num_samples)
+            visualize_samples(split, args.num_samples, cache_format=args.cache_format, seed=args.seed)
 
     print(f"\n{'='*60}")
     print("✅ Dataset Visualization Complete!")
@@ -10,28 +10,27 @@ import os
 # Add backend to path
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'backend'))
 
-from abandoned_vehicle_detector import AbandonedVehicleDetector
-from pdf_processor import PDFProcessor
-import cv2
 import json
 
 
 def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Test abandoned vehicle detection on the sample PDFs')
+    parser.add_argument(
+        '--skip-align',
+        action='store_true',
+        help='Compare the images as rendered, without feature-based alignment '
+             '(for PDFs already on the same pixel grid)'
+    )
+    args = parser.parse_args()
+
     print("=" * 80)
     print("장기 방치 차량 탐지 시스템 테스트")
     print("Abandoned Vehicle Detection System Test")
     print("=" * 80)
     print()
 
-    # Initialize services
-    print("📋 Initializing services...")
-    detector = AbandonedVehicleDetector(similarity_threshold=0.90)
-    pdf_processor = PDFProcessor(dpi=300)
-    print("✓ Services initialized")
-    print(f"  - Device: {detector.device}")
-    print(f"  - Similarity threshold: {detector.similarity_threshold * 100}%")
-    print()
-
     # Check for sample files
     pdf1_path = "sample_image1.pdf"
     pdf2_path = "sample_image2.pdf"
@@ -47,6 +46,19 @@ def main():
     print("✓ Sample files found")
     print()
 
+    # Heavy imports (torch, OpenCV, pdf2image) only once there is work to do
+    from abandoned_vehicle_detector import AbandonedVehicleDetector
+    from pdf_processor import PDFProcessor
+
+    # Initialize services
+    print("📋 Initializing services...")
+    detector = AbandonedVehicleDetector(similarity_threshold=0.90)
+    pdf_processor = PDFProcessor(dpi=300)
+    print("✓ Services initialized")
+    print(f"  - Device: {detector.device}")
+    print(f"  - Similarity threshold: {detector.similarity_threshold * 100}%")
+    print()
+
     # Extract metadata
     print("📄 Extracting metadata from PDFs...")
     meta1 = pdf_processor.extract_metadata_from_pdf(pdf1_path)
@@ -83,13 +95,19 @@ def main():
 
     # Align images
     print("🔄 Aligning images...")
-    try:
-        image1_aligned, image2_aligned = pdf_processor.align_images(image1, image2)
-        print("  ✓ Images aligned")
-    except Exception as e:
-        print(f"  ⚠️  Warning: Could not align images: {str(e)}")
-        print("  Continuing with original images...")
+    if args.skip_align and image1.shape == image2.shape:
+        print("  ⏭️  Skipped (--skip-align)")
         image1_aligned, image2_aligned = image1, image2
+    else:
+        if args.skip_align:
+            print(f"  ⚠️  Image sizes differ ({image1.shape} vs {image2.shape}), aligning anyway")
+        try:
+            image1_aligned, image2_aligned = pdf_processor.align_images(image1, image2)
+            print("  ✓ Images aligned")
+        except Exception as e:
+            print(f"  ⚠️  Warning: Could not align images: {str(e)}")
+            print("  Continuing with original images...")
+            image1_aligned, image2_aligned = image1, image2
     print()
 
     # Detect parking spaces